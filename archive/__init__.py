@@ -0,0 +1,7 @@
+"""
+Earlier one-off scripts, kept as a package of the repository root.
+
+The modules import the shared helpers (compression.py, id_columns.py, writers.py, ...) as
+top-level modules, so run them from the repository root as modules, e.g.
+`python -m archive.reduce`, or import them from there (`from archive.reduce import downsize_file`).
+"""
@@ -1,32 +1,113 @@
 """
 Use this to extract a random sample of rows from the input CSV file 
 and save it to a new CSV file. You can adjust the number of rows to extract
+
+The input is streamed once with reservoir sampling (Algorithm L), so memory only
+holds the sampled rows however large the input file is. Algorithm L draws how many
+rows to skip before the next replacement, so most rows cost no random draw at all.
+
+- `stratify_by`: name of a column (e.g. ProviderName or ServiceName); when given,
+  `num_rows` rows are sampled for every distinct value of that column.
+- `seed`: makes the sample reproducible.
 """
 
 import csv
 import random
+from itertools import islice
+from math import exp, floor, log
+
+class ReservoirSampler:
+    """
+    Uniform sample of ``size`` items from a stream of unknown length (Algorithm L).
+    """
+
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.items = []
+        self.seen = 0
+        self._weight = exp(log(self._uniform()) / size)
+        self.next_index = size + self._gap()
+
+    def _uniform(self):
+        return 1.0 - self.rng.random()  # in (0, 1], safe for log
+
+    def _gap(self):
+        return floor(log(self._uniform()) / log(1 - self._weight))
+
+    def skip(self, count):
+        """
+        Record ``count`` items that were passed over without being offered.
+        """
+        self.seen += count
+
+    def offer(self, item):
+        if self.seen < self.size:
+            self.items.append(item)
+        elif self.seen == self.next_index:
+            self.items[self.rng.randrange(self.size)] = item
+            self._weight *= exp(log(self._uniform()) / self.size)
+            self.next_index += self._gap() + 1
+        self.seen += 1
 
-def extract_random_rows(input_file, output_file, num_rows=1000):
+def sample_rows(reader, num_rows, rng):
+    """
+    Sample ``num_rows`` rows, jumping over the rows Algorithm L skips.
+    """
+    sampler = ReservoirSampler(num_rows, rng)
+    for row in islice(reader, num_rows):
+        sampler.offer(row)
+    while True:
+        gap = sampler.next_index - sampler.seen
+        row = next(islice(reader, gap, None), None)
+        if row is None:
+            break
+        sampler.skip(gap)
+        sampler.offer(row)
+    return sampler.items
+
+def sample_rows_stratified(reader, num_rows, column_index, rng):
+    """
+    Sample ``num_rows`` rows for each distinct value of the column at ``column_index``.
+    """
+    samplers = {}
+    for row in reader:
+        key = row[column_index] if column_index < len(row) else ''
+        if key not in samplers:
+            samplers[key] = ReservoirSampler(num_rows, rng)
+        samplers[key].offer(row)
+    return [row for key in sorted(samplers) for row in samplers[key].items]
+
+def extract_random_rows(input_file, output_file, num_rows=1000, stratify_by=None, seed=None):
     """
     Extract a random selection of rows (excluding the header) from a large CSV file.
     """
-    with open(input_file, 'r') as infile:
-        reader = list(csv.reader(infile))
-        header, rows = reader[0], reader[1:]
-        
-        # Randomly sample rows
-        sampled_rows = random.sample(rows, num_rows)
-        
-        # Write to a new CSV file
-        with open(output_file, 'w', newline='') as outfile:
-            writer = csv.writer(outfile)
-            writer.writerow(header)  # Write the header
-            writer.writerows(sampled_rows)  # Write the sampled rows
-
-    print(f"Extracted {num_rows} random rows to {output_file}.")
+    rng = random.Random(seed)
+    with open(input_file, 'r', newline='') as infile:
+        reader = csv.reader(infile)
+        header = next(reader)
+
+        # Randomly sample rows while streaming the file
+        if num_rows <= 0:
+            sampled_rows = []
+        elif stratify_by is None:
+            sampled_rows = sample_rows(reader, num_rows, rng)
+        else:
+            if stratify_by not in header:
+                raise ValueError(f"Column {stratify_by!r} not found in {input_file}")
+            sampled_rows = sample_rows_stratified(reader, num_rows, header.index(stratify_by), rng)
+
+    # Write to a new CSV file
+    with open(output_file, 'w', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(header)  # Write the header
+        writer.writerows(sampled_rows)  # Write the sampled rows
+
+    print(f"Extracted {len(sampled_rows)} random rows to {output_file}.")
 
 input_csv = "focus-data-full.csv"
 output_csv = "random_sample.csv"
 
-# Extract 1000 random rows
-extract_random_rows(input_csv, output_csv, num_rows=1000)
+if __name__ == "__main__":
+    # Extract 1000 random rows
+    extract_random_rows(input_csv, output_csv, num_rows=1000)
@@ -2,86 +2,99 @@
 This script generates mock data for various cloud providers (AWS, Google Cloud, Oracle, and Microsoft) using a sample dataset. 
 It creates six months of billing data, including information such as billing periods, resource types, costs, and other metadata. 
 The script is designed to produce realistic data by leveraging the Faker library and the input sample dataset.
+
+Each month is generated as one block of whole columns. Faker text (descriptions, company names,
+words) is drawn once into value pools and filled by random index. The UUID and account ID
+columns and the Tags JSON are built in bulk by id_columns.py instead of calling Faker per row.
+
+Run it from the repository root with `python -m archive.gen`.
 """
 
+import numpy as np
 import pandas as pd
 from faker import Faker
-import random
 from datetime import datetime, timedelta
 
+from id_columns import TagPool, numeric_id_column, uuid4_column
+from template_store import load_template_store
+from value_pools import get_pools, pool_column
+from writers import CsvBatchWriter
+
 # Initialize Faker
 fake = Faker()
 
-# Read the sample data
+# Sample data used as templates
 input_file = 'focus-data-full.csv'
-df = pd.read_csv(input_file)
 
-# Function to generate mock data for various providers
-def generate_mock_data(row, provider, month_start, month_end):
-    row['AvailabilityZone'] = fake.random_element(elements=('us-east-1', 'us-west-2', 'eu-central-1', 'europe-west3', 'asia-southeast1'))
-    row['BilledCost'] = round(random.uniform(0, 100), 10)
-    row['BillingAccountId'] = fake.random_number(digits=13, fix_len=True)
-    row['BillingAccountName'] = fake.company()
-    row['BillingCurrency'] = 'USD'
+providers = ["AWS", "Google Cloud", "Oracle", "Microsoft"]
+
+# Provider-specific invoice issuer and publisher names
+issuer_names = {
+    "AWS": 'Amazon Web Services, Inc.',
+    "Google Cloud": 'Google Cloud',
+    "Oracle": 'Oracle',
+    "Microsoft": 'Microsoft',
+}
+
+# Function to generate a block of mock data for various providers
+def generate_mock_data(df, month_start, month_end, n, rng, pools, tags):
+    block = df.take(rng.integers(0, len(df), size=n)).reset_index(drop=True)
+    provider = pd.Series(rng.choice(providers, size=n))
+
+    block['AvailabilityZone'] = rng.choice(['us-east-1', 'us-west-2', 'eu-central-1', 'europe-west3', 'asia-southeast1'], size=n)
+    block['BilledCost'] = np.round(rng.uniform(0, 100, n), 10)
+    block['BillingAccountId'] = numeric_id_column(n, 13, rng)
+    block['BillingAccountName'] = pool_column(pools['company'], n, rng)
+    block['BillingCurrency'] = 'USD'
 
     # Use the specified month range for BillingPeriod and ChargePeriod
-    billing_start = month_start
-    billing_end = month_end
-    row['BillingPeriodStart'] = billing_start.strftime("%Y-%m-%d %H:%M:%S")
-    row['BillingPeriodEnd'] = billing_end.strftime("%Y-%m-%d %H:%M:%S")
-    row['ChargePeriodStart'] = billing_start.strftime("%Y-%m-%d %H:%M:%S")
-    row['ChargePeriodEnd'] = billing_end.strftime("%Y-%m-%d %H:%M:%S")
-
-    row['ChargeCategory'] = 'Usage'
-    row['ChargeDescription'] = fake.sentence(nb_words=6)
-    row['ChargeFrequency'] = 'Usage-Based'
-    row['ConsumedQuantity'] = round(random.uniform(0, 1000), 10)
-    row['ConsumedUnit'] = fake.random_element(elements=('Requests', 'GB', 'Hours'))
-    row['ContractedCost'] = round(random.uniform(0, 100), 10)
-    row['EffectiveCost'] = round(random.uniform(0, 100), 10)
+    block['BillingPeriodStart'] = month_start.strftime("%Y-%m-%d %H:%M:%S")
+    block['BillingPeriodEnd'] = month_end.strftime("%Y-%m-%d %H:%M:%S")
+    block['ChargePeriodStart'] = month_start.strftime("%Y-%m-%d %H:%M:%S")
+    block['ChargePeriodEnd'] = month_end.strftime("%Y-%m-%d %H:%M:%S")
+
+    block['ChargeCategory'] = 'Usage'
+    block['ChargeDescription'] = pool_column(pools['sentence'], n, rng)
+    block['ChargeFrequency'] = 'Usage-Based'
+    block['ConsumedQuantity'] = np.round(rng.uniform(0, 1000, n), 10)
+    block['ConsumedUnit'] = rng.choice(['Requests', 'GB', 'Hours'], size=n)
+    block['ContractedCost'] = np.round(rng.uniform(0, 100, n), 10)
+    block['EffectiveCost'] = np.round(rng.uniform(0, 100, n), 10)
 
     # Add provider-specific details
-    if provider == "AWS":
-        row['InvoiceIssuerName'] = 'Amazon Web Services, Inc.'
-        row['ProviderName'] = 'AWS'
-        row['PublisherName'] = 'Amazon Web Services, Inc.'
-    elif provider == "Google Cloud":
-        row['InvoiceIssuerName'] = 'Google Cloud'
-        row['ProviderName'] = 'Google Cloud'
-        row['PublisherName'] = 'Google Cloud'
-    elif provider == "Oracle":
-        row['InvoiceIssuerName'] = 'Oracle'
-        row['ProviderName'] = 'Oracle'
-        row['PublisherName'] = 'Oracle'
-    elif provider == "Microsoft":
-        row['InvoiceIssuerName'] = 'Microsoft'
-        row['ProviderName'] = 'Microsoft'
-        row['PublisherName'] = 'Microsoft'
-
-    row['RegionId'] = fake.random_element(elements=('us-west-2', 'us-east-1', 'eu-central-1', 'asia-east1'))
-    row['RegionName'] = fake.random_element(elements=('US West (Oregon)', 'US East (N. Virginia)', 'EU (Frankfurt)', 'Asia East'))
-    row['ResourceId'] = fake.uuid4()
-    row['ResourceName'] = fake.word()
-    row['ResourceType'] = fake.random_element(elements=('Compute', 'Storage', 'Networking'))
-    row['ServiceCategory'] = fake.random_element(elements=('Integration', 'Compute', 'Storage'))
-    row['ServiceName'] = fake.random_element(elements=(
+    block['InvoiceIssuerName'] = provider.map(issuer_names)
+    block['ProviderName'] = provider
+    block['PublisherName'] = provider.map(issuer_names)
+
+    block['RegionId'] = rng.choice(['us-west-2', 'us-east-1', 'eu-central-1', 'asia-east1'], size=n)
+    block['RegionName'] = rng.choice(['US West (Oregon)', 'US East (N. Virginia)', 'EU (Frankfurt)', 'Asia East'], size=n)
+    block['ResourceId'] = uuid4_column(n, rng)
+    block['ResourceName'] = pool_column(pools['word'], n, rng)
+    block['ResourceType'] = rng.choice(['Compute', 'Storage', 'Networking'], size=n)
+    block['ServiceCategory'] = rng.choice(['Integration', 'Compute', 'Storage'], size=n)
+    block['ServiceName'] = rng.choice([
         'Amazon Simple Queue Service',
         'Elastic Load Balancing',
         'Amazon Elastic Compute Cloud',
         'Google Cloud Storage',
         'Microsoft Azure Data Lake',
         'Oracle Autonomous Database'
-    ))
-    row['SkuId'] = fake.uuid4()
-    row['SkuPriceId'] = fake.uuid4()
-    row['SubAccountId'] = fake.random_number(digits=11, fix_len=True)
-    row['SubAccountName'] = fake.company()
-    row['Tags'] = fake.json()
-    return row
+    ], size=n)
+    block['SkuId'] = uuid4_column(n, rng)
+    block['SkuPriceId'] = uuid4_column(n, rng)
+    block['SubAccountId'] = numeric_id_column(n, 11, rng)
+    block['SubAccountName'] = pool_column(pools['company'], n, rng)
+    block['Tags'] = tags.column(n, rng)
+    return block
 
 # Generate six months of data with multiple providers
-def generate_six_months_data(output_file, rows_per_month=100000, months=6, preview=False):
-    providers = ["AWS", "Google Cloud", "Oracle", "Microsoft"]
+def generate_six_months_data(output_file, rows_per_month=100000, months=6, preview=False, seed=None, pool_sizes=None,
+                             input_file=input_file):
+    # Map the cached template store for the sample data
+    df = load_template_store(input_file)
+    rng = np.random.default_rng(seed)
+    pools = get_pools(fake, ['sentence', 'company', 'word'], pool_sizes, seed)
+    tags = TagPool()
     all_data = []
 
     # Calculate the start and end dates for the last six months
@@ -93,19 +106,14 @@ def generate_six_months_data(output_file, rows_per_month=100000, months=6, previ
         if not preview:
             print(f"Generating data for period {month_start.strftime('%Y-%m-%d')} to {month_end.strftime('%Y-%m-%d')}...")
 
-        for _ in range(rows_per_month):
-            provider = random.choice(providers)
-            # Pick a random row from the sample dataset to base the new row on
-            sample_row = df.iloc[random.randint(0, len(df) - 1)].copy()
-            new_row = generate_mock_data(sample_row, provider, month_start, month_end)
-            all_data.append(new_row)
+        all_data.append(generate_mock_data(df, month_start, month_end, rows_per_month, rng, pools, tags))
 
         # If in preview mode, stop after the first month and show a few rows
         if preview:
             break
 
-    # Convert the data into a DataFrame
-    new_data = pd.DataFrame(all_data)
+    # Combine the monthly blocks into a single DataFrame
+    new_data = pd.concat(all_data, ignore_index=True)
 
     if preview:
         print("\n*** Preview of Mock Data ***")
@@ -113,12 +121,15 @@ def generate_six_months_data(output_file, rows_per_month=100000, months=6, previ
         print("\nRun the script in full mode to generate the entire dataset.")
         return
 
-    # Save to CSV
-    new_data.to_csv(output_file, index=False)
+    # Save to CSV in blocks of 100k rows, keeping the 10 decimals of the cost columns
+    with CsvBatchWriter(output_file, float_decimals=10) as writer:
+        for start in range(0, len(new_data), 100000):
+            writer.write(new_data.iloc[start:start + 100000])
     print(f"Generated six months of data ({len(new_data)} rows) and saved to {output_file}")
 
 # Run the script
 output_file = 'mock-data-6-months.csv'
 
-# Set preview to True to see sample rows
-generate_six_months_data(output_file, rows_per_month=100000, months=6, preview=False)
+if __name__ == '__main__':
+    # Set preview to True to see sample rows
+    generate_six_months_data(output_file, rows_per_month=100000, months=6, preview=False)
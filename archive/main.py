@@ -8,70 +8,101 @@ or performance evaluation of data processing workflows.
 
 Usage:
 1. Ensure the sample dataset file (focus_sample-data-new.csv) exists.
-2. Run the script to generate a new CSV file with mock data.
+2. Run the script from the repository root (`python -m archive.main`) to generate a new CSV file with mock data.
 
 Adjust the `num_rows` variable to control the size of the output dataset.
+
+Rows are generated in blocks of whole columns: Faker text comes from value pools
+(value_pools.py), and the IDs, timestamps and Tags are built in bulk (id_columns.py),
+so no Faker call is made per row.
 """
 
+from datetime import datetime
+
+import numpy as np
 import pandas as pd
 from faker import Faker
-import random
+
+from id_columns import TagPool, numeric_id_column, uuid4_column
+from template_store import load_template_store
+from value_pools import get_pools, pool_column
+from writers import CsvBatchWriter
 
 # Initialize Faker
 fake = Faker()
 
-# Read the sample data
+# Sample data used as templates
 input_file = 'focus_sample-data-new.csv'
-df = pd.read_csv(input_file)
-
-# Function to generate mock data
-def generate_mock_data(row):
-    row['AvailabilityZone'] = fake.random_element(elements=('us-east-1', 'us-west-2', 'eu-central-1'))
-    row['BilledCost'] = round(random.uniform(0, 1), 10)
-    row['BillingAccountId'] = fake.random_number(digits=13, fix_len=True)
-    row['BillingAccountName'] = fake.company()
-    row['BillingCurrency'] = 'USD'
-    row['BillingPeriodEnd'] = fake.date_time_this_year()
-    row['BillingPeriodStart'] = fake.date_time_this_year()
-    row['ChargeCategory'] = 'Usage'
-    row['ChargeDescription'] = fake.sentence(nb_words=6)
-    row['ChargeFrequency'] = 'Usage-Based'
-    row['ChargePeriodEnd'] = fake.date_time_this_year()
-    row['ChargePeriodStart'] = fake.date_time_this_year()
-    row['ConsumedQuantity'] = round(random.uniform(0, 10), 10)
-    row['ConsumedUnit'] = fake.random_element(elements=('Requests', 'GB', 'Hours'))
-    row['ContractedCost'] = round(random.uniform(0, 1), 10)
-    row['EffectiveCost'] = round(random.uniform(0, 1), 10)
-    row['InvoiceIssuerName'] = 'Amazon Web Services, Inc.'
-    row['ListCost'] = round(random.uniform(0, 1), 10)
-    row['ListUnitPrice'] = round(random.uniform(0, 1), 10)
-    row['PricingCategory'] = 'Standard'
-    row['PricingQuantity'] = round(random.uniform(0, 10), 10)
-    row['PricingUnit'] = fake.random_element(elements=('Requests', 'GB', 'Hours'))
-    row['ProviderName'] = 'AWS'
-    row['PublisherName'] = 'Amazon Web Services, Inc.'
-    row['RegionId'] = fake.random_element(elements=('us-west-2', 'us-east-1', 'eu-central-1'))
-    row['RegionName'] = fake.random_element(elements=('US West (Oregon)', 'US East (N. Virginia)', 'EU (Frankfurt)'))
-    row['ResourceId'] = fake.uuid4()
-    row['ResourceName'] = fake.word()
-    row['ResourceType'] = fake.random_element(elements=('Compute', 'Storage', 'Networking'))
-    row['ServiceCategory'] = fake.random_element(elements=('Integration', 'Compute', 'Storage'))
-    row['ServiceName'] = fake.random_element(elements=('Amazon Simple Queue Service', 'Elastic Load Balancing', 'Amazon Elastic Compute Cloud'))
-    row['SkuId'] = fake.uuid4()
-    row['SkuPriceId'] = fake.uuid4()
-    row['SubAccountId'] = fake.random_number(digits=11, fix_len=True)
-    row['SubAccountName'] = fake.company()
-    row['Tags'] = fake.json()
-    return row
 
-# Generate 1,000,000 rows of data
-num_rows = 1000000
+def date_time_this_year_column(n, rng, now=None):
+    """
+    ``n`` random timestamps between the start of this year and now, like ``fake.date_time_this_year()``.
+    """
+    now = now or datetime.now().replace(microsecond=0)
+    year_start = datetime(now.year, 1, 1)
+    seconds = rng.integers(0, int((now - year_start).total_seconds()) + 1, size=n)
+    return pd.Timestamp(year_start) + pd.to_timedelta(seconds, unit='s')
+
+# Function to generate a block of mock data
+def generate_mock_data(df, n, rng, pools, tags):
+    block = df.take(rng.integers(0, len(df), size=n)).reset_index(drop=True)
 
-# Create new DataFrame with generated data
-new_data = pd.DataFrame([generate_mock_data(df.iloc[random.randint(0, len(df) - 1)].copy()) for _ in range(num_rows)])
+    block['AvailabilityZone'] = rng.choice(['us-east-1', 'us-west-2', 'eu-central-1'], size=n)
+    block['BilledCost'] = np.round(rng.uniform(0, 1, n), 10)
+    block['BillingAccountId'] = numeric_id_column(n, 13, rng)
+    block['BillingAccountName'] = pool_column(pools['company'], n, rng)
+    block['BillingCurrency'] = 'USD'
+    block['BillingPeriodEnd'] = date_time_this_year_column(n, rng)
+    block['BillingPeriodStart'] = date_time_this_year_column(n, rng)
+    block['ChargeCategory'] = 'Usage'
+    block['ChargeDescription'] = pool_column(pools['sentence'], n, rng)
+    block['ChargeFrequency'] = 'Usage-Based'
+    block['ChargePeriodEnd'] = date_time_this_year_column(n, rng)
+    block['ChargePeriodStart'] = date_time_this_year_column(n, rng)
+    block['ConsumedQuantity'] = np.round(rng.uniform(0, 10, n), 10)
+    block['ConsumedUnit'] = rng.choice(['Requests', 'GB', 'Hours'], size=n)
+    block['ContractedCost'] = np.round(rng.uniform(0, 1, n), 10)
+    block['EffectiveCost'] = np.round(rng.uniform(0, 1, n), 10)
+    block['InvoiceIssuerName'] = 'Amazon Web Services, Inc.'
+    block['ListCost'] = np.round(rng.uniform(0, 1, n), 10)
+    block['ListUnitPrice'] = np.round(rng.uniform(0, 1, n), 10)
+    block['PricingCategory'] = 'Standard'
+    block['PricingQuantity'] = np.round(rng.uniform(0, 10, n), 10)
+    block['PricingUnit'] = rng.choice(['Requests', 'GB', 'Hours'], size=n)
+    block['ProviderName'] = 'AWS'
+    block['PublisherName'] = 'Amazon Web Services, Inc.'
+    block['RegionId'] = rng.choice(['us-west-2', 'us-east-1', 'eu-central-1'], size=n)
+    block['RegionName'] = rng.choice(['US West (Oregon)', 'US East (N. Virginia)', 'EU (Frankfurt)'], size=n)
+    block['ResourceId'] = uuid4_column(n, rng)
+    block['ResourceName'] = pool_column(pools['word'], n, rng)
+    block['ResourceType'] = rng.choice(['Compute', 'Storage', 'Networking'], size=n)
+    block['ServiceCategory'] = rng.choice(['Integration', 'Compute', 'Storage'], size=n)
+    block['ServiceName'] = rng.choice(['Amazon Simple Queue Service', 'Elastic Load Balancing', 'Amazon Elastic Compute Cloud'], size=n)
+    block['SkuId'] = uuid4_column(n, rng)
+    block['SkuPriceId'] = uuid4_column(n, rng)
+    block['SubAccountId'] = numeric_id_column(n, 11, rng)
+    block['SubAccountName'] = pool_column(pools['company'], n, rng)
+    block['Tags'] = tags.column(n, rng)
+    return block
 
-# Save to new CSV file
+# Generate rows of AWS mock data from the sample file
+def generate_aws_data(input_file, output_file, num_rows=1000000, seed=None, pool_sizes=None, batch_size=100000):
+    # Map the cached template store for the sample data
+    df = load_template_store(input_file)
+    rng = np.random.default_rng(seed)
+    pools = get_pools(fake, ['sentence', 'company', 'word'], pool_sizes, seed)
+    tags = TagPool()
+
+    # Generate and save the rows in blocks, keeping the 10 decimals of the cost columns
+    with CsvBatchWriter(output_file, float_decimals=10) as writer:
+        for start in range(0, num_rows, batch_size):
+            writer.write(generate_mock_data(df, min(batch_size, num_rows - start), rng, pools, tags))
+
+    print(f"Generated {num_rows} rows of mock data and saved to {output_file}")
+
+# Generate 1,000,000 rows of data
+num_rows = 1000000
 output_file = 'focus-mock-data-1M.csv'
-new_data.to_csv(output_file, index=False)
 
-print(f"Generated {num_rows} rows of mock data and saved to {output_file}")
\ No newline at end of file
+if __name__ == '__main__':
+    generate_aws_data(input_file, output_file, num_rows)
@@ -1,27 +1,40 @@
 """
 This script reduces the size of a large CSV file to a target size (e.g., 1.5 GB) 
-by iteratively sampling rows. It reads the input file in chunks, samples rows 
-based on an adjustable fraction, and writes the reduced dataset to an output file.
+in a single pass. It streams the raw input lines in large blocks, keeps each
+line with a probability that is adjusted online, and writes the kept lines
+straight to the output file without parsing them.
 
 Key Features:
-- Handles large files efficiently using chunked processing.
-- Iteratively adjusts the sampling fraction to approximate the target file size.
-- Outputs the reduced dataset as a new CSV file.
+- Handles large files efficiently: one sequential read of the input, constant memory.
+- Adjusts the keep probability as it goes so the output lands on the target file size:
+  before each block it is set to (bytes still wanted) / (input bytes still to read),
+  measured on the raw lines, so long and short rows are accounted for exactly.
+- Always keeps the header line; rows are copied byte for byte.
 
 Usage:
 1. Place the large CSV file in the same directory as the script and update the 
    `input_file` variable with its name.
-2. Run the script to generate a reduced dataset (`mock-data-reduced.csv`).
+2. Run the script from the repository root (`python -m archive.reduce`) to generate a reduced
+   dataset (`mock-data-reduced.csv`).
 3. Adjust the `target_size_bytes` variable to specify the desired output file size.
 
+Rows must not contain embedded line breaks, since the input is split on newlines.
+
+Compressed files (`.gz` or `.zst`, see compression.py) are read and written as streams. The
+target size is then the uncompressed size of the output, and the bytes still to read are
+estimated from the compressed bytes left and the compression ratio seen so far.
+
 Dependencies:
-- pandas
+- numpy
 - os
+- pyarrow (for `.zst` files)
 """
 
-import pandas as pd
+import numpy as np
 import os
 
+from compression import compression_of, open_input, open_output, source_tell
+
 # Input and output file paths
 input_file = 'focus-data-full.csv'
 output_file = 'mock-data-reduced.csv'
@@ -29,52 +42,55 @@ output_file = 'mock-data-reduced.csv'
 # Target file size in bytes (1.5 GB = 1.5 * 1024^3 bytes)
 target_size_bytes = 1.5 * (1024 ** 3)
 
-# Initial sampling size percentage (start with 10%)
-sampling_fraction = 0.1
-
-# Function to estimate file size iteratively
-def downsize_file(input_file, output_file, target_size_bytes, initial_fraction=0.1):
-    df_iter = pd.read_csv(input_file, chunksize=10**6)  # Process in chunks
-    sampled_rows = []
-
-    print("Sampling initial rows...")
-    for chunk in df_iter:
-        # Sample rows from each chunk based on the sampling fraction
-        sampled_rows.append(chunk.sample(frac=initial_fraction))
-
-    # Combine sampled rows into a single DataFrame
-    sampled_df = pd.concat(sampled_rows)
-    
-    print("Saving sampled rows to temporary file for size estimation...")
-    temp_file = 'temp_sample.csv'
-    sampled_df.to_csv(temp_file, index=False)
-
-    # Calculate the size of the sampled file
-    temp_file_size = os.path.getsize(temp_file)
-    print(f"Temporary file size: {temp_file_size / (1024 ** 3):.2f} GB")
-
-    # Adjust the sampling fraction
-    scaling_factor = target_size_bytes / temp_file_size
-    final_fraction = initial_fraction * scaling_factor
-    print(f"Adjusted sampling fraction: {final_fraction:.4f}")
-
-    # Resample based on the adjusted fraction
-    sampled_rows = []
-    df_iter = pd.read_csv(input_file, chunksize=10**6)  # Reiterate through chunks
-    for chunk in df_iter:
-        sampled_rows.append(chunk.sample(frac=min(final_fraction, 1.0)))  # Cap at 1.0
-
-    # Combine and save the final reduced DataFrame
-    print("Saving final reduced file...")
-    final_df = pd.concat(sampled_rows)
-    final_df.to_csv(output_file, index=False)
-
-    # Clean up the temporary file
-    os.remove(temp_file)
+# Function to downsample a file to a target size in one pass
+def downsize_file(input_file, output_file, target_size_bytes, block_size=16 * 1024 * 1024, seed=None):
+    rng = np.random.default_rng(seed)
+    input_size = os.path.getsize(input_file)
+    compressed = compression_of(input_file) is not None
+
+    with open_input(input_file, buffer_size=block_size) as infile, open_output(output_file) as outfile:
+        header = infile.readline()
+        outfile.write(header)
+        bytes_read = len(header)
+        bytes_written = len(header)
+        carry = b''
+
+        print("Sampling rows...")
+        while True:
+            block = infile.read(block_size)
+            if not block and not carry:
+                break
+            lines = (carry + block).split(b'\n')
+            # Keep the trailing partial line for the next block (it is complete at EOF)
+            carry = lines.pop() if block else b''
+            if not lines:
+                continue
+
+            block_bytes = sum(len(line) for line in lines) + len(lines)
+
+            # Keep probability for this block, from the bytes still wanted and still to read
+            if compressed:
+                # Uncompressed bytes left = this block + compressed bytes left x ratio so far
+                consumed = max(source_tell(infile), 1)
+                ratio = (bytes_read + block_bytes + len(carry)) / consumed
+                remaining_input = max(block_bytes + (input_size - consumed) * ratio, 1)
+            else:
+                remaining_input = max(input_size - bytes_read, 1)
+            keep_fraction = min(max((target_size_bytes - bytes_written) / remaining_input, 0.0), 1.0)
+
+            keep = rng.random(len(lines)) < keep_fraction
+            kept = [line for line, k in zip(lines, keep) if k]
+            if kept:
+                chunk = b'\n'.join(kept) + b'\n'
+                outfile.write(chunk)
+                bytes_written += len(chunk)
+            bytes_read += block_bytes
 
     print(f"Reduced file saved to {output_file}")
     final_size = os.path.getsize(output_file) / (1024 ** 3)
-    print(f"Final file size: {final_size:.2f} GB")
+    print(f"Final file size: {final_size:.2f} GB ({bytes_written / (1024 ** 3):.2f} GB uncompressed)"
+          if compression_of(output_file) else f"Final file size: {final_size:.2f} GB")
 
 # Run the downsizing process
-downsize_file(input_file, output_file, target_size_bytes)
+if __name__ == '__main__':
+    downsize_file(input_file, output_file, target_size_bytes)
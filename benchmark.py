@@ -0,0 +1,230 @@
+"""
+Benchmark suite for the generators and tools.
+
+Builds a synthetic FOCUS-shaped template CSV locally, then runs each hot path at several
+scales and records wall time, throughput (rows/sec) and peak RSS as JSON:
+- `generate_six_months_data` (gen_6_month_mock_data.py)
+- `generate_mock_data` (gen_mock_data_date_range.py), with uniform draws and with a distribution profile
+- `validate_file` (validate.py)
+- `downsize_file` (archive/reduce.py)
+- `extract_random_rows` (archive/extract.py)
+- `convert_csv_to_parquet` (convert.py)
+- `generate_aws_data` (archive/main.py) and the archive six-month generator (archive/gen.py)
+
+The generated six-month file of each scale is the input for the other tools. When those tools
+are selected with `--cases` without the six-month generator (or before it), the file is built
+first, outside the timed cases. Every case runs in a fresh child process, so its peak RSS is
+measured in isolation.
+
+With `--baseline`, throughput is compared against a saved results file and the run fails
+(exit code 1) when any case is slower than the baseline by more than `--tolerance`.
+
+Usage:
+    python benchmark.py --scales 10000 1000000 --output bench.json
+    python benchmark.py --scales 10000 1000000 --baseline bench.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import peak_rss_mb
+from validate import expected_columns
+
+default_scales = [10000, 1000000, 10000000]
+
+def build_template_csv(path, rows=10000, seed=0):
+    """
+    Write a synthetic template CSV with the FOCUS columns and realistic value shapes.
+    """
+    rng = np.random.default_rng(seed)
+    data = {column: np.char.add(f"{column}-", rng.integers(0, 500, rows).astype(str)) for column in expected_columns}
+    for column in ["BilledCost", "ConsumedQuantity", "ContractedCost", "ContractedUnitPrice", "EffectiveCost",
+                   "ListCost", "ListUnitPrice", "PricingQuantity"]:
+        data[column] = np.round(rng.lognormal(1, 2, rows), 6)
+    data["BillingPeriodStart"] = "2024-09-01 00:00:00"
+    data["BillingPeriodEnd"] = "2024-10-01 00:00:00"
+    data["ChargePeriodStart"] = np.char.add("2024-09-", np.char.zfill(rng.integers(1, 29, rows).astype(str), 2))
+    data["ChargePeriodEnd"] = "2024-09-30 00:00:00"
+    data["ProviderName"] = rng.choice(["AWS", "Google Cloud", "Oracle", "Microsoft"], rows)
+    data["Tags"] = np.where(rng.random(rows) < 0.3, '{"env": "prod", "team": "billing"}', "")
+    pd.DataFrame(data, columns=expected_columns).to_csv(path, index=False)
+
+def _generate_six_months(scale, paths, months=6, providers=4):
+    from gen_6_month_mock_data import generate_six_months_data
+    generate_six_months_data(paths["template"], paths["six_months"], rows_per_provider=scale // (months * providers),
+                             months=months, num_workers=1, seed=0)
+
+def build_six_months_file(scale, paths):
+    """
+    Write the six-month file of ``scale`` that the tool cases read, without timing it.
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        _generate_six_months(scale, paths)
+
+def _run_case(name, scale, paths):
+    """
+    Run one benchmark case in this (fresh) process and return its measurements.
+    """
+    months, providers = 6, 4
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        if name == "generate_six_months_data":
+            _generate_six_months(scale, paths, months, providers)
+        elif name in ("generate_mock_data", "generate_mock_data_distributions"):
+            from date_columns import billing_periods
+            from distributions import load_source_profile
+            from gen_mock_data_date_range import generate_mock_data
+            start_date, end_date = datetime(2024, 7, 1), datetime(2024, 12, 31)
+            periods = len(list(billing_periods(start_date, end_date)))
+            distributions = load_source_profile(paths["template"]) if name.endswith("_distributions") else None
+            generate_mock_data(paths["template"], paths["date_range"], start_date, end_date,
+                               scale // (periods * providers), seed=0, distributions=distributions)
+        elif name == "archive_generate_aws_data":
+            from archive.main import generate_aws_data
+            generate_aws_data(paths["template"], paths["archive"], num_rows=scale, seed=0)
+        elif name == "archive_generate_six_months":
+            from archive.gen import generate_six_months_data
+            generate_six_months_data(paths["archive"], rows_per_month=scale // months, months=months, seed=0,
+                                     input_file=paths["template"])
+        elif name == "validate_file":
+            from validate import validate_file
+            validate_file(paths["six_months"], seed=0)
+        elif name == "downsize_file":
+            from archive.reduce import downsize_file
+            downsize_file(paths["six_months"], paths["reduced"], os.path.getsize(paths["six_months"]) / 2, seed=0)
+        elif name == "extract_random_rows":
+            from archive.extract import extract_random_rows
+            extract_random_rows(paths["six_months"], paths["extracted"], num_rows=1000, seed=0)
+        elif name == "convert_csv_to_parquet":
+            from convert import convert_csv_to_parquet
+            convert_csv_to_parquet(paths["six_months"], paths["parquet"])
+        else:
+            raise ValueError(f"Unknown benchmark case: {name}")
+        wall_time = time.perf_counter() - start
+
+    return {
+        "case": name,
+        "rows": scale,
+        "wall_time_s": round(wall_time, 3),
+        "rows_per_s": round(scale / wall_time, 1) if wall_time else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+benchmark_cases = [
+    "generate_six_months_data",
+    "generate_mock_data",
+    "generate_mock_data_distributions",
+    "validate_file",
+    "downsize_file",
+    "extract_random_rows",
+    "convert_csv_to_parquet",
+    "archive_generate_aws_data",
+    "archive_generate_six_months",
+]
+
+# Cases that read the six-month file written by the generate_six_months_data case
+six_months_readers = ["validate_file", "downsize_file", "extract_random_rows", "convert_csv_to_parquet"]
+
+def needs_six_months_file(cases):
+    """
+    True if a case in ``cases`` reads the six-month file before any case has generated it.
+    """
+    for name in cases:
+        if name == "generate_six_months_data":
+            return False
+        if name in six_months_readers:
+            return True
+    return False
+
+def run_benchmarks(scales, workdir, cases=None):
+    """
+    Run every case at every scale and return the list of measurements.
+    """
+    template = os.path.join(workdir, "template.csv")
+    build_template_csv(template)
+    cases = cases or benchmark_cases
+    results = []
+    for scale in scales:
+        paths = {
+            "template": template,
+            "six_months": os.path.join(workdir, f"six-months-{scale}.csv"),
+            "date_range": os.path.join(workdir, f"date-range-{scale}.csv"),
+            "reduced": os.path.join(workdir, f"reduced-{scale}.csv"),
+            "extracted": os.path.join(workdir, f"extracted-{scale}.csv"),
+            "parquet": os.path.join(workdir, f"six-months-{scale}.parquet"),
+            "archive": os.path.join(workdir, f"archive-{scale}.csv"),
+        }
+        if needs_six_months_file(cases):
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                pool.submit(build_six_months_file, scale, paths).result()
+        for name in cases:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                result = pool.submit(_run_case, name, scale, paths).result()
+            print(f"{name:<32} {scale:>10} rows  {result['wall_time_s']:>9.3f} s  "
+                  f"{result['rows_per_s']:>12.0f} rows/s  {result['peak_rss_mb']:>8.1f} MB")
+            results.append(result)
+        for path in paths.values():
+            if path != template and os.path.exists(path):
+                os.remove(path)
+    return results
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Return the cases whose throughput dropped more than ``tolerance`` below the baseline.
+    """
+    previous = {(r["case"], r["rows"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        base = previous.get((result["case"], result["rows"]))
+        if base and base["rows_per_s"] and result["rows_per_s"] < base["rows_per_s"] * (1 - tolerance):
+            regressions.append({
+                "case": result["case"],
+                "rows": result["rows"],
+                "baseline_rows_per_s": base["rows_per_s"],
+                "rows_per_s": result["rows_per_s"],
+            })
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the mock data generators and tools.")
+    parser.add_argument("--scales", type=int, nargs="+", default=default_scales, help="row counts to run")
+    parser.add_argument("--cases", nargs="+", choices=benchmark_cases, default=None)
+    parser.add_argument("--output", default=None, help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=None, help="compare throughput against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed throughput drop (default 0.2 = 20%%)")
+    parser.add_argument("--workdir", default=None, help="directory for temporary files (default: a temp dir)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run_benchmarks(args.scales, args.workdir or tmp, args.cases)
+
+    report = {"created": datetime.now().isoformat(timespec="seconds"), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"Throughput regressions against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression['case']} at {regression['rows']} rows: "
+                      f"{regression['rows_per_s']:.0f} rows/s (baseline {regression['baseline_rows_per_s']:.0f})")
+            return 1
+        print(f"No throughput regressions against {args.baseline}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Checkpointed, resumable generation.
+
+A run is split into deterministic units (month x provider x batch). Each unit has its own
+seed, spawned from the run's master seed by unit index, so a unit generates the same rows no
+matter when or where it runs. With checkpointing on:
+- each unit is written to its own part file in `<output>.parts/`: first to a temporary name,
+  then renamed into place, so a part file either holds the whole unit or does not exist;
+- after the rename the unit is recorded in the manifest `<output>.manifest.json`, which is
+  itself rewritten atomically;
+- once every unit is committed, the parts are concatenated into the output in unit order and
+  the parts directory and manifest are removed.
+
+A rerun after a crash or preemption loads the manifest, skips every committed unit whose
+part file is still intact, and generates only the rest. The output is identical to that of an
+uninterrupted run. The manifest records the run parameters and a fingerprint of the template
+source. A rerun with different parameters is refused rather than mixing two runs. Without an
+explicit seed, the seed drawn for the first attempt is stored in the manifest and reused.
+
+`run_units` is the commit loop both generators use: it generates each pending unit, writes
+and commits its part file, and joins the parts once every unit is in.
+
+Usage:
+    checkpoint = Checkpoint(output_file, {'generator': 'six-months', ...}, seed)
+    rows = run_units(checkpoint, len(units), lambda index: generate(units[index], seeds[index]))
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+from instrumentation import null_instrumentation
+from pipeline import prefetch
+from writers import concatenate_parts, write_part
+
+manifest_version = 1
+
+def new_seed():
+    """
+    Draw a fresh master seed, for runs that record theirs in a manifest so they can be reproduced.
+    """
+    return int(np.random.SeedSequence().entropy)
+
+class Checkpoint:
+    """
+    Manifest of the committed units of one output file.
+    """
+
+    def __init__(self, output_file, params, seed=None):
+        self.output_file = output_file
+        self.manifest_file = f"{output_file}.manifest.json"
+        self.parts_dir = f"{output_file}.parts"
+        self.params = params
+        self.units = {}
+
+        manifest = self._load_manifest()
+        if manifest is not None:
+            if seed is not None and seed != manifest['seed']:
+                raise ValueError(f"{self.manifest_file} was started with seed {manifest['seed']}, not {seed}; "
+                                 f"remove it and {self.parts_dir} to start over")
+            if manifest['params'] != params:
+                raise ValueError(f"{self.manifest_file} was started with different parameters; "
+                                 f"remove it and {self.parts_dir} to start over")
+            self.seed = manifest['seed']
+            self.units = {int(index): unit for index, unit in manifest['units'].items()}
+            print(f"Resuming from {self.manifest_file}: {len(self.units)} units already committed")
+        else:
+            # Without a seed, draw one now so a resumed run regenerates exactly the same units
+            self.seed = seed if seed is not None else new_seed()
+        os.makedirs(self.parts_dir, exist_ok=True)
+        self._save_manifest()
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_file):
+            return None
+        with open(self.manifest_file) as f:
+            manifest = json.load(f)
+        if manifest.get('version') != manifest_version:
+            raise ValueError(f"Unsupported manifest version in {self.manifest_file}")
+        return manifest
+
+    def _save_manifest(self):
+        manifest = {
+            'version': manifest_version,
+            'output_file': self.output_file,
+            'seed': self.seed,
+            'params': self.params,
+            'units': {str(index): unit for index, unit in sorted(self.units.items())},
+        }
+        tmp_file = f"{self.manifest_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(manifest, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.manifest_file)
+
+    def part_file(self, index):
+        ext = os.path.splitext(self.output_file)[1]
+        return os.path.join(self.parts_dir, f"part-{index:05d}{ext}")
+
+    def is_committed(self, index):
+        """
+        True if unit ``index`` is in the manifest and its part file is intact.
+        """
+        unit = self.units.get(index)
+        if unit is None:
+            return False
+        part_file = self.part_file(index)
+        return os.path.exists(part_file) and os.path.getsize(part_file) == unit['bytes']
+
+    def pending(self, num_units):
+        """
+        Indices of the units that still have to be generated, in order.
+        """
+        return [index for index in range(num_units) if not self.is_committed(index)]
+
+    def commit(self, index, rows):
+        """
+        Record unit ``index`` (already renamed into place) as done.
+        """
+        self.units[index] = {'rows': int(rows), 'bytes': os.path.getsize(self.part_file(index))}
+        self._save_manifest()
+
+    @property
+    def rows_committed(self):
+        return sum(unit['rows'] for unit in self.units.values())
+
+    @property
+    def bytes_committed(self):
+        return sum(unit['bytes'] for unit in self.units.values())
+
+    def finish(self, num_units):
+        """
+        Concatenate every unit into the output file and remove the parts and the manifest.
+        """
+        missing = self.pending(num_units)
+        if missing:
+            raise RuntimeError(f"{len(missing)} units are not committed yet (first: {missing[0]})")
+        part_files = [self.part_file(index) for index in range(num_units)]
+        root, ext = os.path.splitext(self.output_file)
+        tmp_file = f"{root}.tmp{ext}"
+        concatenate_parts(part_files, tmp_file, remove=False)
+        os.replace(tmp_file, self.output_file)
+        shutil.rmtree(self.parts_dir)
+        os.remove(self.manifest_file)
+
+def run_units(checkpoint, num_units, generate_unit, instrumentation=null_instrumentation, pipelined=False,
+              label='unit'):
+    """
+    Generate, write and commit every unit not yet committed to ``checkpoint``, then join the parts.
+
+    ``generate_unit(index)`` returns the block of unit ``index``. With ``pipelined`` the next
+    unit is generated in a background thread while the current one is written. Returns the
+    number of rows in the output.
+    """
+    blocks = ((index, generate_unit(index)) for index in checkpoint.pending(num_units))
+    for index, block in prefetch(blocks) if pipelined else blocks:
+        with instrumentation.stage('write'):
+            write_part(block, checkpoint.part_file(index), header=(index == 0))
+        checkpoint.commit(index, len(block))
+        instrumentation.batch_done(len(block), checkpoint.bytes_committed)
+        print(f"Committed {label} {index + 1}/{num_units}, {checkpoint.rows_committed} rows so far")
+    rows = checkpoint.rows_committed
+    with instrumentation.stage('write'):
+        checkpoint.finish(num_units)
+    return rows
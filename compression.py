@@ -0,0 +1,180 @@
+"""
+Compressed CSV input and output.
+
+Output paths ending in `.gz` or `.zst` (e.g. `mock.csv.gz`, `mock.csv.zst`) are compressed on
+the fly. The writers hand their encoded batches to a `BlockCompressor`, which cuts the byte
+stream into independent blocks of `block_size` bytes and compresses them in a thread pool:
+- gzip blocks are complete gzip members (zlib), zstd blocks are complete zstd frames (the codec
+  bundled with pyarrow, so no extra package is needed);
+- both codecs release the GIL, so compression of earlier blocks overlaps with generating and
+  encoding the next batch, and several blocks are compressed at once on multi-core machines;
+- blocks are written in order. Concatenated gzip members and zstd frames are themselves a
+  valid gzip or zstd file, which standard tools (`gzip -d`, `zstd -d`, `pigz`) read, and
+  the independent blocks allow parallel decompression.
+
+Part files of a sharded or checkpointed run are compressed the same way, so joining them byte
+for byte still produces a valid compressed file.
+
+`open_input` opens a plain or compressed file as one binary stream, which is what validate.py
+and archive/reduce.py read. Compressed input is decompressed as a stream, never to disk.
+
+Usage:
+    with open_output('mock.csv.zst') as f:
+        f.write(payload)
+    with open_input('mock.csv.zst') as f:
+        header = f.readline()
+"""
+
+import io
+import os
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pyarrow as pa
+
+# Recognised compression suffixes
+compression_suffixes = {'.gz': 'gzip', '.zst': 'zstd'}
+
+default_levels = {'gzip': 6, 'zstd': 3}
+
+def compression_of(path):
+    """
+    Return 'gzip', 'zstd' or None depending on the suffix of ``path``.
+    """
+    return compression_suffixes.get(os.path.splitext(str(path))[1])
+
+def strip_compression(path):
+    """
+    Return ``path`` without its compression suffix, if it has one.
+    """
+    root, ext = os.path.splitext(str(path))
+    return root if ext in compression_suffixes else str(path)
+
+def compress_block(data, codec, level):
+    """
+    Compress ``data`` into one self-contained gzip member or zstd frame.
+    """
+    if codec == 'gzip':
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    # Codec objects keep internal state, so each block gets its own
+    return pa.Codec('zstd', compression_level=level).compress(data, asbytes=True)
+
+class BlockCompressor:
+    """
+    Binary file-like sink that compresses ``block_size`` blocks in a background thread pool.
+
+    ``tell()`` is the number of compressed bytes written to disk so far.
+    """
+
+    def __init__(self, output_file, codec, level=None, block_size=16 * 1024 * 1024, num_threads=None, append=False):
+        self.codec = codec
+        self.level = default_levels[codec] if level is None else level
+        self.block_size = block_size
+        # Appended blocks are new members/frames, so the file stays valid
+        self._file = open(output_file, 'ab' if append else 'wb')
+        self._buffer = bytearray()
+        num_threads = num_threads or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(max_workers=num_threads)
+        # Bounded so memory stays at a few blocks per thread however fast the producer is
+        self._max_pending = 2 * num_threads
+        self._pending = deque()
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._submit(bytes(self._buffer[:self.block_size]))
+            del self._buffer[:self.block_size]
+        return len(data)
+
+    def _submit(self, block):
+        self._pending.append(self._pool.submit(compress_block, block, self.codec, self.level))
+        while len(self._pending) > self._max_pending:
+            self._file.write(self._pending.popleft().result())
+
+    def tell(self):
+        return self._file.tell()
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            self._file.write(self._pending.popleft().result())
+        self._pool.shutdown()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def open_output(output_file, level=None, append=False):
+    """
+    Open ``output_file`` for binary writing (or appending), compressed if its suffix asks for it.
+    """
+    codec = compression_of(output_file)
+    if codec is None:
+        return open(output_file, 'ab' if append else 'wb')
+    return BlockCompressor(output_file, codec, level, append=append)
+
+class _DecompressingReader(io.RawIOBase):
+    """
+    Raw reader over the decompressed bytes of a gzip or zstd file.
+    """
+
+    def __init__(self, path, codec):
+        self._file = open(path, 'rb')
+        self._stream = pa.CompressedInputStream(self._file, codec)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def source_tell(self):
+        return self._file.tell()
+
+    def close(self):
+        if not self.closed:
+            self._stream.close()
+            self._file.close()
+        super().close()
+
+def open_input(path, start=0, buffer_size=1024 * 1024):
+    """
+    Open ``path`` as a binary stream of its (decompressed) bytes, positioned at ``start``.
+
+    Plain files seek to ``start``; compressed files are decompressed up to it.
+    """
+    codec = compression_of(path)
+    if codec is None:
+        f = open(path, 'rb', buffering=buffer_size)
+        f.seek(start)
+        return f
+    f = io.BufferedReader(_DecompressingReader(path, codec), buffer_size=buffer_size)
+    while start > 0:
+        skipped = len(f.read(min(start, buffer_size)))
+        if not skipped:
+            break
+        start -= skipped
+    return f
+
+def source_tell(f):
+    """
+    Bytes of the file on disk consumed so far by a stream from ``open_input``.
+
+    For compressed input this is the compressed position, which is how far through
+    the file a streaming reader has got.
+    """
+    raw = getattr(f, 'raw', None)
+    if isinstance(raw, _DecompressingReader):
+        return raw.source_tell()
+    return f.tell()
@@ -1,13 +1,35 @@
+"""
+Convert a generated mock CSV file to Parquet in fixed-size chunks.
+
+The CSV is read `row_group_size` rows at a time and each chunk is written as one Parquet
+row group with the typed FOCUS schema from writers.py (float64 costs, timestamp periods,
+dictionary-encoded low-cardinality columns), so no more than one row group is held in memory.
+
+The generators can also write Parquet directly by giving them an output path ending
+in `.parquet`, which skips the CSV round trip entirely.
+
+A `.gz` or `.zst` CSV file is decompressed as a stream while it is read (see compression.py).
+"""
+
 import pandas as pd
 
+from compression import open_input
+from writers import ParquetBatchWriter
+
 # Define file paths
 csv_file = "go/mock-custom-dates-opt.csv"  # Output CSV from your Go script
 parquet_file = "go/mock-custom-dates-opt.parquet"
 
-# Load CSV into Pandas
-df = pd.read_csv(csv_file, dtype=str)  # Read as strings to prevent dtype issues
+def convert_csv_to_parquet(csv_file, parquet_file, row_group_size=1000000):
+    # Read as strings so the writer does the typing consistently for every chunk
+    with open_input(csv_file) as source, \
+            pd.read_csv(source, dtype=str, chunksize=row_group_size) as reader, \
+            ParquetBatchWriter(parquet_file) as writer:
+        for chunk in reader:
+            writer.write(chunk)
+            print(f"Converted {writer.rows_written} rows...")
 
-# Save as Parquet
-df.to_parquet(parquet_file, engine='pyarrow', index=False)
+    print(f"✅ Converted {csv_file} to {parquet_file}")
 
-print(f"✅ Converted {csv_file} to {parquet_file}")
+if __name__ == "__main__":
+    convert_csv_to_parquet(csv_file, parquet_file)
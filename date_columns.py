@@ -0,0 +1,69 @@
+"""
+Date column helpers for the generators.
+
+Each month block only contains a handful of distinct dates, so nothing here works per row:
+- `billing_periods` yields the (start, end) boundaries of each month block, either with the
+  original fixed 30-day step or on real calendar month boundaries.
+- `format_timestamp` formats a boundary once and caches the string; the generators then
+  broadcast it to the whole block.
+- `shift_dates` moves a template date column back by whole months by parsing, shifting and
+  formatting only its distinct values and mapping them back through the factorized codes.
+"""
+
+import calendar
+from datetime import timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+timestamp_format = "%Y-%m-%d %H:%M:%S"
+
+@lru_cache(maxsize=4096)
+def format_timestamp(value):
+    """
+    Format a datetime as used in the FOCUS billing and charge period columns.
+    """
+    return value.strftime(timestamp_format)
+
+def add_months(value, months):
+    """
+    Add ``months`` calendar months to ``value``, clamping the day to the target month's length.
+    """
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    day = min(value.day, calendar.monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+def billing_periods(start_date, end_date, calendar_months=False):
+    """
+    Yield (period_start, period_end) for each month block starting on or before ``end_date``.
+
+    By default blocks are 30 days long, as in the original scripts. With
+    ``calendar_months`` each block runs to the same day of the next calendar month;
+    boundaries are computed from ``start_date`` so month-end days do not drift.
+    """
+    month = 0
+    current = start_date
+    while current <= end_date:
+        month += 1
+        period_end = add_months(start_date, month) if calendar_months else current + timedelta(days=30)
+        yield current, period_end
+        current = period_end
+
+def shift_dates(values, months_back, calendar_months=False):
+    """
+    Shift a column of timestamp strings back by ``months_back`` months.
+
+    A month is 30 days unless ``calendar_months`` is set. Only the distinct values are
+    parsed and formatted. Missing or unparsable values come back as NaN.
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format=timestamp_format, errors='coerce')
+    if calendar_months:
+        shifted = parsed - pd.DateOffset(months=months_back)
+    else:
+        shifted = parsed - pd.Timedelta(days=30 * months_back)
+    formatted = np.append(shifted.dt.strftime(timestamp_format).to_numpy(dtype=object), np.nan)
+    # Code -1 (missing) picks the trailing NaN
+    return formatted[codes]
@@ -0,0 +1,270 @@
+"""
+Distribution profiles learned from the source data.
+
+By default the generators draw every numeric column uniformly between hard-coded bounds. A
+distribution profile instead captures how the source file's costs and quantities are really
+distributed, per (ProviderName, ServiceName) group, so generated data has realistic skew and
+cardinality.
+
+Profile contents:
+- For every group and profiled column, an inverse-CDF lookup table: the column's quantiles at
+  `num_quantiles` evenly spaced probabilities. Heavy tails (log-normal like costs) are kept as
+  they are, since the table is only interpolated between neighbouring quantiles.
+- Derived columns are stored as quantiles of their ratio to a base column and drawn as
+  base x ratio, which keeps the source's correlation between them: BilledCost, ContractedCost
+  and ListCost follow EffectiveCost (with ListCost >= EffectiveCost enforced by a minimum
+  ratio of 1), and PricingQuantity follows ConsumedQuantity.
+- Groups with fewer than `min_group_rows` rows are not kept. Lookups fall back from
+  (provider, service) to (*, service), then (provider, *), then (*, *), and a sparse column
+  in a kept group uses the table of its fallback group.
+- Row counts per group, which give each provider's service mix.
+
+Sampling is vectorized over the whole block: one uniform draw per value, then a gather of the
+quantile below it and the step to the next one from the flattened (group, column, quantile)
+table, and a linear interpolation. That is a few array operations per column, about as many
+as the uniform path.
+
+Profiles are saved as compressed `.npz` files (float32 tables). `load_source_profile` fits the
+profile of a source file once and caches it in `.template-cache/` next to the template cache,
+keyed by the same source fingerprint.
+
+Usage:
+    profile = fit_profile('focus-data-full.csv')
+    profile.save('focus.profile.npz')
+    profile.fill_block(block, 'AWS', block['ServiceName'], rng)  # EffectiveCost, ListCost, ... in place
+"""
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from template_store import cache_dir_name, load_template_store, source_fingerprint
+
+# (column, base column, minimum ratio to the base). Base columns come before the columns derived from them.
+profile_columns = [
+    ('EffectiveCost', None, None),
+    ('ListCost', 'EffectiveCost', 1.0),
+    ('BilledCost', 'EffectiveCost', None),
+    ('ContractedCost', 'EffectiveCost', None),
+    ('ConsumedQuantity', None, None),
+    ('PricingQuantity', 'ConsumedQuantity', None),
+    ('ListUnitPrice', None, None),
+    ('ContractedUnitPrice', None, None),
+]
+
+any_value = '*'
+
+class DistributionProfile:
+    """
+    Per-(provider, service) inverse-CDF tables for the numeric columns.
+    """
+
+    def __init__(self, columns, bases, min_ratios, providers, services, counts, tables):
+        self.columns = list(columns)
+        self.bases = list(bases)
+        self.min_ratios = np.asarray(min_ratios, dtype=np.float64)
+        self.providers = list(providers)
+        self.services = list(services)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.tables = np.asarray(tables, dtype=np.float32)
+        self.group_index = {key: index for index, key in enumerate(zip(self.providers, self.services))}
+        # Flattened quantiles and steps to the next quantile, for 1-D gathers in sample()
+        quantiles = self.tables.astype(np.float64)
+        self._lows = quantiles.ravel()
+        self._steps = np.diff(quantiles, axis=2, append=quantiles[:, :, -1:]).ravel()
+
+    @property
+    def num_quantiles(self):
+        return self.tables.shape[2]
+
+    @property
+    def fingerprint(self):
+        return hashlib.sha256(self.tables.tobytes()).hexdigest()[:16]
+
+    def group_of(self, provider, service):
+        """
+        Index of the most specific group kept for (provider, service).
+        """
+        for key in ((provider, service), (any_value, service), (provider, any_value), (any_value, any_value)):
+            if key in self.group_index:
+                return self.group_index[key]
+        raise KeyError("Profile has no (*, *) group")
+
+    def group_codes(self, provider, services):
+        """
+        Group index for every row of one provider, given the rows' service names.
+        """
+        codes, uniques = pd.factorize(pd.Series(services, dtype=object))
+        # Code -1 (missing service) picks the trailing provider-level group
+        groups = [self.group_of(provider, service) for service in uniques] + [self.group_of(provider, None)]
+        return np.asarray(groups, dtype=np.intp)[codes]
+
+    def service_mix(self, provider):
+        """
+        Return (service names, probabilities) of ``provider`` in the source, or None if it has no kept groups.
+        """
+        names = [s for p, s in zip(self.providers, self.services) if p == provider and s != any_value]
+        if not names:
+            return None
+        counts = np.array([self.counts[self.group_index[(provider, name)]] for name in names], dtype=np.float64)
+        return names, counts / counts.sum()
+
+    def sample_services(self, provider, n, rng, default_names):
+        """
+        Draw ``n`` service names with ``provider``'s service mix in the source, or uniformly from ``default_names``.
+        """
+        mix = self.service_mix(provider)
+        if mix is None:
+            return rng.choice(default_names, size=n)
+        names, probabilities = mix
+        return np.asarray(names, dtype=object)[rng.choice(len(names), size=n, p=probabilities)]
+
+    def sample(self, codes, rng):
+        """
+        Draw one value per row for every profiled column, from the group given by ``codes``.
+        """
+        num_quantiles = self.num_quantiles
+        # random() < 1, so the quantile below is at most the second to last one
+        fractions = rng.random((len(self.columns), len(codes))) * (num_quantiles - 1)
+        lower = fractions.astype(np.intp)
+        fractions -= lower
+        offsets = np.asarray(codes, dtype=np.intp) * (len(self.columns) * num_quantiles)
+
+        values = {}
+        for index, column in enumerate(self.columns):
+            at = lower[index]
+            at += offsets + index * num_quantiles
+            drawn = self._lows.take(at)
+            drawn += fractions[index] * self._steps.take(at)
+            base = self.bases[index]
+            if base:
+                if not np.isnan(self.min_ratios[index]):
+                    np.maximum(drawn, self.min_ratios[index], out=drawn)
+                base_values = values[base]
+                drawn = np.where(base_values > 0, base_values * drawn, base_values)
+            values[column] = drawn
+        return values
+
+    def save(self, path):
+        """
+        Save the profile as a compressed .npz file.
+        """
+        np.savez_compressed(
+            path,
+            columns=np.array(self.columns), bases=np.array([base or '' for base in self.bases]),
+            min_ratios=self.min_ratios,
+            providers=np.array(self.providers), services=np.array(self.services),
+            counts=self.counts, tables=self.tables,
+        )
+
+    def fill_block(self, block, provider, services, rng, decimals=2):
+        """
+        Overwrite every profiled column of ``block`` with draws for its rows, rounded to ``decimals``.
+        """
+        for column, values in self.sample(self.group_codes(provider, services), rng).items():
+            block[column] = np.round(values, decimals)
+
+def load_profile(path):
+    """
+    Load a profile saved with DistributionProfile.save.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        return DistributionProfile(
+            data['columns'].tolist(), [base or None for base in data['bases'].tolist()], data['min_ratios'],
+            data['providers'].tolist(), data['services'].tolist(), data['counts'], data['tables'],
+        )
+
+def _float_column(column):
+    """
+    Parse a dictionary-encoded text column as floats, parsing each distinct value once.
+    """
+    column = column.combine_chunks()
+    dictionary = pd.to_numeric(pd.Series(column.dictionary.to_pylist(), dtype=object), errors='coerce')
+    dictionary = np.append(dictionary.to_numpy(dtype=np.float64), np.nan)
+    # Null entries pick the trailing NaN
+    indices = pc.fill_null(column.indices, len(column.dictionary)).to_numpy()
+    return dictionary[indices]
+
+def _text_column(table, name):
+    if name not in table.column_names:
+        return np.full(table.num_rows, None, dtype=object)
+    return table[name].cast(pa.string()).to_numpy(zero_copy_only=False)
+
+def fit_profile(source_file, num_quantiles=257, min_group_rows=30):
+    """
+    Fit a DistributionProfile to the numeric columns of ``source_file``.
+    """
+    table = load_template_store(source_file).table
+    providers = _text_column(table, 'ProviderName')
+    services = _text_column(table, 'ServiceName')
+
+    specs = [(column, base, ratio) for column, base, ratio in profile_columns if column in table.column_names]
+    raw = {column: _float_column(table[column]) for column, _, _ in specs}
+    columns, bases, min_ratios, samples = [], [], [], []
+    for column, base, min_ratio in specs:
+        values = raw[column]
+        if base is not None and base in columns:
+            # Ratios to the base, from rows where both are usable
+            usable = (raw[base] > 0) & (values >= 0)
+            values = np.where(usable, values / np.where(usable, raw[base], 1.0), np.nan)
+        else:
+            base, min_ratio = None, None
+        if not np.isfinite(values).any():
+            continue
+        columns.append(column)
+        bases.append(base)
+        min_ratios.append(np.nan if min_ratio is None else min_ratio)
+        samples.append(values)
+
+    # Groups from the most general to the most specific, so every fallback is fitted first
+    frame = pd.DataFrame({'provider': providers, 'service': services})
+    keys = [(any_value, any_value)]
+    for level in (['service'], ['provider'], ['provider', 'service']):
+        sizes = frame.dropna(subset=level).groupby(level).size()
+        for key, size in sizes.items():
+            if size >= min_group_rows:
+                key = key if isinstance(key, tuple) else (key,)
+                keys.append((key[0] if level[0] == 'provider' else any_value,
+                             key[-1] if level[-1] == 'service' else any_value))
+
+    probabilities = np.linspace(0, 1, num_quantiles)
+    profile = DistributionProfile(columns, bases, min_ratios, [], [], [], np.zeros((0, len(columns), num_quantiles)))
+    group_tables, group_counts = [], []
+    for provider, service in keys:
+        rows = np.ones(len(frame), dtype=bool)
+        if provider != any_value:
+            rows &= providers == provider
+        if service != any_value:
+            rows &= services == service
+        tables = np.empty((len(columns), num_quantiles))
+        for index, values in enumerate(samples):
+            values = values[rows]
+            values = values[np.isfinite(values)]
+            if len(values) >= min_group_rows or (provider, service) == (any_value, any_value):
+                tables[index] = np.quantile(values, probabilities)
+            else:
+                tables[index] = group_tables[profile.group_of(provider, service)][index]
+        group_tables.append(tables)
+        group_counts.append(int(rows.sum()))
+        profile.group_index[(provider, service)] = len(group_tables) - 1
+
+    return DistributionProfile(columns, bases, min_ratios, [p for p, _ in keys], [s for _, s in keys],
+                               group_counts, np.stack(group_tables))
+
+def load_source_profile(source_file, cache_dir=None):
+    """
+    Return the profile of ``source_file``, fitting and caching it on first use.
+    """
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(source_file)), cache_dir_name)
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_file = os.path.join(cache_dir, f"{os.path.basename(source_file)}.{source_fingerprint(source_file)}.profile.npz")
+    if not os.path.exists(cache_file):
+        print(f"Fitting distribution profile for {source_file}...")
+        tmp_file = f"{cache_file}.tmp.npz"
+        fit_profile(source_file).save(tmp_file)
+        os.replace(tmp_file, cache_file)
+    return load_profile(cache_file)
@@ -0,0 +1,228 @@
+"""
+Correlated entity model: billing accounts -> sub-accounts -> resources.
+
+By default every row gets independent random account, sub-account and resource values, so
+group-by and join benchmarks over the mock data only ever see near-unique keys. With an
+entity model each provider instead gets a fixed entity graph, built once per run, and rows
+are drawn from it:
+
+- `accounts` billing accounts, `sub_accounts` sub-accounts each belonging to one account,
+  and `resources` resources each belonging to one sub-account. There must be at least as many
+  sub-accounts as accounts and resources as sub-accounts: every parent gets one child, and the
+  others are assigned at random, so fan-out varies.
+- Every resource has a fixed region, service and SKU (one of `skus_per_service` SKUs of its
+  service) and a fixed set of Tags (see id_columns.TagPool), so a resource's rows always agree.
+  Regions are whole rows of RegionName with, when given, their RegionId and AvailabilityZone,
+  so the three region columns of a row never contradict each other.
+- The graph is stored as integer-indexed arrays: each level holds its IDs and names, plus the
+  index of its parent, and resources hold indices into the region, service, SKU and Tags tables.
+  Memory is proportional to the number of entities, not rows.
+- Rows pick resources with a Zipf-like popularity: the resource of rank k is drawn with weight
+  1 / k ** `skew`, over a random ranking of the resources. `skew` 0 is uniform; around 1 a few
+  hot resources (and through them their sub-accounts and accounts) dominate, as in real bills.
+  Sampling is one uniform draw and one binary search per row, and every column is then
+  filled with array lookups. Columns are categoricals over the graph's tables, so writers
+  only encode each distinct ID once.
+
+Graphs are seeded from the run's seed on a stream of their own, so every unit, worker process
+and appended month of a run sees the same entities.
+
+Usage:
+    model = EntityModel(accounts=20, sub_accounts=200, resources=50000, skew=1.1)
+    regions = pd.DataFrame({'RegionName': ['US East (N. Virginia)', ...], 'RegionId': ['us-east-1', ...]})
+    graphs = model.build_graphs(providers, seed, services={'AWS': ['Amazon EC2', ...], ...}, regions=regions)
+    graphs['AWS'].fill_block(block, graphs['AWS'].sample(len(block), rng))
+"""
+
+import numpy as np
+import pandas as pd
+
+from id_columns import TagPool, numeric_id_column, uuid4_column
+
+# Spawn key of the graph streams; unit seeds use one-element spawn keys, so they never collide
+_entity_stream = 0x656E74
+
+class EntityGraph:
+    """
+    One provider's accounts, sub-accounts and resources as integer-indexed arrays.
+    """
+
+    def __init__(self, account_ids, account_names, sub_account_ids, sub_account_names, sub_account_parent,
+                 resource_ids, resource_names, resource_parent, resource_region, resource_service, resource_sku,
+                 resource_tags, region_names, region_ids, availability_zones, services, sku_ids, sku_price_ids, tags,
+                 popularity):
+        self.account_ids = account_ids
+        self.account_names = account_names
+        self.sub_account_ids = sub_account_ids
+        self.sub_account_names = sub_account_names
+        self.sub_account_parent = sub_account_parent
+        self.resource_ids = resource_ids
+        self.resource_names = resource_names
+        self.resource_parent = resource_parent
+        self.resource_region = resource_region
+        self.resource_service = resource_service
+        self.resource_sku = resource_sku
+        self.resource_tags = resource_tags
+        # Region tables share their index; region_ids and availability_zones are None when not given
+        self.region_names = region_names
+        self.region_ids = region_ids
+        self.availability_zones = availability_zones
+        self.services = services
+        self.sku_ids = sku_ids
+        self.sku_price_ids = sku_price_ids
+        self.tags = tags
+        # Cumulative popularity of the resources, for sample()
+        self.popularity = popularity
+        # Text tables as (codes, distinct values), so fill_block emits categoricals the writers factorize cheaply
+        self._dictionaries = {}
+
+    def _column(self, table, indices):
+        """
+        The values of the text table ``table`` at ``indices``, as a categorical.
+        """
+        if table not in self._dictionaries:
+            codes, uniques = pd.factorize(getattr(self, table))
+            self._dictionaries[table] = (codes, pd.Index(uniques, dtype=object))
+        codes, uniques = self._dictionaries[table]
+        return pd.Categorical.from_codes(codes[indices], categories=uniques, validate=False)
+
+    @property
+    def num_resources(self):
+        return len(self.resource_ids)
+
+    def sample(self, n, rng):
+        """
+        Draw the resource index of ``n`` rows by popularity.
+        """
+        picks = np.searchsorted(self.popularity, rng.random(n) * self.popularity[-1], side='right')
+        return np.minimum(picks, self.num_resources - 1)
+
+    def service_names(self, resources):
+        """
+        Service name of each resource in ``resources``.
+        """
+        return self.services[self.resource_service[resources]]
+
+    def fill_block(self, block, resources):
+        """
+        Overwrite the account, sub-account, resource, region, service, SKU and Tags columns of ``block``.
+
+        The region columns are RegionName, plus RegionId and AvailabilityZone when the graph has them.
+        """
+        sub_accounts = self.resource_parent[resources]
+        accounts = self.sub_account_parent[sub_accounts]
+        regions = self.resource_region[resources]
+        skus = self.resource_sku[resources]
+        block['BillingAccountId'] = self._column('account_ids', accounts)
+        block['BillingAccountName'] = self._column('account_names', accounts)
+        block['SubAccountId'] = self._column('sub_account_ids', sub_accounts)
+        block['SubAccountName'] = self._column('sub_account_names', sub_accounts)
+        block['ResourceId'] = self._column('resource_ids', resources)
+        block['ResourceName'] = self._column('resource_names', resources)
+        block['RegionName'] = self._column('region_names', regions)
+        if self.region_ids is not None:
+            block['RegionId'] = self._column('region_ids', regions)
+        if self.availability_zones is not None:
+            block['AvailabilityZone'] = self._column('availability_zones', regions)
+        block['ServiceName'] = self._column('services', self.resource_service[resources])
+        block['SkuId'] = self._column('sku_ids', skus)
+        block['SkuPriceId'] = self._column('sku_price_ids', skus)
+        block['Tags'] = self._column('tags', self.resource_tags[resources])
+
+def _assign_parents(children, parents, rng):
+    """
+    Parent index of each child: every parent gets one child first, the rest are random.
+
+    Needs at least as many ``children`` as ``parents`` (see EntityModel).
+    """
+    assigned = np.concatenate([np.arange(parents), rng.integers(0, parents, size=children - parents)])
+    return rng.permutation(assigned).astype(np.int32)
+
+class EntityModel:
+    """
+    Cardinalities and skew of the entity graph built for each provider.
+    """
+
+    def __init__(self, accounts=10, sub_accounts=100, resources=10000, skew=1.0, skus_per_service=20):
+        if min(accounts, sub_accounts, resources, skus_per_service) < 1:
+            raise ValueError("Entity counts must be at least 1")
+        if sub_accounts < accounts or resources < sub_accounts:
+            raise ValueError(f"Every parent needs a child: got {accounts} accounts, {sub_accounts} sub-accounts "
+                             f"and {resources} resources")
+        if skew < 0:
+            raise ValueError(f"skew must not be negative, got {skew}")
+        self.accounts = accounts
+        self.sub_accounts = sub_accounts
+        self.resources = resources
+        self.skew = skew
+        self.skus_per_service = skus_per_service
+
+    @property
+    def params(self):
+        """
+        The model's settings, for checkpoint and manifest parameters.
+        """
+        return {
+            'accounts': self.accounts, 'sub_accounts': self.sub_accounts, 'resources': self.resources,
+            'skew': self.skew, 'skus_per_service': self.skus_per_service,
+        }
+
+    def build_graph(self, rng, services, regions, service_weights=None, company_names=None):
+        """
+        Build one provider's EntityGraph, drawing each resource's service with ``service_weights``.
+
+        ``regions`` is a DataFrame of region rows: a RegionName column and optionally RegionId
+        and AvailabilityZone columns. Each resource gets one whole row.
+        """
+        services = np.asarray(services, dtype=object)
+        region_columns = {column: regions[column].to_numpy(dtype=object) if column in regions else None
+                          for column in ('RegionName', 'RegionId', 'AvailabilityZone')}
+        if company_names is None or not len(company_names):
+            company_names = np.char.add('Account ', np.arange(self.accounts).astype(str)).astype(object)
+
+        account_ids = numeric_id_column(self.accounts, 13, rng).astype(object)
+        account_names = np.asarray(company_names, dtype=object)[rng.integers(0, len(company_names), self.accounts)]
+        sub_account_parent = _assign_parents(self.sub_accounts, self.accounts, rng)
+        sub_account_ids = numeric_id_column(self.sub_accounts, 11, rng).astype(object)
+        sub_account_names = np.char.add(account_names[sub_account_parent].astype(str),
+                                        np.char.add(' ', np.arange(self.sub_accounts).astype(str))).astype(object)
+
+        resource_parent = _assign_parents(self.resources, self.sub_accounts, rng)
+        resource_ids = uuid4_column(self.resources, rng).astype(object)
+        resource_names = np.char.add('resource-', np.arange(self.resources).astype(str)).astype(object)
+        resource_region = rng.integers(0, len(regions), self.resources).astype(np.int32)
+        resource_service = rng.choice(len(services), size=self.resources, p=service_weights).astype(np.int32)
+        # Each service has its own SKUs; resource_sku indexes the (service, SKU) table
+        resource_sku = (resource_service * self.skus_per_service
+                        + rng.integers(0, self.skus_per_service, self.resources)).astype(np.int32)
+        num_skus = len(services) * self.skus_per_service
+        sku_ids = uuid4_column(num_skus, rng).astype(object)
+        sku_price_ids = uuid4_column(num_skus, rng).astype(object)
+        resource_tags, tags = pd.factorize(TagPool().column(self.resources, rng))
+
+        weights = 1.0 / np.arange(1, self.resources + 1, dtype=np.float64) ** self.skew
+        popularity = np.cumsum(weights[rng.permutation(self.resources)])
+
+        return EntityGraph(
+            account_ids, account_names, sub_account_ids, sub_account_names, sub_account_parent,
+            resource_ids, resource_names, resource_parent, resource_region, resource_service, resource_sku,
+            resource_tags.astype(np.int32), region_columns['RegionName'], region_columns['RegionId'],
+            region_columns['AvailabilityZone'], services, sku_ids, sku_price_ids,
+            np.asarray(tags, dtype=object), popularity,
+        )
+
+    def build_graphs(self, providers, seed, services, regions, service_weights=None, company_names=None):
+        """
+        Build the graph of every provider, seeded from ``seed`` by the provider's position.
+
+        ``services`` and ``service_weights`` map each provider to its service names and their
+        probabilities (None for uniform). ``regions`` is the DataFrame of region rows shared by
+        every provider (see build_graph).
+        """
+        service_weights = service_weights or {}
+        graphs = {}
+        for index, provider in enumerate(providers):
+            rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(_entity_stream, index)))
+            graphs[provider] = self.build_graph(rng, services[provider], regions, service_weights.get(provider),
+                                                company_names)
+        return graphs
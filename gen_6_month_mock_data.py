@@ -7,7 +7,8 @@ a balanced and realistic data distribution.
 Key Features:
 1. **6-Month Data Generation**: Takes a single month of data and extrapolates it across a 6-month period.
 2. **Balanced Provider Representation**: Ensures all major cloud providers (AWS, Google Cloud, Oracle, Microsoft) are represented.
-3. **Efficient Processing**: Utilizes chunk processing and multiprocessing to handle large files effectively.
+3. **Efficient Processing**: Loads the input once (or a uniform sample of it) and streams exactly the requested
+   number of rows, optionally across a process pool.
 4. **Customizable Output**: Allows configuration of the number of rows per provider and number of months.
 
 Usage:
@@ -19,74 +20,364 @@ Parameters:
 - `output_file`: Path to save the generated 6-month dataset.
 - `rows_per_provider`: Number of rows to generate for each provider per month (default is 1000).
 - `months`: Number of months to generate (default is 6).
-- `num_workers`: Number of parallel workers for multiprocessing (default is 4).
+- `num_workers`: Number of parallel workers for multiprocessing (default is 1, a serial run).
+- `max_templates`: If set, keep only a uniform random sample of this many input rows as templates,
+  drawn across all input chunks, so very large inputs never have to fit in memory (default: all rows).
+- `seed`: Master seed; the same seed always produces the same output file.
+- `calendar_months`: Shift each month back by a real calendar month instead of 30 days (default False).
+- `distributions`: Optional `DistributionProfile` (see distributions.py). The cost and quantity columns
+  are then drawn from the source's distributions for each row's provider and service, with
+  ListCost >= EffectiveCost and the other cost columns correlated with EffectiveCost, instead of
+  ConsumedQuantity and BilledCost being drawn uniformly (default None).
+- `entities`: Optional `EntityModel` (see entities.py). Each provider then gets a fixed graph of billing
+  accounts -> sub-accounts -> resources, with services, regions and account names taken from the
+  templates, and every row belongs to a resource drawn with Zipf-like popularity, which fixes its
+  account, region, service, SKU and Tags columns (default None).
+- `options`: Optional `OutputOptions` (see run_options.py) choosing how the output is written (default None):
+  - `checkpoint`: Record every finished shard in a manifest so an interrupted run can be resumed by
+    rerunning it with the same arguments (see checkpoint.py).
+  - `pipelined`: Run generation, serialization and the disk write in three overlapping threads
+    connected by bounded queues (see pipeline.py). The output is unchanged. Needs `num_workers=1`.
+  - `partitioned`: Write `output_file` as a directory of Hive-style partitions
+    (`BillingMonth=YYYY-MM/ProviderName=.../part-*.<file_format>`) with files of about
+    `target_file_size` bytes and a `_manifest.json` of per-file row counts and min/max statistics
+    (see partitioned.py). Each month/provider is one task of the process pool.
+  - `total_rows`: Write exactly this many rows in total, spread evenly over the months and providers,
+    instead of `rows_per_provider` each.
+  - `target_size`: Write about this many bytes (uncompressed for CSV output) instead of a fixed row
+    count. Shards are sized online from the bytes per row written so far, aiming within `size_tolerance`
+    of the target, and a warning is printed when the output misses it (see sizing.py). Needs a serial run (`num_workers=1`, no checkpoint,
+    pipeline or partitioned output).
+- `instrumentation`: Optional `Instrumentation` (see instrumentation.py) for per-stage timings and
+  throughput as JSON lines. Stages are timed in-process; pool workers only report progress.
 
 Output:
-- A new CSV file containing 6 months of extended mock data with balanced cloud provider representation.
+- A new CSV file containing 6 months of extended mock data with balanced cloud provider representation,
+  or a typed Parquet file (one row group per shard) when `output_file` ends in `.parquet`.
+
+Output Volume:
+- Exactly `months` x 4 providers x `rows_per_provider` rows (or `total_rows`) are written, independent of the
+  input size, unless template rows with unparsable billing dates are dropped.
+  The work is split into (month, provider, row-range) shards of at most `shard_rows` rows, each
+  generated as one vectorized block and streamed to disk before the next one starts.
+
+Process-Pool Mode:
+- With `num_workers` > 1 the shards run in a process pool. Each shard gets its own seed spawned
+  from the master `seed` and writes its own part file; the parts are concatenated in shard order.
+- Shard boundaries and seeds do not depend on the worker count, so the same seed always produces
+  the same rows, with or without the pool. CSV and Parquet files are byte-identical; `.gz` and `.zst`
+  files only decompress to identical content, because the pool compresses each part file on its own
+  while a serial run compresses across shards.
 
 """
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
+import numpy as np
 import pandas as pd
-import random
-from datetime import datetime, timedelta
 
-def generate_mock_row(row, provider, month_offset):
+from checkpoint import run_units
+from date_columns import shift_dates
+from instrumentation import null_instrumentation
+from partitioned import write_units
+from pipeline import write_batches
+from run_options import OutputOptions, run_params, run_seed
+from sizing import SizeTarget, report_size, split_rows
+from template_store import load_template_store
+from writers import concatenate_parts, open_writer, write_part
+
+# List of providers
+providers = ['AWS', 'Google Cloud', 'Oracle', 'Microsoft']
+
+# Template rows, distribution profile and entity graphs shared with each pool worker by _init_worker
+_templates = None
+_distributions = None
+_entities = None
+
+def load_templates(input_file, max_templates=None, seed=None, chunksize=10000):
+    """
+    Load the template rows once.
+
+    By default this is the cached, memory-mapped TemplateStore (see template_store.py).
+    With ``max_templates`` set, the input is streamed in chunks and a uniform sample
+    of ``max_templates`` rows is kept across all chunks: every row gets a random key
+    and only the rows with the smallest keys seen so far are retained.
+    """
+    if max_templates is None:
+        return load_template_store(input_file)
+
+    rng = np.random.default_rng(seed)
+    sample = None
+    with pd.read_csv(input_file, dtype=str, chunksize=chunksize) as reader:
+        for chunk in reader:
+            chunk = chunk.assign(_sample_key=rng.random(len(chunk)))
+            if sample is not None:
+                chunk = pd.concat([sample, chunk])
+            sample = chunk.nsmallest(max_templates, '_sample_key')
+    return sample.sort_index().drop(columns='_sample_key').reset_index(drop=True)
+
+def generate_mock_block(templates, provider, month, n, rng, calendar_months=False,
+                        instrumentation=null_instrumentation, distributions=None, entities=None):
+    """
+    Generate ``n`` mock rows for one provider, shifted ``month`` months back, as whole columns.
+
+    With a ``distributions`` profile the numeric columns are drawn from it for each
+    row's template service instead of uniformly. With ``entities`` (a dict of
+    EntityGraph by provider) each row belongs to a resource of the provider's graph,
+    which also fixes the service the numeric columns are drawn for.
+
+    Rows whose billing dates cannot be parsed are dropped with a warning.
     """
-    Generate a single mock row with adjusted dates and provider-specific values.
+    with instrumentation.stage('template_sampling'):
+        block = templates.take(rng.integers(0, len(templates), size=n)).reset_index(drop=True)
+
+    # Adjust the dates for the block (only the distinct template dates are parsed)
+    with instrumentation.stage('date_fill'):
+        block['BillingPeriodStart'] = shift_dates(block['BillingPeriodStart'], month, calendar_months)
+        block['BillingPeriodEnd'] = shift_dates(block['BillingPeriodEnd'], month, calendar_months)
+
+    if entities is not None:
+        with instrumentation.stage('entity_fill'):
+            graph = entities[provider]
+            graph.fill_block(block, graph.sample(n, rng))
+
+    # Update provider-specific fields
+    with instrumentation.stage('numeric_fill'):
+        block['ProviderName'] = provider
+        if distributions is None:
+            block['ConsumedQuantity'] = np.round(rng.uniform(1, 1000, n), 2)
+            block['BilledCost'] = np.round(rng.uniform(0.1, 100, n), 2)
+        else:
+            distributions.fill_block(block, provider, block['ServiceName'], rng)
+
+    invalid = block['BillingPeriodStart'].isna() | block['BillingPeriodEnd'].isna()
+    if invalid.any():
+        print(f"Error processing {invalid.sum()} rows: invalid BillingPeriodStart/BillingPeriodEnd")
+        block = block[~invalid]
+    return block
+
+def plan_shards(rows_per_provider, months, shard_rows, total_rows=None):
     """
-    try:
-        # Adjust the dates for the row
-        start_date = datetime.strptime(row['BillingPeriodStart'], "%Y-%m-%d %H:%M:%S")
-        end_date = datetime.strptime(row['BillingPeriodEnd'], "%Y-%m-%d %H:%M:%S")
-        start_date -= timedelta(days=month_offset)
-        end_date -= timedelta(days=month_offset)
+    Split the work into (month, provider, row_start, row_stop) shards in output order.
 
-        row['BillingPeriodStart'] = start_date.strftime("%Y-%m-%d %H:%M:%S")
-        row['BillingPeriodEnd'] = end_date.strftime("%Y-%m-%d %H:%M:%S")
+    With ``total_rows`` the month/provider blocks share exactly that many rows instead of
+    ``rows_per_provider`` each.
+    """
+    blocks = [(month, provider) for month in range(months) for provider in providers]
+    block_rows = [rows_per_provider] * len(blocks) if total_rows is None else split_rows(total_rows, len(blocks))
+    shards = []
+    for block, rows in zip(blocks, block_rows):
+        for row_start in range(0, rows, shard_rows):
+            shards.append(block + (row_start, min(row_start + shard_rows, rows)))
+    return shards
 
-        # Update provider-specific fields
-        row['ProviderName'] = provider
-        row['ConsumedQuantity'] = round(random.uniform(1, 1000), 2)
-        row['BilledCost'] = round(random.uniform(0.1, 100), 2)
+def generate_shard(templates, shard, seed_seq, calendar_months=False, instrumentation=null_instrumentation,
+                   distributions=None, entities=None):
+    """
+    Generate the block for one shard with its own random stream.
+    """
+    month, provider, row_start, row_stop = shard
+    rng = np.random.default_rng(seed_seq)
+    return generate_mock_block(templates, provider, month, row_stop - row_start, rng, calendar_months, instrumentation,
+                               distributions, entities)
 
-    except Exception as e:
-        print(f"Error processing row: {e}")
-        return None
+def template_mix(templates, column, seed=None, sample_rows=100000):
+    """
+    Return the distinct values of ``column`` in a sample of the templates and their frequencies.
+    """
+    rng = np.random.default_rng(seed)
+    values = templates.take(rng.integers(0, len(templates), size=min(sample_rows, len(templates))))[column]
+    counts = values.value_counts()
+    if counts.empty:
+        raise ValueError(f"The templates have no {column} values to build entities from")
+    return counts.index.to_numpy(dtype=object), (counts / counts.sum()).to_numpy()
 
-    return row
+def template_regions(templates, seed=None, sample_rows=100000):
+    """
+    Return the distinct region rows (RegionName with its RegionId and AvailabilityZone, where the
+    templates have them) in a sample of the templates, as a DataFrame.
+    """
+    rng = np.random.default_rng(seed)
+    columns = [column for column in ('RegionName', 'RegionId', 'AvailabilityZone') if column in templates.columns]
+    rows = templates.take(rng.integers(0, len(templates), size=min(sample_rows, len(templates))))[columns]
+    regions = rows[rows['RegionName'].notna()].drop_duplicates().reset_index(drop=True)
+    if regions.empty:
+        raise ValueError("The templates have no RegionName values to build entities from")
+    return regions
 
-def generate_six_months_data(input_file, output_file, rows_per_provider=1000, months=6):
+def build_entity_graphs(templates, entities, seed):
+    """
+    Build the EntityGraph of every provider, with the services, regions and account names of the templates.
+
+    Templates without a BillingAccountName column get generated account names ('Account N').
+    """
+    services, weights = template_mix(templates, 'ServiceName', seed)
+    regions = template_regions(templates, seed)
+    companies = None
+    if 'BillingAccountName' in templates.columns:
+        companies, _ = template_mix(templates, 'BillingAccountName', seed)
+    return entities.build_graphs(providers, seed, {provider: services for provider in providers}, regions,
+                                 {provider: weights for provider in providers}, companies)
+
+def _init_worker(templates, distributions=None, entities=None):
+    global _templates, _distributions, _entities
+    _templates = templates
+    _distributions = distributions
+    _entities = entities
+
+def _generate_shard_part(args):
+    """
+    Generate one shard into its own part file. For CSV output only the first
+    shard writes the header, so the parts can be joined byte for byte.
+    """
+    index, shard, seed_seq, calendar_months, part_file = args
+    block = generate_shard(_templates, shard, seed_seq, calendar_months, distributions=_distributions,
+                           entities=_entities)
+    write_part(block, part_file, header=(index == 0))
+    return index, len(block)
+
+def generate_sharded(templates, output_file, shards, seeds, num_workers, calendar_months=False,
+                     instrumentation=null_instrumentation, checkpoint=None, distributions=None, entities=None):
+    """
+    Generate the shards with a process pool, one part file per shard.
+
+    With a ``checkpoint`` the part files live in its parts directory, shards it has
+    already committed are skipped, and each shard is committed as soon as it finishes.
+    """
+    if checkpoint is not None:
+        part_files = [checkpoint.part_file(index) for index in range(len(shards))]
+        pending = checkpoint.pending(len(shards))
+        total_rows, total_bytes = checkpoint.rows_committed, checkpoint.bytes_committed
+    else:
+        root, ext = os.path.splitext(output_file)
+        part_files = [f"{root}.part-{index:05d}{ext}" for index in range(len(shards))]
+        pending = list(range(len(shards)))
+        total_rows, total_bytes = 0, 0
+
+    done = len(shards) - len(pending)
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker,
+                             initargs=(templates, distributions, entities)) as pool:
+        futures = [
+            pool.submit(_generate_shard_part, (index, shards[index], seeds[index], calendar_months, part_files[index]))
+            for index in pending
+        ]
+        for future in as_completed(futures):
+            index, rows = future.result()
+            if checkpoint is not None:
+                checkpoint.commit(index, rows)
+            done += 1
+            total_rows += rows
+            total_bytes += os.path.getsize(part_files[index])
+            instrumentation.batch_done(rows, total_bytes)
+            print(f"Generated shard {done}/{len(shards)}, {total_rows} rows so far")
+
+    with instrumentation.stage('write'):
+        if checkpoint is not None:
+            checkpoint.finish(len(shards))
+        else:
+            concatenate_parts(part_files, output_file)
+    return total_rows
+
+def generate_serial(templates, output_file, shards, seeds, calendar_months=False,
+                    instrumentation=null_instrumentation, checkpoint=None, pipelined=False, distributions=None,
+                    entities=None):
+    """
+    Generate the shards in this process, appending each block to ``output_file``.
+
+    With a ``checkpoint`` each shard is written and committed as its own part file
+    instead, skipping the shards it has already committed. With ``pipelined``
+    generation and writing overlap in separate threads (see pipeline.py).
+    """
+    if checkpoint is None:
+        blocks = (
+            generate_shard(templates, shard, seeds[index], calendar_months, instrumentation, distributions, entities)
+            for index, shard in enumerate(shards)
+        )
+        with open_writer(output_file) as writer:
+            for index, _ in enumerate(write_batches(writer, blocks, instrumentation, pipelined)):
+                print(f"Generated shard {index + 1}/{len(shards)}, current output size: {writer.bytes_written / (1024 ** 3):.2f} GB")
+        return writer.rows_written
+
+    return run_units(checkpoint, len(shards),
+                     lambda index: generate_shard(templates, shards[index], seeds[index], calendar_months,
+                                                  instrumentation, distributions, entities),
+                     instrumentation, pipelined, label='shard')
+
+def generate_sized(templates, output_file, target_size, months, seed=None, shard_rows=100000, calendar_months=False,
+                   instrumentation=null_instrumentation, distributions=None, tolerance=0.001, entities=None):
+    """
+    Generate shards in this process until ``output_file`` holds about ``target_size`` bytes.
+
+    Every shard is sized from the bytes per row written so far (see sizing.SizeTarget)
+    and seeded from ``seed`` in order.
+    """
+    blocks = [(month, provider) for month in range(months) for provider in providers]
+    target = SizeTarget(target_size, len(blocks), shard_rows, tolerance,
+                        block_names=[f"month {month + 1} {provider}" for month, provider in blocks])
+    seed_seq = np.random.SeedSequence(seed)
+    with open_writer(output_file) as writer:
+        shards = (
+            generate_shard(templates, blocks[block] + (0, rows), seed_seq.spawn(1)[0], calendar_months,
+                           instrumentation, distributions, entities)
+            for block, rows in target.plan(writer)
+        )
+        for index, _ in enumerate(write_batches(writer, shards, instrumentation)):
+            print(f"Generated shard {index + 1}, current output size: {writer.output_size / (1024 ** 3):.2f} GB")
+    report_size(writer.output_size, target_size, tolerance)
+    return writer.rows_written
+
+def generate_six_months_data(input_file, output_file, rows_per_provider=1000, months=6, num_workers=1, seed=None,
+                             shard_rows=100000, max_templates=None, calendar_months=False, instrumentation=None,
+                             distributions=None, entities=None, options=None):
     """
     Generate mock data for 6 months across multiple providers from a large dataset.
+
+    Exactly ``months * len(providers) * rows_per_provider`` rows (or ``options.total_rows``) are
+    produced, whatever the size of the input file, or about ``options.target_size`` bytes. With
+    ``options.checkpoint`` the run can be resumed after a crash by calling it again with the same arguments.
     """
-    # List of providers
-    providers = ['AWS', 'Google Cloud', 'Oracle', 'Microsoft']
-    
-    # Read input file in chunks
-    with pd.read_csv(input_file, chunksize=10000) as reader, open(output_file, 'w') as output:
-        header_written = False
-        
-        for chunk in reader:
-            chunk_rows = []
-            for month in range(months):
-                for provider in providers:
-                    # Process rows for each month and provider
-                    for i in range(rows_per_provider):
-                        random_row = chunk.iloc[random.randint(0, len(chunk) - 1)].to_dict()
-                        processed_row = generate_mock_row(random_row, provider, month * 30)
-                        if processed_row:
-                            chunk_rows.append(processed_row)
-            
-            # Convert to DataFrame and write incrementally
-            df = pd.DataFrame(chunk_rows)
-            if not header_written:
-                df.to_csv(output_file, index=False, mode='w', header=True)  # Write header
-                header_written = True
-            else:
-                df.to_csv(output_file, index=False, mode='a', header=False)  # Append data
-
-            print(f"Processed a chunk, current output size: {output.tell() / (1024 ** 3):.2f} GB")
-
-    print(f"Mock data generation completed. File saved to {output_file}")
+    instrumentation = instrumentation or null_instrumentation
+    options = options or OutputOptions()
+    options.check(num_workers)
+    if options.append:
+        raise ValueError("Appending is only supported by the date-range generator")
+    params = run_params('six-months', input_file, {
+        'rows_per_provider': rows_per_provider,
+        'months': months,
+        'shard_rows': shard_rows,
+        'max_templates': max_templates,
+        'calendar_months': calendar_months,
+    }, distributions, options.total_rows, entities)
+    seed, run_checkpoint = run_seed(output_file, params, seed, options)
+
+    templates = load_templates(input_file, max_templates, seed)
+    shards = plan_shards(rows_per_provider, months, shard_rows, options.total_rows)
+    seeds = np.random.SeedSequence(seed).spawn(len(shards))
+    graphs = None if entities is None else build_entity_graphs(templates, entities, seed)
+
+    if options.target_size is not None:
+        total_rows = generate_sized(templates, output_file, options.target_size, months, seed, shard_rows,
+                                    calendar_months, instrumentation, distributions, options.size_tolerance, graphs)
+    elif options.partitioned:
+        # Rows are routed by their own BillingPeriodStart month, so a source spanning several
+        # months still lands in the right partitions
+        manifest = write_units(output_file, shards, seeds,
+                               partial(generate_shard, templates, calendar_months=calendar_months,
+                                       distributions=distributions, entities=graphs),
+                               task_key=lambda shard: shard[:2], num_workers=num_workers,
+                               file_format=options.file_format, target_file_size=options.target_file_size,
+                               instrumentation=instrumentation,
+                               metadata=dict(params, seed=seed, target_file_size=options.target_file_size))
+        total_rows = manifest['rows']
+    elif num_workers > 1:
+        total_rows = generate_sharded(templates, output_file, shards, seeds, num_workers, calendar_months,
+                                      instrumentation, run_checkpoint, distributions, graphs)
+    else:
+        total_rows = generate_serial(templates, output_file, shards, seeds, calendar_months, instrumentation,
+                                     run_checkpoint, options.pipelined, distributions, graphs)
+
+    print(f"Mock data generation completed ({total_rows} rows). File saved to {output_file}")
 
 if __name__ == '__main__':
     # File paths
@@ -94,4 +385,4 @@ if __name__ == '__main__':
     output_file = 'mock-data-6-months-NEW.csv'  # Output file path
 
     # Generate data
-    generate_six_months_data(input_file, output_file, rows_per_provider=1000, months=6)
+    generate_six_months_data(input_file, output_file, rows_per_provider=1000, months=6, num_workers=4)
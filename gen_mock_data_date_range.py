@@ -1,7 +1,9 @@
 """
 This script generates mock billing data with customizable date ranges. 
-The date range can be adjusted directly in the script by setting the `start_date` and `end_date` variables.
-The mock data includes realistic entries for cloud providers and is saved to a specified output CSV file.
+The date range can be adjusted directly in the script by setting the `start_date` and `end_date` variables,
+or passed on the command line with `python mockgen.py generate --start-date ... --end-date ...`.
+The mock data includes realistic entries for cloud providers and is saved to a specified output CSV file,
+or written directly as typed Parquet when the output path ends in `.parquet`.
 
 Date Range:
 - Specify the desired start and end dates for data generation.
@@ -10,14 +12,56 @@ Usage:
 - Provide the input file path containing the original data and the output file path for the generated mock data.
 - Adjust `start_date` and `end_date` variables for the desired date range.
 - Adjust `rows_per_provider` variable for the number of rows per provider per month.
+- Pass `calendar_months=True` to `generate_mock_data` to use real calendar month boundaries instead of 30-day steps.
+- Optionally pass `batch_size` to `generate_mock_data` to cap the number of rows held in memory at once.
+- Optionally pass an `Instrumentation` (see instrumentation.py) to get per-stage timings and throughput as JSON lines.
+- Pass an `OutputOptions` (see run_options.py) as `options` to choose how the output is written:
+  - `checkpoint=True` makes a long run resumable: every finished month/provider/batch unit is committed
+    to a manifest, and rerunning with the same arguments after a crash only generates the missing
+    units (see checkpoint.py).
+  - `pipelined=True` runs generation, serialization and the disk write in three overlapping threads
+    connected by bounded queues (see pipeline.py); the output is unchanged.
+  - `partitioned=True` writes `output_file` as a directory of Hive-style
+    `BillingMonth=YYYY-MM/ProviderName=.../part-*.parquet` files of about `target_file_size` bytes,
+    plus a `_manifest.json` with row counts and min/max statistics per file (see partitioned.py).
+    Each month/provider is written by one of `num_workers` worker processes.
+  - `append=True` extends an existing output to a later `end_date` instead of regenerating it: only the
+    billing periods it does not hold yet are generated and appended (to a CSV file) or added as new
+    partitions (to a partitioned output). With `drop_expired=True` the partition files that only hold
+    periods before `start_date` are deleted as well; the others are not rewritten.
+  - `total_rows` writes exactly that many rows in total, spread evenly over the months and providers
+    (`rows_per_provider` is then ignored), and `target_size` writes about that many bytes (uncompressed
+    for CSV output): batches are sized online from the bytes per row written so far, aiming within
+    `size_tolerance` of the target, and a warning is printed when the output misses it (see sizing.py).
+- Optionally pass a `DistributionProfile` as `distributions` (see distributions.py) to draw ServiceName
+  with each provider's service mix in the source and the cost and quantity columns from the source's
+  per-service distributions, instead of uniformly between the bounds in `numeric_ranges`.
+- Pass an `EntityModel` as `entities` (see entities.py) to draw the account, sub-account, resource, region,
+  service, SKU and Tags columns from a fixed per-provider graph of accounts -> sub-accounts -> resources,
+  with Zipf-like resource popularity, instead of leaving them to the template rows and independent draws.
+- Optionally pass `pool_sizes` to `generate_mock_data` to change how many distinct Faker values are drawn per pool.
 - Run the script to generate mock data for the defined date range.
 
 """
 
+import os
+from functools import partial
+
+import numpy as np
 import pandas as pd
 from faker import Faker
-import random
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from checkpoint import run_units
+from date_columns import billing_periods, format_timestamp, timestamp_format
+from instrumentation import null_instrumentation
+from partitioned import expired_entries, load_manifest, remove_files, write_units
+from pipeline import write_batches
+from run_options import OutputOptions, run_params, run_seed
+from sizing import SizeTarget, report_size, split_rows
+from template_store import load_template_store
+from value_pools import get_pool, get_pools, pool_column
+from writers import CsvBatchWriter, csv_edge_rows, open_writer, output_format
 
 # Initialize Faker
 fake = Faker()
@@ -31,63 +75,323 @@ start_date = datetime(2024, 7, 1)
 end_date = datetime(2024, 12, 31)
 rows_per_provider = 1000
 
-# Function to generate a single mock row
-def generate_mock_row(row, provider, current_date):
-    row['ProviderName'] = provider
-    row['BillingPeriodStart'] = current_date.strftime("%Y-%m-%d %H:%M:%S")
-    row['BillingPeriodEnd'] = (current_date + timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")
-    row['BilledCost'] = round(random.uniform(0.01, 100), 2)
-    row['ConsumedQuantity'] = round(random.uniform(0.1, 1000), 2)
-    row['ServiceName'] = fake.random_element(elements=[
-        'Amazon EC2', 'Google Cloud Storage', 'Oracle Database', 'Microsoft Azure Functions'
-    ])
-    row['RegionName'] = fake.random_element(elements=[
-        'US East (N. Virginia)', 'EU (Frankfurt)', 'Asia Pacific (Singapore)', 'US West (Oregon)'
-    ])
-    row['ChargeCategory'] = 'Usage'
-    row['ChargeDescription'] = fake.sentence(nb_words=6)
-    row['ChargeFrequency'] = fake.random_element(elements=['Usage-Based', 'Monthly', 'One-Time'])
-    row['ContractedCost'] = round(random.uniform(0, 100), 2)
-    row['EffectiveCost'] = round(random.uniform(0, 100), 2)
-    row['InvoiceIssuerName'] = provider
-    row['ListCost'] = round(random.uniform(0, 100), 2)
-    row['ListUnitPrice'] = round(random.uniform(0, 100), 2)
-    row['PricingCategory'] = 'Standard'
-    row['PricingQuantity'] = round(random.uniform(0, 10), 2)
-    row['PricingUnit'] = fake.random_element(elements=['Requests', 'GB', 'Hours'])
-    row['PublisherName'] = provider
-    return row
+providers = ["AWS", "Google Cloud", "Oracle", "Microsoft"]
 
-# Function to generate mock data for the specified date range
-def generate_mock_data(input_file, output_file, start_date, end_date, rows_per_provider):
-    # Read the input file
-    df = pd.read_csv(input_file, low_memory=False, dtype=str)
-    
-    # Initialize an empty list for the output
-    output_data = []
-    
-    # Generate data for each provider and each month in the date range
-    providers = ["AWS", "Google Cloud", "Oracle", "Microsoft"]
-    current_date = start_date
-    total_rows = 0
-    while current_date <= end_date:
+# Uniform (low, high) bounds for the numeric columns, drawn in bulk per block
+numeric_ranges = {
+    'BilledCost': (0.01, 100),
+    'ConsumedQuantity': (0.1, 1000),
+    'ContractedCost': (0, 100),
+    'EffectiveCost': (0, 100),
+    'ListCost': (0, 100),
+    'ListUnitPrice': (0, 100),
+    'PricingQuantity': (0, 10),
+}
+
+service_names = ['Amazon EC2', 'Google Cloud Storage', 'Oracle Database', 'Microsoft Azure Functions']
+region_names = ['US East (N. Virginia)', 'EU (Frankfurt)', 'Asia Pacific (Singapore)', 'US West (Oregon)']
+# RegionId and AvailabilityZone of each of region_names, for the entity graphs' region rows
+region_ids = ['us-east-1', 'eu-central-1', 'ap-southeast-1', 'us-west-2']
+availability_zones = ['us-east-1a', 'eu-central-1a', 'ap-southeast-1a', 'us-west-2a']
+charge_frequencies = ['Usage-Based', 'Monthly', 'One-Time']
+pricing_units = ['Requests', 'GB', 'Hours']
+
+def uniform_column(rng, column, n):
+    """
+    Draw ``n`` values for a numeric column in one call, rounded to 2 dp.
+    """
+    low, high = numeric_ranges[column]
+    return np.round(rng.uniform(low, high, n), 2)
+
+# Function to generate one month/provider block of mock rows as whole columns
+def generate_mock_block(df, provider, period_start, period_end, n, rng, pools, instrumentation=null_instrumentation,
+                        distributions=None, entities=None):
+    """
+    Generate ``n`` mock rows for a single provider and month.
+
+    Template rows are picked with one vectorized index draw and every
+    overridden column is filled in bulk, so the cost per row is a handful of
+    array operations instead of a Python dict round trip. Faker text comes
+    from the pre-generated ``pools`` (see value_pools.py) and the period
+    boundaries are formatted once per block and broadcast. Each group of
+    columns is timed as its own ``instrumentation`` stage. With a
+    ``distributions`` profile the service names and numeric columns are
+    drawn from it instead of uniformly. With ``entities`` (a dict of
+    EntityGraph by provider) every row belongs to a resource of the
+    provider's graph, which fixes its account, region, service, SKU and Tags.
+    """
+    with instrumentation.stage('template_sampling'):
+        block = df.take(rng.integers(0, len(df), size=n)).reset_index(drop=True)
+
+    with instrumentation.stage('date_fill'):
+        block['BillingPeriodStart'] = format_timestamp(period_start)
+        block['BillingPeriodEnd'] = format_timestamp(period_end)
+
+    graph = resources = None
+    if entities is not None:
+        with instrumentation.stage('entity_fill'):
+            graph = entities[provider]
+            resources = graph.sample(n, rng)
+
+    with instrumentation.stage('numeric_fill'):
+        services = None
+        if distributions is None:
+            for column in numeric_ranges:
+                block[column] = uniform_column(rng, column, n)
+        else:
+            if graph is None:
+                services = distributions.sample_services(provider, n, rng, service_names)
+            else:
+                services = graph.service_names(resources)
+            distributions.fill_block(block, provider, services, rng)
+
+    with instrumentation.stage('faker_fill'):
+        block['ProviderName'] = provider
+        if graph is None:
+            block['ServiceName'] = rng.choice(service_names, size=n) if services is None else services
+            block['RegionName'] = rng.choice(region_names, size=n)
+        block['ChargeCategory'] = 'Usage'
+        block['ChargeDescription'] = pool_column(pools['sentence'], n, rng)
+        block['ChargeFrequency'] = rng.choice(charge_frequencies, size=n)
+        block['InvoiceIssuerName'] = provider
+        block['PricingCategory'] = 'Standard'
+        block['PricingUnit'] = rng.choice(pricing_units, size=n)
+        block['PublisherName'] = provider
+
+    if graph is not None:
+        with instrumentation.stage('entity_fill'):
+            graph.fill_block(block, resources)
+    return block
+
+def build_entity_graphs(entities, seed, distributions=None, pool_sizes=None):
+    """
+    Build the EntityGraph of every provider for the ``entities`` model.
+
+    Resources get this generator's service names, or each provider's service mix in
+    ``distributions`` when it has one, a region with its RegionId and AvailabilityZone,
+    and account names from the company pool.
+    """
+    services = {provider: service_names for provider in providers}
+    weights = {}
+    if distributions is not None:
         for provider in providers:
-            for _ in range(rows_per_provider):
-                try:
-                    row = df.sample(n=1).iloc[0].to_dict()
-                    mock_row = generate_mock_row(row, provider, current_date)
-                    output_data.append(mock_row)
-                    total_rows += 1
-                    if total_rows % 1000 == 0:
-                        print(f"Generated {total_rows} rows so far...")
-                except Exception as e:
-                    print(f"Error generating row: {e}")
-        current_date += timedelta(days=30)
-    
-    # Convert the list to a DataFrame and save the generated data to the output file
-    output_df = pd.DataFrame(output_data)
-    output_df.to_csv(output_file, index=False)
-    print(f"Generated {total_rows} rows of mock data and saved to {output_file}")
+            mix = distributions.service_mix(provider)
+            if mix is not None:
+                services[provider], weights[provider] = mix
+    companies = get_pool(fake, 'company', (pool_sizes or {}).get('company'), seed)
+    regions = pd.DataFrame({'RegionName': region_names, 'RegionId': region_ids, 'AvailabilityZone': availability_zones})
+    return entities.build_graphs(providers, seed, services, regions, weights, companies)
+
+# Split the date range into independently seeded units of work
+def plan_units(start_date, end_date, rows_per_provider, batch_size=100000, calendar_months=False, total_rows=None):
+    """
+    Return the (period_start, period_end, provider, n) units of the run in output order:
+    one per month and provider, split further into batches of at most ``batch_size`` rows.
+    With ``total_rows`` the blocks share exactly that many rows instead of ``rows_per_provider`` each.
+    """
+    blocks = [(period_start, period_end, provider)
+              for period_start, period_end in billing_periods(start_date, end_date, calendar_months)
+              for provider in providers]
+    block_rows = [rows_per_provider] * len(blocks) if total_rows is None else split_rows(total_rows, len(blocks))
+    units = []
+    for block, rows in zip(blocks, block_rows):
+        for batch_start in range(0, rows, batch_size):
+            units.append(block + (min(batch_size, rows - batch_start),))
+    return units
+
+def generate_unit(df, unit, seed_seq, pools, instrumentation=null_instrumentation, distributions=None, entities=None):
+    """
+    Generate the block for one unit with its own random stream.
+    """
+    period_start, period_end, provider, n = unit
+    rng = np.random.default_rng(seed_seq)
+    return generate_mock_block(df, provider, period_start, period_end, n, rng, pools, instrumentation, distributions,
+                               entities)
+
+# Generator yielding the mock data for the date range in bounded batches
+def iter_mock_batches(df, start_date, end_date, rows_per_provider, seed, pools, batch_size=100000,
+                      calendar_months=False, instrumentation=null_instrumentation, distributions=None,
+                      total_rows=None, entities=None):
+    """
+    Yield one batch per unit (see plan_units), so only one batch is held in memory at a time.
+    Each unit is seeded from ``seed`` by its index, independent of the other units.
+    """
+    units = plan_units(start_date, end_date, rows_per_provider, batch_size, calendar_months, total_rows)
+    seeds = np.random.SeedSequence(seed).spawn(len(units))
+    for unit, seed_seq in zip(units, seeds):
+        yield generate_unit(df, unit, seed_seq, pools, instrumentation, distributions, entities)
+
+def iter_sized_batches(df, start_date, end_date, writer, target_size, seed, pools, batch_size=100000,
+                       calendar_months=False, instrumentation=null_instrumentation, distributions=None,
+                       tolerance=0.001, entities=None):
+    """
+    Yield batches until ``writer`` holds about ``target_size`` bytes (see sizing.SizeTarget).
+
+    Each batch is sized from what ``writer`` has written so far, so every batch must be
+    written before the next one is requested. Units are seeded from ``seed`` in order.
+    """
+    blocks = [(period_start, period_end, provider)
+              for period_start, period_end in billing_periods(start_date, end_date, calendar_months)
+              for provider in providers]
+    target = SizeTarget(target_size, len(blocks), batch_size, tolerance,
+                        block_names=[f"{period_start:%Y-%m-%d} {provider}" for period_start, _, provider in blocks])
+    seed_seq = np.random.SeedSequence(seed)
+    for block, rows in target.plan(writer):
+        yield generate_unit(df, blocks[block] + (rows,), seed_seq.spawn(1)[0], pools, instrumentation, distributions,
+                            entities)
+
+def generate_checkpointed(df, units, seeds, pools, checkpoint, instrumentation=null_instrumentation,
+                          pipelined=False, distributions=None, entities=None):
+    """
+    Generate the units not yet committed to ``checkpoint`` as part files, then join them into its output file.
+
+    With ``pipelined`` the next unit is generated in a background thread while the current one is written.
+    """
+    return run_units(checkpoint, len(units),
+                     lambda index: generate_unit(df, units[index], seeds[index], pools, instrumentation, distributions,
+                                                 entities),
+                     instrumentation, pipelined)
+
+def append_mock_data(input_file, output_file, start_date, end_date, rows_per_provider, params, *, seed=None,
+                     pool_sizes=None, batch_size=100000, calendar_months=False, instrumentation=null_instrumentation,
+                     distributions=None, entities=None, num_workers=1, options=None):
+    """
+    Extend an existing output to ``end_date``, generating only the billing periods it does not hold yet.
+
+    Periods are planned from the existing output's first period, so they line up with it and
+    every unit gets the seed it would have in a full run. A partitioned output is read from
+    its manifest, which also supplies the seed and target file size and is checked against ``params``. A CSV file
+    is only read at its first and last row, so pass the original ``seed`` to reproduce a full
+    run. With ``options.drop_expired``, partition files that only hold periods before ``start_date``
+    are deleted. An ``entities`` model is rebuilt from the seed, so new rows use the same entities.
+    """
+    options = options or OutputOptions(append=True)
+    partitioned = os.path.isdir(output_file)
+    if partitioned:
+        manifest = load_manifest(output_file)
+        metadata = manifest['metadata']
+        fixed = {key: value for key, value in params.items() if key not in ('start_date', 'end_date')}
+        recorded = {key: value for key, value in metadata.items()
+                    if key not in ('start_date', 'end_date', 'seed', 'target_file_size')}
+        if recorded != fixed:
+            raise ValueError(f"{output_file} was generated with different parameters; only the dates can change")
+        if seed is not None and seed != metadata['seed']:
+            raise ValueError(f"{output_file} was generated with seed {metadata['seed']}, not {seed}")
+        seed = metadata['seed']
+        anchor = datetime.fromisoformat(metadata['start_date'])
+        covered_end = datetime.fromisoformat(metadata['end_date'])
+        done = len(plan_units(anchor, covered_end, rows_per_provider, batch_size, calendar_months))
+        end_date = max(end_date, covered_end)
+    else:
+        if options.drop_expired:
+            raise ValueError("Dropping expired months needs a partitioned output; a single file would be rewritten")
+        if output_format(output_file) == 'parquet':
+            raise ValueError(f"{output_file}: Parquet files cannot be appended to, use a partitioned output")
+        first_row, last_row = csv_edge_rows(output_file)
+        anchor = datetime.strptime(first_row['BillingPeriodStart'], timestamp_format)
+        covered = [period_start for period_start, _ in billing_periods(anchor, end_date, calendar_months)
+                   if format_timestamp(period_start) <= last_row['BillingPeriodStart']]
+        done = len(plan_units(anchor, covered[-1], rows_per_provider, batch_size, calendar_months)) if covered else 0
+
+    units = plan_units(anchor, end_date, rows_per_provider, batch_size, calendar_months)
+    seeds = np.random.SeedSequence(seed).spawn(len(units))
+    print(f"{output_file} holds {done} of {len(units)} units up to {end_date:%Y-%m-%d}; generating the rest")
+    df = load_template_store(input_file)
+    pools = get_pools(fake, ['sentence'], pool_sizes, seed)
+    graphs = None if entities is None else build_entity_graphs(entities, seed, distributions, pool_sizes)
+
+    if partitioned:
+        expired = []
+        if options.drop_expired:
+            expired = expired_entries(manifest['files'], 'BillingPeriodStart', format_timestamp(start_date))
+        expired_paths = {entry['path'] for entry in expired}
+        kept = [entry for entry in manifest['files'] if entry['path'] not in expired_paths]
+        updated = write_units(output_file, units, seeds,
+                              partial(generate_unit, df, pools=pools, distributions=distributions, entities=graphs),
+                              task_key=lambda unit: unit[:3], num_workers=num_workers, file_format=manifest['format'],
+                              target_file_size=metadata.get('target_file_size', options.target_file_size),
+                              instrumentation=instrumentation, metadata=dict(metadata, end_date=end_date.isoformat()),
+                              first_unit=done, entries=kept)
+        # The new manifest no longer lists the expired files, so deleting them last is safe
+        remove_files(output_file, expired)
+        rows = updated['rows'] - sum(entry['rows'] for entry in kept)
+        print(f"Appended {rows} rows and dropped {len(expired)} expired files; {output_file} now holds {updated['rows']} rows")
+        return
+
+    batches = (
+        generate_unit(df, unit, seed_seq, pools, instrumentation, distributions, graphs)
+        for unit, seed_seq in zip(units[done:], seeds[done:])
+    )
+    with CsvBatchWriter(output_file, append=True) as writer:
+        for _ in write_batches(writer, batches, instrumentation, options.pipelined):
+            print(f"Appended {writer.rows_written} rows so far...")
+    print(f"Appended {writer.rows_written} rows of mock data to {output_file}")
+
+# Function to generate mock data for the specified date range
+def generate_mock_data(input_file, output_file, start_date, end_date, rows_per_provider, seed=None,
+                       pool_sizes=None, batch_size=100000, calendar_months=False, instrumentation=None,
+                       distributions=None, entities=None, num_workers=1, options=None):
+    instrumentation = instrumentation or null_instrumentation
+    options = options or OutputOptions()
+    options.check(num_workers)
+    params = run_params('date-range', input_file, {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'rows_per_provider': rows_per_provider,
+        'pool_sizes': pool_sizes,
+        'batch_size': batch_size,
+        'calendar_months': calendar_months,
+    }, distributions, options.total_rows, entities)
+    if options.append and os.path.exists(output_file):
+        if options.checkpoint:
+            raise ValueError("Appending cannot be combined with checkpointed runs")
+        append_mock_data(input_file, output_file, start_date, end_date, rows_per_provider, params, seed=seed,
+                         pool_sizes=pool_sizes, batch_size=batch_size, calendar_months=calendar_months,
+                         instrumentation=instrumentation, distributions=distributions, entities=entities,
+                         num_workers=num_workers, options=options)
+        return
+    seed, run_checkpoint = run_seed(output_file, params, seed, options)
+
+    # Map the cached template store for the input file (parsed once, then reused)
+    df = load_template_store(input_file)
+    pools = get_pools(fake, ['sentence'], pool_sizes, seed)
+    graphs = None if entities is None else build_entity_graphs(entities, seed, distributions, pool_sizes)
+
+    if options.partitioned:
+        units = plan_units(start_date, end_date, rows_per_provider, batch_size, calendar_months, options.total_rows)
+        seeds = np.random.SeedSequence(seed).spawn(len(units))
+        manifest = write_units(output_file, units, seeds,
+                               partial(generate_unit, df, pools=pools, distributions=distributions, entities=graphs),
+                               task_key=lambda unit: unit[:3], num_workers=num_workers, file_format=options.file_format,
+                               target_file_size=options.target_file_size, instrumentation=instrumentation,
+                               metadata=dict(params, seed=seed, target_file_size=options.target_file_size))
+        print(f"Generated {manifest['rows']} rows of mock data and saved them under {output_file}")
+        return
+
+    if run_checkpoint is not None:
+        units = plan_units(start_date, end_date, rows_per_provider, batch_size, calendar_months, options.total_rows)
+        seeds = np.random.SeedSequence(seed).spawn(len(units))
+        rows = generate_checkpointed(df, units, seeds, pools, run_checkpoint, instrumentation,
+                                     options.pipelined, distributions, graphs)
+        print(f"Generated {rows} rows of mock data and saved to {output_file}")
+        return
+
+    # Stream each batch to the output file as soon as it is generated
+    target_size = options.target_size
+    with open_writer(output_file) as writer:
+        if target_size is not None:
+            batches = iter_sized_batches(df, start_date, end_date, writer, target_size, seed, pools, batch_size,
+                                         calendar_months, instrumentation, distributions, options.size_tolerance,
+                                         graphs)
+        else:
+            batches = iter_mock_batches(df, start_date, end_date, rows_per_provider, seed, pools, batch_size,
+                                        calendar_months, instrumentation, distributions, options.total_rows, graphs)
+        for _ in write_batches(writer, batches, instrumentation, options.pipelined):
+            print(f"Generated {writer.rows_written} rows so far...")
+    if target_size is not None:
+        report_size(writer.output_size, target_size, options.size_tolerance)
+    print(f"Generated {writer.rows_written} rows of mock data and saved to {output_file}")
 
 # Run the script
-generate_mock_data(input_file, output_file, start_date, end_date, rows_per_provider)
+if __name__ == '__main__':
+    generate_mock_data(input_file, output_file, start_date, end_date, rows_per_provider)
@@ -0,0 +1,117 @@
+"""
+Bulk ID and Tags columns.
+
+Formatting IDs and serializing JSON one row at a time (`fake.uuid4()`, `fake.random_number()`,
+`fake.json()`) costs more than everything else in a mock row. This module builds whole columns
+of them with a handful of NumPy operations:
+
+- `uuid4_column`: version 4 UUIDs formatted from one large buffer of random bytes.
+- `numeric_id_column`: fixed-width numeric IDs (account and sub-account IDs), with their digits
+  written straight into a byte matrix and returned as a string array.
+- `TagPool`: Tags as JSON objects built from a small set of tag keys and values. Every
+  `"key": "value"` pair is serialized once up front. A row's tag set is drawn as one value
+  index per key (or "absent"), the indices are combined into a single integer code, and only
+  the distinct codes are joined into JSON, so the per-row cost is a few array operations
+  however many rows there are.
+
+All draws come from the NumPy generator passed in, so a seeded run is reproducible.
+
+Usage:
+    rng = np.random.default_rng(42)
+    block['ResourceId'] = uuid4_column(n, rng)
+    block['BillingAccountId'] = numeric_id_column(n, 13, rng)
+    block['Tags'] = TagPool().column(n, rng)
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+# Tag keys and the values each can take; a row carries each key with probability `tag_probability`
+tag_templates = {
+    'Environment': ['prod', 'staging', 'dev', 'test'],
+    'Team': ['billing', 'platform', 'data', 'security', 'web', 'mobile'],
+    'CostCenter': ['CC-1001', 'CC-1042', 'CC-2300', 'CC-3150', 'CC-4200', 'CC-5100', 'CC-6010', 'CC-7700'],
+    'Project': ['atlas', 'phoenix', 'hermes', 'orion', 'apollo'],
+    'Owner': ['finops', 'sre', 'analytics'],
+}
+
+tag_probability = 0.5
+
+def uuid4_column(n, rng):
+    """
+    Generate ``n`` random version 4 UUID strings in bulk.
+
+    The 122 random bits per ID come from one ``rng.bytes`` call, so collisions are
+    as unlikely as with ``uuid.uuid4``. Hex formatting and dash insertion happen on
+    a (n, 36) byte matrix instead of per value.
+    """
+    raw = np.frombuffer(rng.bytes(16 * n), dtype=np.uint8).reshape(n, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+    hexed = np.frombuffer(raw.tobytes().hex().encode('ascii'), dtype=np.uint8).reshape(n, 32)
+
+    out = np.full((n, 36), ord('-'), dtype=np.uint8)
+    out[:, 0:8] = hexed[:, 0:8]
+    out[:, 9:13] = hexed[:, 8:12]
+    out[:, 14:18] = hexed[:, 12:16]
+    out[:, 19:23] = hexed[:, 16:20]
+    out[:, 24:36] = hexed[:, 20:32]
+    return out.view('S36').ravel().astype('U36')
+
+def numeric_id_column(n, digits, rng):
+    """
+    Generate ``n`` random numeric IDs of exactly ``digits`` digits (no leading zero) as strings.
+
+    Like ``fake.random_number(digits=digits, fix_len=True)``, but formatted in bulk:
+    the digits are written into a (n, digits) byte matrix, one position at a time.
+    """
+    if not 1 <= digits <= 18:
+        raise ValueError(f"digits must be between 1 and 18, got {digits}")
+    values = rng.integers(10 ** (digits - 1), 10 ** digits, size=n, dtype=np.int64)
+    out = np.empty((n, digits), dtype=np.uint8)
+    for position in range(digits - 1, -1, -1):
+        values, digit = np.divmod(values, 10)
+        out[:, position] = ord('0') + digit
+    return out.view(f'S{digits}').ravel().astype(f'U{digits}')
+
+class TagPool:
+    """
+    Pre-serialized tag key/value pairs, combined by index into JSON Tags columns.
+    """
+
+    def __init__(self, templates=None, probability=tag_probability):
+        templates = tag_templates if templates is None else templates
+        if not 0 < probability <= 1:
+            raise ValueError(f"Tag probability must be in (0, 1], got {probability}")
+        self.probability = probability
+        # One fragment per (key, value); a key's extra last index means the tag is absent
+        self.fragments = [[f"{json.dumps(key)}: {json.dumps(value)}" for value in values]
+                          for key, values in templates.items()]
+        self.radices = [len(values) + 1 for values in self.fragments]
+        if np.prod(self.radices, dtype=np.float64) >= 2 ** 63:
+            raise ValueError("Too many tag combinations to index them with a 64-bit code")
+
+    def _serialize(self, code):
+        pairs = []
+        for fragments, radix in zip(reversed(self.fragments), reversed(self.radices)):
+            code, index = divmod(code, radix)
+            if index < len(fragments):
+                pairs.append(fragments[index])
+        return '{' + ', '.join(reversed(pairs)) + '}'
+
+    def column(self, n, rng):
+        """
+        Draw a Tags JSON object for each of ``n`` rows.
+        """
+        # One uniform per key and row: below `probability` it also picks the value
+        draws = rng.random((len(self.fragments), n))
+        codes = np.zeros(n, dtype=np.int64)
+        for fragments, radix, draw in zip(self.fragments, self.radices, draws):
+            index = np.where(draw < self.probability, (draw * (len(fragments) / self.probability)).astype(np.int64),
+                             len(fragments))
+            codes *= radix
+            codes += np.minimum(index, radix - 1)
+        codes, uniques = pd.factorize(codes)
+        return np.array([self._serialize(int(code)) for code in uniques], dtype=object)[codes]
@@ -0,0 +1,185 @@
+"""
+Structured profiling and progress instrumentation for the generation loop.
+
+The generators wrap each stage of a batch in `instrumentation.stage(name)`:
+template sampling, date fill, numeric fill, Faker fill, entity fill (with an entity model),
+serialization and write. After each batch they call `batch_done(rows, bytes_written)`, which
+emits one JSON line with:
+- cumulative rows and bytes, and rows/sec and bytes/sec since the start and for the last batch,
+- the time spent in each stage so far,
+- the process memory high-water mark (peak RSS).
+
+Optional profiling:
+- `profile='cprofile'` runs cProfile only while a stage is active and writes the stats to
+  `profile_file` (or prints the top entries) on close.
+- `profile='tracemalloc'` records the peak traced allocation of each stage.
+
+Usage:
+    with Instrumentation(metrics_file='metrics.jsonl') as instrumentation:
+        with instrumentation.stage('numeric_fill'):
+            ...
+        instrumentation.batch_done(rows, bytes_written)
+
+Stages may run on several threads at once (see pipeline.py). Their times then overlap, so
+they can add up to more than the elapsed time, and cProfile only covers stages on the main thread.
+
+`metrics_file='-'` writes the JSON lines to stderr. Without a `metrics_file` nothing is
+emitted and stage timing is the only overhead (two clock reads per stage and batch).
+"""
+
+import cProfile
+import io
+import json
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MB (ru_maxrss is KB on Linux, bytes on macOS).
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 ** 2) if sys.platform == 'darwin' else peak / 1024
+
+class Instrumentation:
+    """
+    Per-stage timers, throughput and memory metrics emitted as JSON lines.
+    """
+
+    def __init__(self, metrics_file=None, profile=None, profile_file=None):
+        if profile not in (None, 'cprofile', 'tracemalloc'):
+            raise ValueError(f"Unknown profile mode: {profile!r}")
+        self.profile = profile
+        self.profile_file = profile_file
+        self.stage_seconds = defaultdict(float)
+        self.stage_peak_bytes = defaultdict(int)
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.bytes = 0
+        self._start = self._last = time.perf_counter()
+        self._last_rows = self._last_bytes = 0
+        self._profiler = cProfile.Profile() if profile == 'cprofile' else None
+        if profile == 'tracemalloc':
+            tracemalloc.start()
+        if metrics_file == '-':
+            self._out, self._owns_out = sys.stderr, False
+        elif metrics_file:
+            self._out, self._owns_out = open(metrics_file, 'w'), True
+        else:
+            self._out, self._owns_out = None, False
+
+    def emit(self, record):
+        if self._out is not None:
+            self._out.write(json.dumps(record) + '\n')
+            self._out.flush()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time the enclosed block under ``name`` (and profile it, if enabled).
+        """
+        profiler = self._profiler if threading.current_thread() is threading.main_thread() else None
+        if profiler is not None:
+            profiler.enable()
+        if self.profile == 'tracemalloc':
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+            with self._lock:
+                self.stage_seconds[name] += elapsed
+                if self.profile == 'tracemalloc':
+                    self.stage_peak_bytes[name] = max(self.stage_peak_bytes[name], tracemalloc.get_traced_memory()[1])
+
+    def batch_done(self, rows, bytes_written=None):
+        """
+        Record a finished batch of ``rows`` and emit a progress line.
+
+        ``bytes_written`` is the total output size so far, when the caller knows it.
+        """
+        now = time.perf_counter()
+        self.rows += rows
+        if bytes_written is not None:
+            self.bytes = bytes_written
+        elapsed, interval = now - self._start, now - self._last
+        self.emit({
+            'event': 'progress',
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'elapsed_s': round(elapsed, 3),
+            'rows_per_s': round(self.rows / elapsed, 1) if elapsed else None,
+            'bytes_per_s': round(self.bytes / elapsed, 1) if elapsed else None,
+            'batch_rows_per_s': round((self.rows - self._last_rows) / interval, 1) if interval else None,
+            'batch_bytes_per_s': round((self.bytes - self._last_bytes) / interval, 1) if interval else None,
+            'stages_s': {name: round(seconds, 3) for name, seconds in self.stage_seconds.items()},
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+        })
+        self._last, self._last_rows, self._last_bytes = now, self.rows, self.bytes
+
+    def close(self):
+        """
+        Emit the summary line and write out the profile, if any.
+        """
+        elapsed = time.perf_counter() - self._start
+        summary = {
+            'event': 'summary',
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'elapsed_s': round(elapsed, 3),
+            'rows_per_s': round(self.rows / elapsed, 1) if elapsed else None,
+            'stages_s': {name: round(seconds, 3) for name, seconds in self.stage_seconds.items()},
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+        }
+        if self.profile == 'tracemalloc':
+            summary['stage_peak_traced_mb'] = {
+                name: round(peak / (1024 ** 2), 1) for name, peak in self.stage_peak_bytes.items()
+            }
+            tracemalloc.stop()
+        self.emit(summary)
+
+        if self._profiler is not None:
+            if self.profile_file:
+                self._profiler.dump_stats(self.profile_file)
+            else:
+                stream = io.StringIO()
+                pstats.Stats(self._profiler, stream=stream).sort_stats('cumulative').print_stats(20)
+                print(stream.getvalue())
+        if self._owns_out:
+            self._out.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class NullInstrumentation:
+    """
+    Stand-in used when no instrumentation is requested; every call is a no-op.
+    """
+
+    def stage(self, name):
+        return nullcontext()
+
+    def batch_done(self, rows, bytes_written=None):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+null_instrumentation = NullInstrumentation()
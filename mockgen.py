@@ -0,0 +1,263 @@
+"""
+Single command-line entry point for the mock data tools.
+
+Subcommands:
+- `generate`: generate mock data (`--mode date-range` uses gen_mock_data_date_range.py,
+  `--mode six-months` uses gen_6_month_mock_data.py).
+- `validate`: validate a generated CSV file (validate.py).
+- `reduce`: downsample a CSV file to a target size (archive/reduce.py).
+- `extract`: extract a random sample of rows (archive/extract.py).
+- `convert`: convert a CSV file to typed Parquet (convert.py).
+- `fit`: fit a distribution profile of a source file's numeric columns (distributions.py).
+
+`--seed` seeds every random stream (`random`, NumPy and Faker) and is passed on to the tool,
+so the same command with the same seed always produces the same output.
+
+Usage:
+    python mockgen.py generate --input focus-data-full.csv --output mock.csv \\
+        --start-date 2024-07-01 --end-date 2024-12-31 --rows-per-provider 1000 --seed 42
+    python mockgen.py validate mock.csv --workers 4
+    python mockgen.py generate --partitioned --output mock/ --workers 8 --target-file-size 256M
+    python mockgen.py generate --output mock/ --append --drop-expired --start-date 2024-08-01 --end-date 2025-01-31
+    python mockgen.py generate --output mock.csv --target-size 1G
+    python mockgen.py generate --output mock.parquet --entities --accounts 50 --resources 100000 --skew 1.2
+    python mockgen.py fit focus-data-full.csv --output focus.profile.npz
+    python mockgen.py generate --distribution-profile focus.profile.npz --output mock.csv
+
+Every tool module can also be imported and called as a library: importing them has no side
+effects, and this module only imports a tool when its subcommand runs.
+"""
+
+import argparse
+import random
+import sys
+from datetime import datetime
+
+def seed_everything(seed):
+    """
+    Seed the global `random`, NumPy and Faker generators.
+    """
+    if seed is None:
+        return
+    import numpy as np
+    from faker import Faker
+
+    random.seed(seed)
+    np.random.seed(seed)
+    Faker.seed(seed)
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+def parse_size(value):
+    """
+    Parse a byte size such as ``1500000``, ``512M`` or ``1.5G`` (binary units).
+    """
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    value = value.strip().upper().rstrip("B")
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+def load_distributions(args):
+    """
+    Return the DistributionProfile asked for on the command line, or None for uniform draws.
+    """
+    if args.distribution_profile:
+        from distributions import load_profile
+
+        return load_profile(args.distribution_profile)
+    if args.distributions:
+        from distributions import load_source_profile
+
+        return load_source_profile(args.input)
+    return None
+
+def load_entities(args):
+    """
+    Return the EntityModel asked for on the command line, or None for independent IDs.
+    """
+    if not args.entities:
+        return None
+    from entities import EntityModel
+
+    return EntityModel(accounts=args.accounts, sub_accounts=args.sub_accounts, resources=args.resources,
+                       skew=args.skew)
+
+def load_options(args):
+    """
+    Return the OutputOptions of the generate command line.
+    """
+    from run_options import OutputOptions
+
+    return OutputOptions(
+        checkpoint=args.checkpoint, pipelined=args.pipeline, partitioned=args.partitioned,
+        file_format=args.file_format, target_file_size=args.target_file_size, append=args.append,
+        drop_expired=args.drop_expired, total_rows=args.total_rows, target_size=args.target_size,
+        size_tolerance=args.size_tolerance,
+    )
+
+def run_generate(args):
+    from instrumentation import Instrumentation
+
+    # Conflicting options are refused by the generators (OutputOptions.check) before anything is written
+    try:
+        options = load_options(args)
+        distributions = load_distributions(args)
+        entities = load_entities(args)
+
+        with Instrumentation(args.metrics, args.profile, args.profile_file) as instrumentation:
+            if args.mode == "six-months":
+                from gen_6_month_mock_data import generate_six_months_data
+
+                generate_six_months_data(
+                    args.input, args.output, rows_per_provider=args.rows_per_provider, months=args.months,
+                    num_workers=args.workers, seed=args.seed, shard_rows=args.batch_size,
+                    max_templates=args.max_templates, calendar_months=args.calendar_months,
+                    instrumentation=instrumentation, distributions=distributions, entities=entities, options=options,
+                )
+            else:
+                from gen_mock_data_date_range import generate_mock_data
+
+                generate_mock_data(
+                    args.input, args.output, args.start_date, args.end_date, args.rows_per_provider, seed=args.seed,
+                    batch_size=args.batch_size, calendar_months=args.calendar_months, instrumentation=instrumentation,
+                    distributions=distributions, entities=entities, num_workers=args.workers, options=options,
+                )
+    except ValueError as e:
+        print(e)
+        return False
+    return True
+
+def run_validate(args):
+    from validate import validate_file
+
+    return validate_file(
+        args.file, sample_size=args.sample_size, seed=args.seed, num_workers=args.workers,
+        max_offending=args.max_offending, cost_ranges={} if args.no_cost_ranges else None,
+    )
+
+def run_reduce(args):
+    from archive.reduce import downsize_file
+
+    downsize_file(args.input, args.output, args.target_size, seed=args.seed)
+    return True
+
+def run_extract(args):
+    from archive.extract import extract_random_rows
+
+    extract_random_rows(args.input, args.output, num_rows=args.rows, stratify_by=args.stratify_by, seed=args.seed)
+    return True
+
+def run_convert(args):
+    from convert import convert_csv_to_parquet
+
+    convert_csv_to_parquet(args.input, args.output, row_group_size=args.row_group_size)
+    return True
+
+def run_fit(args):
+    from distributions import fit_profile
+
+    profile = fit_profile(args.input, num_quantiles=args.quantiles, min_group_rows=args.min_group_rows)
+    profile.save(args.output)
+    print(f"Fitted {len(profile.columns)} columns for {len(profile.providers)} groups and saved the profile to {args.output}")
+    return True
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="mockgen", description="Generate, validate and reshape FOCUS mock data.")
+    parser.add_argument("--seed", type=int, default=None, help="seed for every random stream (random, NumPy, Faker)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate = subparsers.add_parser("generate", help="generate mock data")
+    generate.add_argument("--mode", choices=["date-range", "six-months"], default="date-range")
+    generate.add_argument("--input", default="focus-data-full.csv", help="template CSV file")
+    generate.add_argument("--output", default="mock-custom-dates.csv",
+                          help="output file (.csv, .csv.gz, .csv.zst or .parquet)")
+    generate.add_argument("--start-date", type=parse_date, default=datetime(2024, 7, 1), help="YYYY-MM-DD (date-range)")
+    generate.add_argument("--end-date", type=parse_date, default=datetime(2024, 12, 31), help="YYYY-MM-DD (date-range)")
+    generate.add_argument("--rows-per-provider", type=int, default=1000)
+    generate.add_argument("--total-rows", type=int, default=None,
+                          help="write exactly this many rows, spread over the months and providers")
+    generate.add_argument("--target-size", type=parse_size, default=None,
+                          help="write about this much data instead, e.g. 10G (uncompressed for CSV output)")
+    generate.add_argument("--size-tolerance", type=float, default=0.001,
+                          help="relative tolerance of --target-size")
+    generate.add_argument("--months", type=int, default=6, help="number of months (six-months)")
+    generate.add_argument("--workers", type=int, default=1, help="worker processes (six-months, or --partitioned)")
+    generate.add_argument("--batch-size", type=int, default=100000, help="rows per batch/shard")
+    generate.add_argument("--max-templates", type=int, default=None, help="sample this many template rows (six-months)")
+    generate.add_argument("--calendar-months", action="store_true", help="use calendar months instead of 30 days")
+    generate.add_argument("--checkpoint", action="store_true",
+                          help="commit each unit to a manifest; rerun the same command to resume")
+    generate.add_argument("--pipeline", action="store_true",
+                          help="overlap generation, serialization and writing in separate threads")
+    generate.add_argument("--metrics", default=None, help="write per-stage metrics as JSON lines ('-' for stderr)")
+    generate.add_argument("--profile", choices=["cprofile", "tracemalloc"], default=None, help="profile the stages")
+    generate.add_argument("--profile-file", default=None, help="write cProfile stats here instead of printing them")
+    generate.add_argument("--distributions", action="store_true",
+                          help="draw numeric columns from the --input file's distributions (fitted once, then cached)")
+    generate.add_argument("--distribution-profile", default=None, help="draw numeric columns from this fitted profile")
+    generate.add_argument("--entities", action="store_true",
+                          help="draw accounts, sub-accounts and resources from a fixed entity graph per provider")
+    generate.add_argument("--accounts", type=int, default=10, help="billing accounts per provider (--entities)")
+    generate.add_argument("--sub-accounts", type=int, default=100, help="sub-accounts per provider (--entities)")
+    generate.add_argument("--resources", type=int, default=10000, help="resources per provider (--entities)")
+    generate.add_argument("--skew", type=float, default=1.0,
+                          help="Zipf exponent of resource popularity, 0 for uniform (--entities)")
+    generate.add_argument("--partitioned", action="store_true",
+                          help="write --output as a directory of Hive partitions by month and provider")
+    generate.add_argument("--file-format", choices=["parquet", "csv", "csv.gz", "csv.zst"], default="parquet",
+                          help="file format of the partitions (--partitioned)")
+    generate.add_argument("--target-file-size", type=parse_size, default=128 * 1024 ** 2,
+                          help="approximate size of each partition file, e.g. 128M (--partitioned)")
+    generate.add_argument("--append", action="store_true",
+                          help="extend an existing --output to --end-date, generating only the missing months (date-range)")
+    generate.add_argument("--drop-expired", action="store_true",
+                          help="with --append, delete partition files with only months before --start-date")
+    generate.set_defaults(func=run_generate)
+
+    validate = subparsers.add_parser("validate", help="validate a generated CSV file (optionally .gz/.zst)")
+    validate.add_argument("file")
+    validate.add_argument("--sample-size", type=int, default=1000)
+    validate.add_argument("--workers", type=int, default=1)
+    validate.add_argument("--max-offending", type=int, default=10)
+    validate.add_argument("--no-cost-ranges", action="store_true",
+                          help="only check that numeric columns are numeric (for data generated with distributions)")
+    validate.set_defaults(func=run_validate)
+
+    reduce = subparsers.add_parser("reduce", help="downsample a CSV file to a target size")
+    reduce.add_argument("input")
+    reduce.add_argument("output")
+    reduce.add_argument("--target-size", type=parse_size, required=True,
+                        help="uncompressed output size, e.g. 1.5G, 512M or a byte count")
+    reduce.set_defaults(func=run_reduce)
+
+    extract = subparsers.add_parser("extract", help="extract a random sample of rows")
+    extract.add_argument("input")
+    extract.add_argument("output")
+    extract.add_argument("--rows", type=int, default=1000)
+    extract.add_argument("--stratify-by", default=None, help="sample --rows rows per value of this column")
+    extract.set_defaults(func=run_extract)
+
+    convert = subparsers.add_parser("convert", help="convert a CSV file to typed Parquet")
+    convert.add_argument("input")
+    convert.add_argument("output")
+    convert.add_argument("--row-group-size", type=int, default=1000000)
+    convert.set_defaults(func=run_convert)
+
+    fit = subparsers.add_parser("fit", help="fit a distribution profile of a source file")
+    fit.add_argument("input")
+    fit.add_argument("--output", required=True, help="profile file (.npz)")
+    fit.add_argument("--quantiles", type=int, default=257, help="quantiles per inverse-CDF table")
+    fit.add_argument("--min-group-rows", type=int, default=30,
+                     help="smallest provider/service group that gets its own tables")
+    fit.set_defaults(func=run_fit)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    seed_everything(args.seed)
+    return 0 if args.func(args) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+"""
+Hive-partitioned multi-file output.
+
+Instead of one monolithic file, a partitioned run writes a directory tree that Spark, DuckDB
+or any Hive-aware reader can read in parallel and prune by month and provider:
+
+    mock/
+      _manifest.json
+      BillingMonth=2024-07/ProviderName=AWS/part-00000-000.parquet
+      BillingMonth=2024-07/ProviderName=AWS/part-00000-001.parquet
+      BillingMonth=2024-07/ProviderName=Google Cloud/part-00001-000.parquet
+      ...
+
+- The partition keys are BillingMonth, the month (YYYY-MM) of BillingPeriodStart, and
+  ProviderName. As usual for Hive layouts, a key named after a column (ProviderName) is
+  stored only in the path and dropped from the files. BillingMonth is a new name, because
+  Hive readers refuse a key whose values differ from a file column of the same name, so
+  BillingPeriodStart keeps its exact timestamps in the files.
+- The run is split into tasks (one per billing period and provider in the generators). Each
+  task writes its own files, named `part-<task>-<file>`, so tasks can run concurrently in a
+  process pool without coordinating. Every file is written under a hidden temporary name and
+  renamed when complete. `write_units` groups a generator's units into tasks and runs them, so
+  the generators only supply a function that generates one unit.
+- A task rolls over to a new file once the current one reaches about `target_file_size` bytes.
+  Rows are written in slices sized from the bytes per row seen so far, so files end close to
+  the target. Compressed CSV only reaches the disk in large blocks compressed in the background
+  (see compression.py), so its size is estimated from the uncompressed bytes and the compression
+  ratio of the first slice, then of the last closed file.
+- `_manifest.json` lists every file with its partition values, row count, size and the
+  min/max of the numeric and date columns, so consumers can skip files without opening them.
+  It is written last, once every task has finished. Readers ignore it, because its name starts
+  with an underscore.
+- An existing output can be extended: the manifest tells which tasks it already holds, only
+  the missing tasks are written, and the manifest is rewritten with the old and the new files.
+  Expired files can be dropped in the same step (`expired_entries`, `remove_files`) without
+  touching the files that are kept.
+
+Supported file formats are 'parquet', 'csv', 'csv.gz' and 'csv.zst' (see writers.py).
+
+Usage:
+    with PartitionedWriter('mock', task=0, file_format='parquet') as writer:
+        writer.write(block)
+    write_manifest('mock', writer.entries, 'parquet')
+
+    manifest = write_units('mock', units, seeds, functools.partial(generate_unit, df), task_key=lambda unit: unit[:3])
+"""
+
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from compression import compress_block, compression_of, default_levels
+from instrumentation import null_instrumentation
+from writers import float_columns, open_writer, timestamp_columns
+
+# (partition key, source column); timestamp columns are partitioned by their YYYY-MM month
+partition_keys = [('BillingMonth', 'BillingPeriodStart'), ('ProviderName', 'ProviderName')]
+
+file_formats = ['parquet', 'csv', 'csv.gz', 'csv.zst']
+
+manifest_name = '_manifest.json'
+
+manifest_version = 1
+
+# Run state shared with each worker process by _init_units_worker
+_run = None
+
+# Hive's placeholder directory value for a missing partition value
+null_partition = '__HIVE_DEFAULT_PARTITION__'
+
+# Characters Hive escapes in partition values; anything else, spaces included, is kept
+_unsafe_characters = set('"#%\'*/:=?\\[]^{}\x7f') | {chr(code) for code in range(32)}
+
+def escape_partition_value(value):
+    """
+    Escape ``value`` for a Hive partition directory name, as Hive and Spark do.
+    """
+    if value is None or value == '':
+        return null_partition
+    return ''.join(quote(c, safe='') if c in _unsafe_characters else c for c in str(value))
+
+def partition_path(values, keys=partition_keys):
+    """
+    Relative directory of the partition with ``values``, e.g. `BillingMonth=2024-07/ProviderName=AWS`.
+    """
+    return '/'.join(f"{key}={escape_partition_value(value)}" for (key, _), value in zip(keys, values))
+
+def _partition_values(values, column):
+    """
+    Partition value of every row: the YYYY-MM month for timestamp columns, the value itself otherwise.
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=object)
+    if column in timestamp_columns:
+        uniques = pd.to_datetime(uniques, errors='coerce').dt.strftime('%Y-%m')
+    uniques = np.append(uniques.astype(object).where(uniques.notna(), None).to_numpy(), None)
+    return uniques[codes]
+
+def _column_stats(block, columns):
+    """
+    Min and max of ``columns`` in ``block``, skipping missing values.
+    """
+    stats = {}
+    for column in columns:
+        values = block[column]
+        if column in float_columns:
+            values = pd.to_numeric(values, errors='coerce')
+        values = values.dropna()
+        if len(values):
+            stats[column] = [values.min(), values.max()]
+    return stats
+
+def _merge_stats(total, stats):
+    for column, (low, high) in stats.items():
+        if column in total:
+            total[column] = [min(total[column][0], low), max(total[column][1], high)]
+        else:
+            total[column] = [low, high]
+
+def _json_value(value):
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat(sep=' ')
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+class _PartitionFile:
+    """
+    One output file of one partition, written under a temporary name until closed.
+    """
+
+    def __init__(self, root, directory, stem, file_format, values, float_decimals):
+        self.path = f"{directory}/{stem}.{file_format}"
+        self.values = values
+        self.final_file = os.path.join(root, self.path)
+        os.makedirs(os.path.dirname(self.final_file), exist_ok=True)
+        # Hidden, and still ending in the format's extension so open_writer picks the same writer
+        self.writer = open_writer(os.path.join(root, directory, f".{stem}.tmp.{file_format}"), float_decimals)
+        self.stats = {}
+
+    def write(self, block):
+        """
+        Write ``block`` and return its encoded payload.
+        """
+        payload = self.writer.encode(block)
+        self.writer.write_encoded(payload, len(block))
+        _merge_stats(self.stats, _column_stats(block, [c for c in float_columns + timestamp_columns if c in block]))
+        return payload
+
+    def close(self):
+        self.writer.close()
+        os.replace(self.writer.output_file, self.final_file)
+        return {
+            'path': self.path,
+            'partition': dict(self.values),
+            'rows': self.writer.rows_written,
+            'bytes': os.path.getsize(self.final_file),
+            'stats': {column: [_json_value(low), _json_value(high)] for column, (low, high) in self.stats.items()},
+        }
+
+class PartitionedWriter:
+    """
+    Route DataFrame blocks of one task to Hive partition directories under ``root``.
+
+    Each partition gets files of about ``target_file_size`` bytes. ``entries`` lists the
+    closed files for the manifest.
+    """
+
+    def __init__(self, root, task, file_format='parquet', target_file_size=128 * 1024 * 1024,
+                 keys=partition_keys, float_decimals=2):
+        if file_format not in file_formats:
+            raise ValueError(f"Unknown partition file format {file_format!r}; expected one of {file_formats}")
+        self.root = root
+        self.task = task
+        self.file_format = file_format
+        self.target_file_size = target_file_size
+        self.keys = keys
+        self.float_decimals = float_decimals
+        self.entries = []
+        self._open = {}
+        self._file_counts = {}
+        self._bytes_per_row = None
+        self._codec = compression_of(f"part.{file_format}")
+        # Compressed bytes per uncompressed byte, for compressed CSV (see _file_size)
+        self._compression_ratio = None
+
+    def write(self, block):
+        names = [key for key, _ in self.keys]
+        values = pd.DataFrame({key: _partition_values(block[column], column) for key, column in self.keys})
+        stored = [index for index, column in enumerate(block.columns) if column not in names]
+        for partition, rows in values.groupby(names, sort=True, dropna=False).indices.items():
+            partition = partition if isinstance(partition, tuple) else (partition,)
+            self._write_partition(tuple(None if pd.isna(v) else v for v in partition), block.iloc[rows, stored])
+
+    def _write_partition(self, values, block):
+        start = 0
+        while start < len(block):
+            current = self._open.get(values) or self._new_file(values)
+            remaining = self.target_file_size - self._file_size(current)
+            if self._bytes_per_row is None:
+                # Estimate the row size from a first slice before filling files to the target
+                rows = min(len(block) - start, 100)
+            else:
+                rows = min(len(block) - start, max(1, int(remaining / self._bytes_per_row)))
+            payload = current.write(block.iloc[start:start + rows])
+            start += rows
+            if self._codec is not None and self._compression_ratio is None:
+                compressed = compress_block(payload, self._codec, default_levels[self._codec])
+                self._compression_ratio = len(compressed) / len(payload)
+            size = self._file_size(current)
+            if size:
+                self._bytes_per_row = size / current.writer.rows_written
+            if size >= self.target_file_size:
+                output_size = current.writer.output_size
+                entry = self._open.pop(values).close()
+                if self._codec is not None:
+                    self._compression_ratio = entry['bytes'] / output_size
+                self.entries.append(entry)
+
+    def _file_size(self, current):
+        """
+        Bytes of the open file ``current`` so far.
+
+        Compressed CSV reaches the disk in large blocks compressed in the background (see
+        compression.py), long after it is written, so its size is estimated as the uncompressed
+        bytes times the compression ratio: that of the first slice, then that of the last closed file.
+        """
+        if self._codec is None or self._compression_ratio is None:
+            return current.writer.bytes_written
+        return current.writer.output_size * self._compression_ratio
+
+    def _new_file(self, values):
+        directory = partition_path(values, self.keys)
+        count = self._file_counts.get(values, 0)
+        self._file_counts[values] = count + 1
+        self._open[values] = _PartitionFile(self.root, directory, f"part-{self.task:05d}-{count:03d}", self.file_format,
+                                            dict(zip([key for key, _ in self.keys], values)), self.float_decimals)
+        return self._open[values]
+
+    def close(self):
+        for values in list(self._open):
+            self.entries.append(self._open.pop(values).close())
+        return self.entries
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def group_tasks(units, key):
+    """
+    Group the indices of consecutive ``units`` with the same ``key(unit)`` into tasks.
+    """
+    return [[index for index, _ in group] for _, group in itertools.groupby(enumerate(units), lambda item: key(item[1]))]
+
+def write_manifest(root, entries, file_format, metadata=None, keys=partition_keys):
+    """
+    Write `_manifest.json` for the files in ``entries``, plus any run ``metadata``.
+    """
+    entries = sorted(entries, key=lambda entry: entry['path'])
+    manifest = {
+        'version': manifest_version,
+        'format': file_format,
+        'partition_keys': {key: column for key, column in keys},
+        'rows': sum(entry['rows'] for entry in entries),
+        'bytes': sum(entry['bytes'] for entry in entries),
+        'metadata': metadata or {},
+        'files': entries,
+    }
+    tmp_file = os.path.join(root, f".{manifest_name}.tmp")
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_file, os.path.join(root, manifest_name))
+    return manifest
+
+def load_manifest(root):
+    """
+    Load the `_manifest.json` of a partitioned output directory.
+    """
+    with open(os.path.join(root, manifest_name)) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != manifest_version:
+        raise ValueError(f"Unsupported manifest version in {os.path.join(root, manifest_name)}")
+    return manifest
+
+def expired_entries(entries, column, before):
+    """
+    Entries whose files only hold rows with ``column`` before ``before``, according to their stats.
+    """
+    return [entry for entry in entries if column in entry['stats'] and entry['stats'][column][1] < before]
+
+def remove_files(root, entries):
+    """
+    Delete the files of ``entries`` and any partition directories left empty.
+    """
+    for entry in entries:
+        path = os.path.join(root, entry['path'])
+        if os.path.exists(path):
+            os.remove(path)
+        directory = os.path.dirname(path)
+        while os.path.abspath(directory) != os.path.abspath(root) and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+
+def write_partitioned(root, num_tasks, write_task, num_workers=1, initializer=None, initargs=(),
+                      instrumentation=null_instrumentation, file_format='parquet', metadata=None,
+                      tasks=None, entries=None):
+    """
+    Run ``write_task(index, instrumentation)`` for every task and write the manifest.
+
+    ``write_task`` must return the entries of the files it wrote. With ``num_workers`` > 1
+    the tasks run in a process pool set up by ``initializer(*initargs)``; otherwise the
+    initializer is called once in this process. To extend an existing output, pass the
+    ``entries`` of the files to keep and the indices of the ``tasks`` still to write.
+    Returns the manifest.
+    """
+    if entries is None and os.path.isdir(root) and os.listdir(root):
+        raise ValueError(f"{root} already exists and is not empty; remove it or choose another output directory")
+    os.makedirs(root, exist_ok=True)
+
+    tasks = range(num_tasks) if tasks is None else tasks
+    entries, total_rows, total_bytes = list(entries or []), 0, 0
+
+    def task_done(index, task_entries):
+        nonlocal total_rows, total_bytes
+        entries.extend(task_entries)
+        rows = sum(entry['rows'] for entry in task_entries)
+        total_rows += rows
+        total_bytes += sum(entry['bytes'] for entry in task_entries)
+        instrumentation.batch_done(rows, total_bytes)
+        print(f"Wrote task {index + 1}/{num_tasks} ({len(task_entries)} files), {total_rows} rows so far")
+
+    if num_workers > 1:
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=initializer, initargs=initargs) as pool:
+            futures = {pool.submit(write_task, index): index for index in tasks}
+            for future in as_completed(futures):
+                task_done(futures[future], future.result())
+    else:
+        if initializer is not None:
+            initializer(*initargs)
+        for index in tasks:
+            task_done(index, write_task(index, instrumentation))
+
+    return write_manifest(root, entries, file_format, metadata)
+
+def _init_units_worker(run):
+    global _run
+    _run = run
+
+def _write_units_task(index, instrumentation=null_instrumentation):
+    """
+    Generate the units of task ``index`` into its partition files.
+    """
+    with PartitionedWriter(_run['root'], index, _run['file_format'], _run['target_file_size']) as writer:
+        for unit_index in _run['tasks'][index]:
+            block = _run['generate_unit'](_run['units'][unit_index], _run['seeds'][unit_index],
+                                          instrumentation=instrumentation)
+            with instrumentation.stage('write'):
+                writer.write(block)
+    return writer.entries
+
+def write_units(root, units, seeds, generate_unit, task_key, num_workers=1, file_format='parquet',
+                target_file_size=128 * 1024 * 1024, instrumentation=null_instrumentation, metadata=None,
+                first_unit=0, entries=None):
+    """
+    Generate ``units`` as Hive partitions under ``root`` and return the manifest.
+
+    Consecutive units with the same ``task_key(unit)`` form one task. ``generate_unit(unit,
+    seed_seq, instrumentation=...)`` returns the block of one unit; it is sent to the worker
+    processes, so it must be picklable (a module-level function, or a functools.partial of one).
+    When appending, only the tasks from ``first_unit`` on are written and the manifest lists
+    them next to the existing ``entries``.
+    """
+    run = {
+        'root': root, 'units': units, 'seeds': seeds, 'generate_unit': generate_unit,
+        'tasks': group_tasks(units, task_key), 'file_format': file_format, 'target_file_size': target_file_size,
+    }
+    tasks = [index for index, task in enumerate(run['tasks']) if task[0] >= first_unit]
+    return write_partitioned(root, len(run['tasks']), _write_units_task, num_workers, _init_units_worker, (run,),
+                             instrumentation, file_format, metadata, tasks, entries)
@@ -0,0 +1,113 @@
+"""
+Threaded producer-consumer pipeline for the generators.
+
+Without it every batch goes through generation, serialization and the disk write strictly one
+after the other. `write_batches(..., pipelined=True)` runs the three stages in their own threads,
+connected by bounded queues:
+
+    generation thread -> [queue] -> serialization thread -> [queue] -> write (calling thread)
+
+- Each queue holds at most `queue_size` batches, so a slow stage blocks the stages before it
+  (back-pressure) and memory stays bounded at a few batches however long the run is.
+- NumPy, pandas, Arrow, file writes and the compressors release the GIL for most of their work,
+  so the stages overlap and the wall time approaches that of the slowest stage rather than
+  the sum of all three.
+- Batches keep their order and every batch has its own random stream, so the output is the
+  same as without the pipeline.
+- An exception in any stage stops the other threads and is re-raised in the caller.
+
+`prefetch(iterable)` is the building block: it iterates `iterable` in a background thread,
+at most `queue_size` items ahead of the consumer. The checkpointed runs use it directly to
+generate the next unit while the current one is written.
+
+Usage:
+    with open_writer('mock.csv') as writer:
+        for rows in write_batches(writer, batches, instrumentation, pipelined=True):
+            print(f"Generated {writer.rows_written} rows so far...")
+"""
+
+import queue
+import threading
+
+from instrumentation import null_instrumentation
+
+_end = object()
+
+class _Failure:
+    def __init__(self, exc):
+        self.exc = exc
+
+def prefetch(iterable, queue_size=2):
+    """
+    Iterate ``iterable`` in a background thread, at most ``queue_size`` items ahead.
+    """
+    items = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def put(item):
+        # Give up if the consumer has gone away, instead of blocking on a full queue forever
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_end)
+        except BaseException as exc:
+            put(_Failure(exc))
+        finally:
+            # Stops an upstream prefetch (or any generator) as soon as this stage ends
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name='prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _end:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+def write_batches(writer, batches, instrumentation=null_instrumentation, pipelined=False, queue_size=2):
+    """
+    Write every batch of ``batches`` with ``writer``, yielding each batch's row count once written.
+
+    With ``pipelined`` generation (iterating ``batches``), serialization and the write run
+    in three threads connected by queues of ``queue_size`` batches.
+    """
+    def encode(batches):
+        for batch in batches:
+            with instrumentation.stage('serialization'):
+                payload = writer.encode(batch)
+            yield payload, len(batch)
+
+    if pipelined:
+        generated = prefetch(batches, queue_size)
+        encoded = prefetch(encode(generated), queue_size)
+    else:
+        generated = encoded = encode(batches)
+    try:
+        for payload, rows in encoded:
+            with instrumentation.stage('write'):
+                writer.write_encoded(payload, rows)
+            instrumentation.batch_done(rows, writer.bytes_written)
+            yield rows
+    finally:
+        # Downstream first: closing a stage joins its thread, after which the stage
+        # before it is no longer being iterated and can be closed in turn
+        encoded.close()
+        generated.close()
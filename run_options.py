@@ -0,0 +1,93 @@
+"""
+Output options, run parameters and seed handling shared by the generators.
+
+Both generators take the same output options and record their runs the same way:
+- `OutputOptions` groups how a run writes its output: checkpoint, pipeline, partitioned output,
+  append, and row or size targets. `check` refuses combinations that cannot work together,
+  before anything is written.
+- `run_params` builds the parameters recorded in checkpoint and partition manifests: the
+  generator's own settings, the fingerprint of the template source and the optional
+  distribution profile, row target and entity model. A resumed or appended run must match them.
+- `run_seed` settles the master seed. A checkpointed run takes it from its manifest, or draws
+  one and records it there. A partitioned run without a seed draws one to record in its manifest.
+
+Usage:
+    options = OutputOptions(checkpoint=True, total_rows=10 ** 6)
+    options.check(num_workers)
+    params = run_params('six-months', input_file, {'months': 6, ...}, distributions, options.total_rows, entities)
+    seed, run_checkpoint = run_seed(output_file, params, seed, options)
+"""
+
+from checkpoint import Checkpoint, new_seed
+from template_store import source_fingerprint
+
+class OutputOptions:
+    """
+    How a generator run writes its output.
+
+    - ``checkpoint``: commit every unit to a manifest so the run can be resumed (checkpoint.py).
+    - ``pipelined``: overlap generation, serialization and writing in threads (pipeline.py).
+    - ``partitioned``, ``file_format``, ``target_file_size``: write a directory of Hive partitions (partitioned.py).
+    - ``append``, ``drop_expired``: extend an existing output instead of regenerating it (date-range only).
+    - ``total_rows``: write exactly this many rows; ``target_size``: write about this many bytes,
+      within ``size_tolerance`` (sizing.py).
+    """
+
+    def __init__(self, checkpoint=False, pipelined=False, partitioned=False, file_format='parquet',
+                 target_file_size=128 * 1024 * 1024, append=False, drop_expired=False, total_rows=None,
+                 target_size=None, size_tolerance=0.001):
+        self.checkpoint = checkpoint
+        self.pipelined = pipelined
+        self.partitioned = partitioned
+        self.file_format = file_format
+        self.target_file_size = target_file_size
+        self.append = append
+        self.drop_expired = drop_expired
+        self.total_rows = total_rows
+        self.target_size = target_size
+        self.size_tolerance = size_tolerance
+        self.check()
+
+    def check(self, num_workers=1):
+        """
+        Raise ValueError if the options cannot work together, or with ``num_workers`` worker processes.
+        """
+        if self.partitioned and (self.checkpoint or self.pipelined):
+            raise ValueError("Partitioned output cannot be combined with checkpoint or pipelined runs")
+        if self.pipelined and num_workers > 1:
+            raise ValueError("A pipelined run overlaps its stages in threads of one process; it cannot be combined "
+                             "with worker processes")
+        if self.total_rows is not None and self.target_size is not None:
+            raise ValueError("Pass either total_rows or target_size, not both")
+        if self.target_size is not None and (num_workers > 1 or self.checkpoint or self.pipelined or self.partitioned):
+            raise ValueError("A target size needs a serial run; it cannot be combined with worker processes, "
+                             "checkpoint, pipelined or partitioned runs")
+        if self.append and (self.total_rows is not None or self.target_size is not None):
+            raise ValueError("Appending extends the run month by month; it cannot be combined with a row or size target")
+        if self.drop_expired and not self.append:
+            raise ValueError("Dropping expired files only applies when appending")
+
+def run_params(generator, input_file, settings, distributions=None, total_rows=None, entities=None):
+    """
+    The parameters of a run, as recorded in its checkpoint or partition manifest.
+    """
+    params = {'generator': generator, 'input_fingerprint': source_fingerprint(input_file), **settings}
+    if distributions is not None:
+        params['distribution_profile'] = distributions.fingerprint
+    if total_rows is not None:
+        params['total_rows'] = total_rows
+    if entities is not None:
+        params['entities'] = entities.params
+    return params
+
+def run_seed(output_file, params, seed, options):
+    """
+    Return the master seed of the run and its Checkpoint (None unless ``options.checkpoint``).
+    """
+    if options.checkpoint:
+        run_checkpoint = Checkpoint(output_file, params, seed)
+        return run_checkpoint.seed, run_checkpoint
+    if options.partitioned and seed is None:
+        # Recorded in the manifest, so the run can be reproduced
+        seed = new_seed()
+    return seed, None
@@ -0,0 +1,137 @@
+"""
+Row count and output size targets for the generators.
+
+Instead of tuning `rows_per_provider` by trial, or generating too much and shrinking the file
+with archive/reduce.py afterwards, a run can ask for an exact number of rows or bytes:
+
+- `total_rows`: `split_rows` spreads the total over the month x provider blocks, so blocks
+  differ by at most one row and the run writes exactly `total_rows` rows. This is a pure
+  planning step, so it works with every mode (process pool, checkpoint, partitioned output).
+- `target_size`: `SizeTarget` sizes the blocks online while the output is written. A one-row
+  probe measures the fixed overhead of the file (the CSV header, the fixed part of a Parquet
+  footer) and sizes the pilot batch: at most `pilot_rows` rows, and no more than fit in
+  `pilot_fraction` of the target. From then on the bytes per row are measured on the rows
+  written since the probe, net of the writer's `batch_overhead` (the footer bytes every Parquet
+  row group adds), and every block gets an equal share of the rows still needed. The last
+  block is re-estimated after every batch and stops once the output is within `tolerance` of
+  the target, or when no further row fits. The batches have to be written one after the other,
+  so this only applies to sequential runs (no process pool, pipeline, checkpoint or
+  partitioned output).
+
+The tolerance is an aim, not a guarantee: rows are whole, so the output can miss a small target
+by up to a row (plus a row group's footer for Parquet), and a Parquet footer is only estimated
+until the file is closed. `report_size` prints the final size and a warning when it is outside
+the tolerance.
+
+Sizes are measured on the writer's `output_size`: the uncompressed CSV bytes for CSV output
+(so, as with `mockgen reduce --target-size`, the target of a `.gz` or `.zst` file is its
+uncompressed size), or for Parquet the row groups written so far plus an estimate of the
+footer written on close (see writers.ParquetBatchWriter).
+
+Usage:
+    target = SizeTarget(1024 ** 3, num_blocks=len(blocks), batch_size=100000)
+    with open_writer(output_file) as writer:
+        for block, rows in target.plan(writer):
+            writer.write(generate(blocks[block], rows))
+    report_size(writer.output_size, target.target_bytes, target.tolerance)
+"""
+
+def split_rows(total_rows, num_blocks):
+    """
+    Split ``total_rows`` into ``num_blocks`` counts that differ by at most one, larger ones first.
+    """
+    base, extra = divmod(total_rows, num_blocks)
+    return [base + (index < extra) for index in range(num_blocks)]
+
+class SizeTarget:
+    """
+    Online planner of batch sizes that aims the output at ``target_bytes``, within ``tolerance``.
+    """
+
+    def __init__(self, target_bytes, num_blocks, batch_size=100000, tolerance=0.001, pilot_rows=100,
+                 pilot_fraction=0.01, block_names=None):
+        self.target_bytes = target_bytes
+        self.num_blocks = num_blocks
+        # Labels of the blocks for error messages, e.g. '2024-07 AWS'
+        self.block_names = block_names or [str(block) for block in range(num_blocks)]
+        self.batch_size = batch_size
+        self.tolerance = tolerance
+        self.pilot_rows = min(pilot_rows, batch_size)
+        self.pilot_fraction = pilot_fraction
+
+    def _pilot_size(self, bytes_written, rows_written):
+        """
+        Rows of the pilot, measured on the probe: at most ``pilot_rows``, and no more than fit in ``pilot_fraction`` of the target.
+        """
+        fitting = int(self.pilot_fraction * self.target_bytes * rows_written / bytes_written)
+        return max(rows_written, min(self.pilot_rows, fitting))
+
+    def plan(self, writer):
+        """
+        Yield (block index, rows) for every batch to generate, in order.
+
+        ``writer`` is the batch writer of the output; its ``output_size``, ``rows_written`` and
+        ``batch_overhead`` are read before each batch, after the previous batch has been written.
+        Raises ValueError when a batch adds no rows (its block generates nothing, e.g. because
+        every template row was dropped), since the output could then never grow.
+        """
+        probe = pilot = None
+        batches = 0
+        for block in range(self.num_blocks):
+            blocks_left = self.num_blocks - block
+            block_rows = None
+            done = 0
+            while True:
+                bytes_written, rows_written = writer.output_size, writer.rows_written
+                if rows_written == 0:
+                    # A one-row probe holds the fixed overhead of the file and sizes the pilot
+                    rows = 1
+                else:
+                    if probe is None:
+                        probe = (bytes_written, rows_written, batches)
+                        pilot = self._pilot_size(bytes_written, rows_written)
+                    probe_bytes, probe_rows, probe_batches = probe
+                    if rows_written > probe_rows:
+                        row_bytes = bytes_written - probe_bytes - writer.batch_overhead * (batches - probe_batches)
+                        bytes_per_row = max(row_bytes, 1) / (rows_written - probe_rows)
+                    else:
+                        bytes_per_row = bytes_written / rows_written
+                    # Every block left costs at least one more batch
+                    remaining_rows = max(0.0, (self.target_bytes - bytes_written
+                                               - writer.batch_overhead * blocks_left) / bytes_per_row)
+
+                    if rows_written < pilot:
+                        rows = pilot - rows_written
+                    elif blocks_left == 1:
+                        # Last block: re-estimate after every batch to land on the target
+                        if abs(self.target_bytes - bytes_written) <= self.tolerance * self.target_bytes:
+                            return
+                        rows = min(self.batch_size, round(remaining_rows))
+                    else:
+                        if block_rows is None:
+                            # The rows already written to this block (the probe and pilot) count towards its share
+                            block_rows = round((done + remaining_rows) / blocks_left)
+                        rows = min(self.batch_size, block_rows - done)
+                if rows <= 0:
+                    break
+                yield block, rows
+                if writer.rows_written <= rows_written:
+                    raise ValueError(f"Block {self.block_names[block]} generated no rows for a batch of {rows}, so "
+                                     f"the output cannot reach {self.target_bytes:.0f} bytes; check that the "
+                                     f"template rows are valid")
+                done += rows
+                batches += 1
+
+def report_size(output_size, target_bytes, tolerance):
+    """
+    Print the size of the output against ``target_bytes``, with a warning when it is outside ``tolerance``.
+
+    Returns True if the output is within the tolerance.
+    """
+    error = (output_size - target_bytes) / target_bytes
+    print(f"Wrote {output_size} bytes for a target of {target_bytes:.0f} ({error:+.3%})")
+    if abs(error) <= tolerance:
+        return True
+    print(f"Warning: the output is outside the size tolerance of {tolerance:.3%}; it grows by whole rows, and "
+          f"for Parquet by a row group footer per batch, so a target this small cannot be hit more closely")
+    return False
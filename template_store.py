@@ -0,0 +1,119 @@
+"""
+Compact, cached template store for the FOCUS source file.
+
+Every generator samples template rows from `focus-data-full.csv`. Parsing that file with
+pandas on every run is slow and keeps every value as a Python object. This module parses
+the source once with the Arrow CSV reader, dictionary-encodes every column (categorical
+codes plus one copy of each distinct value) and saves the result as an Arrow IPC file.
+
+Later runs memory-map that file instead of re-parsing the CSV, which takes milliseconds
+and only pages in the data that is actually touched.
+
+Cache layout:
+- The cache lives in `.template-cache/` next to the source file (or `cache_dir`).
+- Each cache file is named after a fingerprint of the source: its size, mtime and a hash
+  of its first and last megabyte. Editing or replacing the source invalidates the cache
+  and stale entries for the same source are removed.
+
+Every column, numeric ones included, keeps its source text so generated output is
+byte-for-byte faithful to the template values.
+
+Usage:
+    templates = load_template_store('focus-data-full.csv')
+    block = templates.take(indices)  # DataFrame of the selected rows
+"""
+
+import csv
+import hashlib
+import os
+import re
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+cache_dir_name = '.template-cache'
+
+class TemplateStore:
+    """
+    Dictionary-encoded template rows backed by a memory-mapped Arrow IPC file.
+
+    Supports the parts of the DataFrame interface the generators use:
+    ``len(store)``, ``store.columns`` and ``store.take(indices)``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with pa.memory_map(path, 'r') as source:
+            self.table = pa.ipc.open_file(source).read_all()
+        self.columns = self.table.column_names
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def __reduce__(self):
+        # Worker processes re-map the cache file instead of receiving a pickled copy
+        return TemplateStore, (self.path,)
+
+    def take(self, indices):
+        """
+        Return the rows at ``indices`` as a DataFrame of plain string columns.
+        """
+        rows = self.table.take(pa.array(indices))
+        decoded = [pc.cast(column, pa.string()) for column in rows.columns]
+        return pa.Table.from_arrays(decoded, names=self.columns).to_pandas()
+
+def source_fingerprint(source_file, sample_bytes=1024 * 1024):
+    """
+    Fingerprint the source file from its size, mtime and first/last ``sample_bytes``.
+    """
+    stat = os.stat(source_file)
+    digest = hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(source_file, 'rb') as f:
+        digest.update(f.read(sample_bytes))
+        if stat.st_size > sample_bytes:
+            f.seek(max(stat.st_size - sample_bytes, sample_bytes))
+            digest.update(f.read(sample_bytes))
+    return digest.hexdigest()[:16]
+
+def build_template_cache(source_file, cache_file):
+    """
+    Parse ``source_file`` once and write it to ``cache_file`` as a dictionary-encoded Arrow IPC file.
+    """
+    with open(source_file, newline='') as f:
+        columns = next(csv.reader(f))
+    table = pacsv.read_csv(
+        source_file,
+        convert_options=pacsv.ConvertOptions(
+            column_types={column: pa.string() for column in columns},
+            strings_can_be_null=True,
+        ),
+    )
+    encoded = [pc.dictionary_encode(column.combine_chunks()) for column in table.columns]
+    table = pa.Table.from_arrays(encoded, names=table.column_names)
+
+    tmp_file = f"{cache_file}.tmp"
+    with pa.OSFile(tmp_file, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_file, cache_file)
+
+def load_template_store(source_file, cache_dir=None):
+    """
+    Return the TemplateStore for ``source_file``, building its cache on first use.
+    """
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(source_file)), cache_dir_name)
+    os.makedirs(cache_dir, exist_ok=True)
+    basename = os.path.basename(source_file)
+    cache_file = os.path.join(cache_dir, f"{basename}.{source_fingerprint(source_file)}.arrow")
+    # Only caches of this exact source: `a.csv.<hash>.arrow`, not `a.csv.gz.<hash>.arrow`
+    cache_pattern = re.compile(re.escape(basename) + r'\.[0-9a-f]{16}\.arrow')
+
+    if not os.path.exists(cache_file):
+        print(f"Building template cache for {source_file}...")
+        build_template_cache(source_file, cache_file)
+        for name in os.listdir(cache_dir):
+            stale = os.path.join(cache_dir, name)
+            if cache_pattern.fullmatch(name) and stale != cache_file:
+                os.remove(stale)
+
+    return TemplateStore(cache_file)
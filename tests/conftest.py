@@ -0,0 +1,22 @@
+"""
+Shared fixtures: a small synthetic template CSV (see benchmark.build_template_csv).
+"""
+
+from datetime import datetime
+
+import pytest
+
+from benchmark import build_template_csv
+
+start_date = datetime(2024, 7, 1)
+end_date = datetime(2024, 9, 30)
+
+@pytest.fixture(scope="session")
+def template_csv(tmp_path_factory):
+    path = tmp_path_factory.mktemp("template") / "template.csv"
+    build_template_csv(path, rows=2000)
+    return str(path)
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from checkpoint import Checkpoint
+from conftest import end_date, read_bytes, start_date
+from gen_6_month_mock_data import generate_six_months_data
+from gen_mock_data_date_range import generate_mock_data
+from run_options import OutputOptions
+
+class Preempted(Exception):
+    pass
+
+def generate_date_range(template, output_file):
+    generate_mock_data(template, output_file, start_date, end_date, 50, seed=7, batch_size=20,
+                       options=OutputOptions(checkpoint=True))
+
+def generate_six_months(template, output_file):
+    generate_six_months_data(template, output_file, rows_per_provider=50, months=3, num_workers=1, seed=7,
+                             shard_rows=20, options=OutputOptions(checkpoint=True))
+
+def crash_after(monkeypatch, commits):
+    """
+    Make Checkpoint.commit raise once ``commits`` units are committed: the next part file is then
+    in place but not in the manifest, as after a crash between the rename and the manifest update.
+    """
+    commit = Checkpoint.commit
+
+    def crashing_commit(self, index, rows):
+        if len(self.units) == commits:
+            raise Preempted
+        commit(self, index, rows)
+
+    monkeypatch.setattr(Checkpoint, "commit", crashing_commit)
+
+@pytest.mark.parametrize("generate", [generate_date_range, generate_six_months])
+def test_resume_after_crash_matches_uninterrupted_run(template_csv, tmp_path, monkeypatch, generate):
+    expected = tmp_path / "uninterrupted.csv"
+    generate(template_csv, str(expected))
+
+    output_file = str(tmp_path / "resumed.csv")
+    with monkeypatch.context() as patch:
+        crash_after(patch, 5)
+        with pytest.raises(Preempted):
+            generate(template_csv, output_file)
+    assert os.path.exists(f"{output_file}.manifest.json")
+    assert not os.path.exists(output_file)
+
+    generate(template_csv, output_file)
+    assert read_bytes(output_file) == read_bytes(expected)
+    assert not os.path.exists(f"{output_file}.manifest.json")
+    assert not os.path.exists(f"{output_file}.parts")
+
+def test_resume_refuses_different_parameters(template_csv, tmp_path, monkeypatch):
+    output_file = str(tmp_path / "resumed.csv")
+    with monkeypatch.context() as patch:
+        crash_after(patch, 2)
+        with pytest.raises(Preempted):
+            generate_date_range(template_csv, output_file)
+
+    with pytest.raises(ValueError, match="different parameters"):
+        generate_mock_data(template_csv, output_file, start_date, end_date, 60, seed=7, batch_size=20,
+                           options=OutputOptions(checkpoint=True))
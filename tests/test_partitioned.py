@@ -0,0 +1,110 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from conftest import read_bytes, start_date
+from gen_mock_data_date_range import generate_mock_data
+from partitioned import load_manifest, manifest_name
+from run_options import OutputOptions
+
+mid_date = datetime(2024, 8, 31)
+end_date = datetime(2024, 10, 31)
+
+def generate(template, output_file, first, last, workers=1, **options):
+    generate_mock_data(template, output_file, first, last, 40, seed=11, batch_size=25, num_workers=workers,
+                       options=OutputOptions(**options))
+
+def data_files(root):
+    """
+    Bytes of every data file under ``root`` by relative path, without the manifest.
+    """
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            if name != manifest_name:
+                files[os.path.relpath(path, root)] = read_bytes(path)
+    return files
+
+def test_append_to_csv_matches_full_run(template_csv, tmp_path):
+    full = str(tmp_path / "full.csv")
+    generate(template_csv, full, start_date, end_date)
+    appended = str(tmp_path / "appended.csv")
+    generate(template_csv, appended, start_date, mid_date)
+    generate(template_csv, appended, start_date, end_date, append=True)
+    assert read_bytes(appended) == read_bytes(full)
+
+@pytest.mark.parametrize("file_format", ["parquet", "csv"])
+def test_append_to_partitions_matches_full_run(template_csv, tmp_path, file_format):
+    full = str(tmp_path / "full")
+    generate(template_csv, full, start_date, end_date, workers=2, partitioned=True, file_format=file_format,
+             target_file_size=20000)
+    appended = str(tmp_path / "appended")
+    generate(template_csv, appended, start_date, mid_date, workers=2, partitioned=True, file_format=file_format,
+             target_file_size=20000)
+    # The target file size recorded in the manifest applies, not the default
+    generate(template_csv, appended, start_date, end_date, workers=2, append=True)
+
+    assert data_files(appended) == data_files(full)
+    assert load_manifest(appended)['files'] == load_manifest(full)['files']
+    assert load_manifest(appended)['rows'] == load_manifest(full)['rows']
+
+def test_drop_expired_removes_only_expired_files(template_csv, tmp_path):
+    root = str(tmp_path / "partitions")
+    generate(template_csv, root, start_date, mid_date, partitioned=True, file_format="csv")
+    before = data_files(root)
+    generate(template_csv, root, datetime(2024, 8, 1), end_date, append=True, drop_expired=True)
+    after = data_files(root)
+
+    assert not any(path.startswith("BillingMonth=2024-07") for path in after)
+    assert not os.path.exists(os.path.join(root, "BillingMonth=2024-07"))
+    kept = {path: data for path, data in before.items() if not path.startswith("BillingMonth=2024-07")}
+    assert kept and all(after[path] == data for path, data in kept.items())
+    assert any(path.startswith("BillingMonth=2024-10") for path in after)
+    listed = {entry['path'] for entry in load_manifest(root)['files']}
+    assert listed == {path.replace(os.sep, "/") for path in after}
+
+def test_partitions_do_not_depend_on_workers_and_match_manifest(template_csv, tmp_path):
+    roots = []
+    for workers in (1, 4):
+        root = str(tmp_path / f"workers-{workers}")
+        generate(template_csv, root, start_date, end_date, workers=workers, partitioned=True, file_format="csv",
+                 target_file_size=20000)
+        roots.append(root)
+    assert data_files(roots[1]) == data_files(roots[0])
+
+    manifest = load_manifest(roots[0])
+    # 4 months x 4 providers (5 billing periods of 30 days), and the small target rolls tasks over to a second file
+    assert len({(entry['partition']['BillingMonth'], entry['partition']['ProviderName'])
+                for entry in manifest['files']}) == 16
+    assert len(manifest['files']) > 16
+    for entry in manifest['files']:
+        path = os.path.join(roots[0], entry['path'])
+        frame = pd.read_csv(path)
+        assert len(frame) == entry['rows']
+        assert os.path.getsize(path) == entry['bytes']
+        assert "ProviderName" not in frame
+        assert f"ProviderName={entry['partition']['ProviderName']}" in entry['path']
+    assert sum(entry['rows'] for entry in manifest['files']) == manifest['rows'] == 5 * 4 * 40
+
+@pytest.mark.parametrize("file_format", ["csv", "csv.gz", "csv.zst"])
+def test_partition_files_end_near_target_file_size(template_csv, tmp_path, file_format):
+    root = str(tmp_path / "partitions")
+    target_file_size = 100000
+    generate_mock_data(template_csv, root, start_date, mid_date, 3000, seed=11,
+                       options=OutputOptions(partitioned=True, file_format=file_format,
+                                             target_file_size=target_file_size))
+
+    files = load_manifest(root)['files']
+    sizes = [entry['bytes'] for entry in files]
+    assert len(files) > 12
+    assert max(sizes) <= 1.1 * target_file_size
+    # Every file but the last of each task (part-<task>-<file>) in a partition is filled to the target;
+    # compressed sizes are estimated from the compression ratio of a first slice until a file is closed
+    last = {}
+    for entry in files:
+        last[entry['path'].rsplit('-', 1)[0]] = entry['path']
+    full = [entry['bytes'] for entry in files if entry['path'] not in last.values()]
+    assert full and min(full) >= 0.8 * target_file_size
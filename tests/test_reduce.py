@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from archive.reduce import downsize_file
+from benchmark import build_template_csv
+from compression import open_input
+from conftest import read_bytes
+
+@pytest.fixture(scope="module")
+def input_csv(tmp_path_factory):
+    path = tmp_path_factory.mktemp("reduce") / "input.csv"
+    build_template_csv(path, rows=5000)
+    return str(path)
+
+def is_subsequence(lines, of):
+    remaining = iter(of)
+    return all(line in remaining for line in lines)
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_downsize_lands_near_target_with_whole_input_rows(input_csv, tmp_path, seed):
+    target_size = os.path.getsize(input_csv) / 3
+    output_file = str(tmp_path / "reduced.csv")
+    downsize_file(input_csv, output_file, target_size, block_size=16 * 1024, seed=seed)
+
+    assert abs(os.path.getsize(output_file) - target_size) <= 0.01 * target_size
+    input_lines = read_bytes(input_csv).splitlines()
+    output_lines = read_bytes(output_file).splitlines()
+    assert output_lines[0] == input_lines[0]
+    assert is_subsequence(output_lines[1:], input_lines[1:])
+
+def test_downsize_compressed_output_targets_uncompressed_size(input_csv, tmp_path):
+    target_size = os.path.getsize(input_csv) / 2
+    output_file = str(tmp_path / "reduced.csv.gz")
+    downsize_file(input_csv, output_file, target_size, block_size=16 * 1024, seed=0)
+
+    with open_input(output_file) as f:
+        uncompressed = f.read()
+    assert abs(len(uncompressed) - target_size) <= 0.01 * target_size
+    assert os.path.getsize(output_file) < len(uncompressed)
@@ -0,0 +1,21 @@
+import pytest
+
+from run_options import OutputOptions
+
+@pytest.mark.parametrize("options", [
+    dict(partitioned=True, checkpoint=True),
+    dict(partitioned=True, pipelined=True),
+    dict(total_rows=10, target_size=1000),
+    dict(target_size=1000, checkpoint=True),
+    dict(append=True, total_rows=10),
+    dict(drop_expired=True),
+])
+def test_conflicting_options_are_refused(options):
+    with pytest.raises(ValueError):
+        OutputOptions(**options)
+
+@pytest.mark.parametrize("options", [dict(target_size=1000), dict(pipelined=True)])
+def test_serial_options_refuse_worker_processes(options):
+    OutputOptions(**options).check(num_workers=1)
+    with pytest.raises(ValueError):
+        OutputOptions(**options).check(num_workers=4)
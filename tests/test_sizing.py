@@ -0,0 +1,97 @@
+import os
+
+import pandas as pd
+import pytest
+
+from benchmark import build_template_csv
+from conftest import end_date, start_date
+from gen_6_month_mock_data import generate_six_months_data
+from gen_mock_data_date_range import generate_mock_data
+from run_options import OutputOptions
+from sizing import SizeTarget, report_size, split_rows
+
+@pytest.mark.parametrize("total_rows, num_blocks", [(0, 3), (7, 3), (100, 24), (12345, 24), (5, 8)])
+def test_split_rows_is_exact_and_even(total_rows, num_blocks):
+    counts = split_rows(total_rows, num_blocks)
+    assert len(counts) == num_blocks
+    assert sum(counts) == total_rows
+    assert max(counts) - min(counts) <= 1
+    assert counts == sorted(counts, reverse=True)
+
+class FakeWriter:
+    """
+    A writer whose rows cost ``row_bytes`` each, after a ``header_bytes`` header.
+    """
+
+    batch_overhead = 0
+
+    def __init__(self, row_bytes, header_bytes):
+        self.row_bytes = row_bytes
+        self.header_bytes = header_bytes
+        self.rows_written = 0
+
+    @property
+    def output_size(self):
+        return self.header_bytes + self.row_bytes * self.rows_written if self.rows_written else 0
+
+    def write(self, rows):
+        self.rows_written += rows
+
+@pytest.mark.parametrize("target_bytes", [50000, 2 * 1024 ** 2, 1024 ** 3])
+def test_size_target_plans_to_the_target(target_bytes):
+    writer = FakeWriter(row_bytes=517, header_bytes=1200)
+    target = SizeTarget(target_bytes, num_blocks=24, batch_size=100000)
+    blocks = []
+    for block, rows in target.plan(writer):
+        assert 0 < rows <= 100000
+        writer.write(rows)
+        blocks.append(block)
+    assert blocks == sorted(blocks)
+    # Within the tolerance, or within one row when a row is larger than the tolerance
+    assert abs(writer.output_size - target_bytes) <= max(target.tolerance * target_bytes, writer.row_bytes)
+
+def test_size_target_refuses_blocks_without_rows():
+    writer = FakeWriter(row_bytes=517, header_bytes=1200)
+    target = SizeTarget(100000, num_blocks=2, block_names=['2024-07 AWS', '2024-07 Oracle'])
+    with pytest.raises(ValueError, match="2024-07 AWS generated no rows"):
+        for _ in target.plan(writer):
+            pass
+
+def test_report_size_warns_outside_the_tolerance(capsys):
+    assert report_size(1000500, 1000000, 0.001)
+    assert "Warning" not in capsys.readouterr().out
+    assert not report_size(1002000, 1000000, 0.001)
+    assert "Warning" in capsys.readouterr().out
+
+@pytest.mark.parametrize("extension, tolerance", [(".csv", 0.001), (".parquet", 0.005)])
+def test_target_size_of_generated_file(template_csv, tmp_path, extension, tolerance):
+    target_size = 2 * 1024 ** 2
+    output_file = str(tmp_path / f"sized{extension}")
+    generate_mock_data(template_csv, output_file, start_date, end_date, 1, seed=3,
+                       options=OutputOptions(target_size=target_size, size_tolerance=tolerance))
+    assert abs(os.path.getsize(output_file) - target_size) <= tolerance * target_size
+
+def test_target_size_of_six_month_file(template_csv, tmp_path):
+    target_size = 2 * 1024 ** 2
+    output_file = str(tmp_path / "sized.csv")
+    generate_six_months_data(template_csv, output_file, months=3, seed=3, options=OutputOptions(target_size=target_size))
+    assert abs(os.path.getsize(output_file) - target_size) <= 0.001 * target_size
+
+def test_small_target_warns(template_csv, tmp_path, capsys):
+    output_file = str(tmp_path / "small.csv")
+    generate_mock_data(template_csv, output_file, start_date, end_date, 1, seed=3,
+                       options=OutputOptions(target_size=20000))
+    assert os.path.getsize(output_file) < 2 * 20000
+    assert "Warning" in capsys.readouterr().out
+
+def test_target_size_fails_when_templates_yield_no_rows(tmp_path):
+    # Templates whose billing periods do not parse are all dropped, so no shard has rows
+    template = tmp_path / "iso-dates.csv"
+    build_template_csv(template, rows=200)
+    frame = pd.read_csv(template, dtype=str)
+    frame["BillingPeriodStart"] = frame["BillingPeriodEnd"] = "2024-09-01T00:00:00Z"
+    frame.to_csv(template, index=False)
+
+    with pytest.raises(ValueError, match="month 1 AWS generated no rows"):
+        generate_six_months_data(str(template), str(tmp_path / "sized.csv"), months=3, num_workers=1, seed=3,
+                                 options=OutputOptions(target_size=100000))
@@ -0,0 +1,18 @@
+import os
+
+from benchmark import build_template_csv
+from template_store import load_template_store
+
+def test_rebuilding_a_cache_keeps_caches_of_other_sources(tmp_path):
+    cache_dir = tmp_path / "cache"
+    build_template_csv(tmp_path / "a.csv", rows=50)
+    build_template_csv(tmp_path / "a.csv.bak", rows=50)
+    load_template_store(str(tmp_path / "a.csv"), cache_dir=str(cache_dir))
+    other = load_template_store(str(tmp_path / "a.csv.bak"), cache_dir=str(cache_dir))
+
+    # A changed source rebuilds its cache and removes only its own stale entry
+    build_template_csv(tmp_path / "a.csv", rows=60)
+    store = load_template_store(str(tmp_path / "a.csv"), cache_dir=str(cache_dir))
+
+    assert len(store) == 60
+    assert sorted(os.listdir(cache_dir)) == sorted([os.path.basename(store.path), os.path.basename(other.path)])
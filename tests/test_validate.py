@@ -0,0 +1,56 @@
+import gzip
+import re
+from itertools import accumulate
+
+import pytest
+
+from benchmark import build_template_csv
+from conftest import read_bytes
+from validate import validate_file
+
+bad_rows = [3, 777, 1500, 2999]
+
+@pytest.fixture
+def csv_with_bad_rows(tmp_path):
+    """
+    A CSV of 3000 rows whose ``bad_rows`` have an unknown provider.
+    """
+    path = tmp_path / "data.csv"
+    build_template_csv(path, rows=3000)
+    lines = read_bytes(path).split(b"\n")
+    for row in bad_rows:
+        # Provider names only occur in the ProviderName column of the synthetic template
+        lines[row + 1] = re.sub(rb",(AWS|Google Cloud|Oracle|Microsoft),", b",Bogus,", lines[row + 1], count=1)
+    path.write_bytes(b"\n".join(lines))
+    return str(path)
+
+def offending_rows(output):
+    return [(int(row), int(offset)) for row, offset in re.findall(r"row (\d+) at byte (\d+)", output)]
+
+@pytest.mark.parametrize("num_workers", [1, 3, 8])
+def test_offending_rows_and_offsets_do_not_depend_on_workers(csv_with_bad_rows, capsys, num_workers):
+    assert not validate_file(csv_with_bad_rows, seed=0, num_workers=num_workers, cost_ranges={})
+    found = offending_rows(capsys.readouterr().out)
+
+    lines = read_bytes(csv_with_bad_rows).split(b"\n")
+    line_starts = list(accumulate((len(line) + 1 for line in lines), initial=0))
+    assert found == [(row, line_starts[row + 1]) for row in bad_rows]
+    assert all(b"Bogus" in lines[row + 1] for row in bad_rows)
+
+def test_statistics_and_sample_do_not_depend_on_chunk_size(csv_with_bad_rows, capsys):
+    outputs = []
+    for chunksize in (97, 1000, 100000):
+        validate_file(csv_with_bad_rows, sample_size=50, chunksize=chunksize, seed=0, cost_ranges={})
+        outputs.append(capsys.readouterr().out)
+    assert "Total rows in file: 3000" in outputs[0]
+    assert outputs[1] == outputs[0]
+    assert outputs[2] == outputs[0]
+
+def test_compressed_offsets_match_the_decompressed_data(csv_with_bad_rows, capsys):
+    validate_file(csv_with_bad_rows, seed=0, cost_ranges={})
+    expected = offending_rows(capsys.readouterr().out)
+    compressed = csv_with_bad_rows + ".gz"
+    with open(compressed, "wb") as f:
+        f.write(gzip.compress(read_bytes(csv_with_bad_rows)))
+    validate_file(compressed, seed=0, chunksize=97, cost_ranges={})
+    assert offending_rows(capsys.readouterr().out) == expected
@@ -1,11 +1,27 @@
 """
 
-This script validates the content of a large CSV file by performing the following checks:
-1. **Random Sampling**: Selects a random sample of rows from the file to ensure comprehensive coverage.
-2. **Column Completeness**: Verifies that all expected columns are present in the file.
+This script validates the content of a large CSV file in a single streaming pass by performing the following checks:
+1. **Random Sampling**: Keeps a uniform random sample of rows (reservoir sampling) for inspection.
+2. **Column Completeness**: Verifies from the header that all expected columns are present in the file.
 3. **Date Range Validation**: Ensures `BillingPeriodStart` and `BillingPeriodEnd` span the last 6 months.
-4. **Provider Representation**: Confirms that all expected cloud providers (AWS, Google Cloud, Oracle, Microsoft) are represented in the sampled data.
-5. **Row Validity**: Ensures sampled rows contain valid and meaningful data.
+4. **Provider Representation**: Confirms that all expected cloud providers (AWS, Google Cloud, Oracle, Microsoft) are represented.
+5. **Row Validity**: Counts nulls per column and checks that cost columns are numeric and within range.
+
+Dates, providers, nulls and costs are checked exactly over the whole file, not just the sample.
+The file is read once in chunks, so memory stays constant however large the file is.
+
+Parallel Validation:
+- With `num_workers` > 1 the file is split into newline-aligned byte ranges (record boundaries
+  are found through mmap) and each range is validated in its own worker process. The per-range
+  results are merged into one report with exact row counts, per-provider totals and the byte
+  offsets of the first `max_offending` offending rows.
+- Ranges are cut at newlines, so fields must not contain embedded line breaks (the generators
+  never write any).
+
+Compressed Input:
+- Files ending in `.gz` or `.zst` are decompressed as a stream while they are read (see
+  compression.py). They cannot be split by byte offset, so they are validated as one range;
+  offending-row offsets are positions in the decompressed data.
 
 Usage:
 1. Update the `file_path` variable with the path to the generated CSV file.
@@ -13,96 +29,392 @@ Usage:
 
 Parameters:
 - `file_path`: Path to the CSV file to validate.
-- `sample_size`: Number of random rows to sample for validation (default is 1000).
+- `sample_size`: Number of random rows to keep for inspection (default is 1000).
+- `chunksize`: Number of rows parsed per chunk (default is 100000).
+- `cost_ranges`: Allowed (min, max) per numeric column; columns in `cost_columns` only need to be numeric.
+- `num_workers`: Number of worker processes for parallel validation (default is 1).
+- `max_offending`: Number of offending rows reported with their byte offsets (default is 10).
 
 Output:
-- Prints detailed validation results for column checks, date ranges, and provider representation.
+- Prints detailed validation results for column checks, date ranges, provider representation and costs.
 - Confirms whether the file passes all validation checks or fails with specific issues.
 
 """
 
-import pandas as pd
+import csv
+import io
+import mmap
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-import random
+
+import numpy as np
+import pandas as pd
+
+from compression import compression_of, open_input
 
 # File path of the generated data
 file_path = "mock-data-6-months-NEW.csv"
 
-def validate_file(file_path, sample_size=1000):
-    print(f"Validating file: {file_path}\n")
+expected_columns = [
+    "AvailabilityZone", "BilledCost", "BillingAccountId", "BillingAccountName", "BillingCurrency",
+    "BillingPeriodEnd", "BillingPeriodStart", "ChargeCategory", "ChargeClass", "ChargeDescription",
+    "ChargeFrequency", "ChargePeriodEnd", "ChargePeriodStart", "CommitmentDiscountCategory",
+    "CommitmentDiscountId", "CommitmentDiscountName", "CommitmentDiscountStatus",
+    "CommitmentDiscountType", "ConsumedQuantity", "ConsumedUnit", "ContractedCost",
+    "ContractedUnitPrice", "EffectiveCost", "InvoiceIssuerName", "ListCost", "ListUnitPrice",
+    "PricingCategory", "PricingQuantity", "PricingUnit", "ProviderName", "PublisherName", "RegionId",
+    "RegionName", "ResourceId", "ResourceName", "ResourceType", "ServiceCategory", "Id", "ServiceName",
+    "SkuId", "SkuPriceId", "SubAccountId", "SubAccountName", "Tags"
+]
+expected_providers = ["AWS", "Google Cloud", "Oracle", "Microsoft"]
 
-    # Get total number of rows without loading the entire file into memory
-    print("Determining total number of rows...")
-    try:
-        total_rows = sum(1 for _ in open(file_path)) - 1  # Subtract 1 for the header
-        print(f"Total rows in file: {total_rows}")
-    except Exception as e:
-        print(f"Error determining file size: {e}")
-        return False
+# Numeric columns that must parse as numbers when present
+cost_columns = [
+    "BilledCost", "ConsumedQuantity", "ContractedCost", "ContractedUnitPrice", "EffectiveCost",
+    "ListCost", "ListUnitPrice", "PricingQuantity"
+]
 
-    # Generate random row indices for sampling
-    print(f"Randomly selecting {sample_size} rows...")
-    sample_indices = random.sample(range(1, total_rows + 1), sample_size)
+# Allowed (min, max) for the columns every generator draws itself
+default_cost_ranges = {
+    "BilledCost": (0, 100),
+    "ConsumedQuantity": (0, 1000),
+}
 
-    # Read the sampled rows
-    try:
-        data = pd.read_csv(file_path, skiprows=lambda x: x not in sample_indices and x != 0)  # Keep header (row 0)
-        print(f"Sample data loaded ({len(data)} rows):\n")
-        print(data.head())  # Show first few rows of the sample
-    except Exception as e:
-        print(f"Error reading file: {e}")
-        return False
+def new_stats():
+    """
+    Return empty full-file statistics, to be filled by update_stats.
+    """
+    return {
+        "rows": 0,
+        "providers": Counter(),
+        "null_counts": Counter(),
+        "invalid_dates": 0,
+        "min_start": None,
+        "max_end": None,
+        "cost_min": {},
+        "cost_max": {},
+        "cost_invalid": Counter(),
+        "cost_out_of_range": Counter(),
+        "unexpected_providers": 0,
+        "offending_count": 0,
+        "offending": [],
+    }
+
+def parse_dates(values):
+    """
+    Parse a date column by its distinct values only; billing periods have very few of them.
+
+    Returns the parsed values aligned with ``values`` (NaT where missing or invalid).
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), errors="coerce")
+    return pd.Series(parsed.to_numpy()[codes], index=values.index).where(codes >= 0)
+
+def _merge_min(current, value):
+    if value is None:
+        return current
+    return value if current is None or value < current else current
+
+def _merge_max(current, value):
+    if value is None:
+        return current
+    return value if current is None or value > current else current
+
+def update_stats(stats, chunk, cost_ranges, max_offending=10):
+    """
+    Fold one chunk of rows (read as strings) into ``stats``.
+
+    Rows with an invalid date, an unexpected provider or a bad cost value are
+    counted as offending; the row numbers of the first ``max_offending`` are kept.
+    """
+    stats["rows"] += len(chunk)
+    stats["null_counts"].update({k: int(v) for k, v in chunk.isna().sum().items() if v})
+    offending = np.zeros(len(chunk), dtype=bool)
+
+    if "ProviderName" in chunk:
+        stats["providers"].update(chunk["ProviderName"].value_counts().to_dict())
+        unexpected = ~chunk["ProviderName"].isin(expected_providers).to_numpy()
+        stats["unexpected_providers"] += int(unexpected.sum())
+        offending |= unexpected
+
+    for column, bound in (("BillingPeriodStart", "min_start"), ("BillingPeriodEnd", "max_end")):
+        if column not in chunk:
+            continue
+        parsed = parse_dates(chunk[column])
+        invalid = parsed.isna().to_numpy()
+        stats["invalid_dates"] += int(invalid.sum())
+        offending |= invalid
+        if not invalid.all():
+            if bound == "min_start":
+                stats[bound] = _merge_min(stats[bound], parsed.min())
+            else:
+                stats[bound] = _merge_max(stats[bound], parsed.max())
+
+    for column in cost_columns:
+        if column not in chunk:
+            continue
+        raw = chunk[column]
+        values = pd.to_numeric(raw, errors="coerce")
+        invalid = (values.isna() & raw.notna()).to_numpy()
+        stats["cost_invalid"][column] += int(invalid.sum())
+        offending |= invalid
+        if values.notna().any():
+            stats["cost_min"][column] = _merge_min(stats["cost_min"].get(column), float(values.min()))
+            stats["cost_max"][column] = _merge_max(stats["cost_max"].get(column), float(values.max()))
+        if column in cost_ranges:
+            low, high = cost_ranges[column]
+            out_of_range = ((values < low) | (values > high)).to_numpy()
+            stats["cost_out_of_range"][column] += int(out_of_range.sum())
+            offending |= out_of_range
+
+    stats["offending_count"] += int(offending.sum())
+    room = max_offending - len(stats["offending"])
+    if room > 0:
+        stats["offending"].extend(int(row) for row in chunk.index[offending][:room])
+    return stats
+
+def merge_stats(total, part, max_offending=10):
+    """
+    Merge the statistics of the next byte range into ``total``.
+
+    Offending rows are (row number, byte offset) pairs; row numbers in ``part``
+    are local to its range and are shifted by the rows already in ``total``.
+    """
+    total["offending"].extend(
+        (row + total["rows"], offset) for row, offset in part["offending"][:max_offending - len(total["offending"])]
+    )
+    for key in ("rows", "invalid_dates", "unexpected_providers", "offending_count"):
+        total[key] += part[key]
+    for key in ("providers", "null_counts", "cost_invalid", "cost_out_of_range"):
+        total[key].update(part[key])
+    total["min_start"] = _merge_min(total["min_start"], part["min_start"])
+    total["max_end"] = _merge_max(total["max_end"], part["max_end"])
+    for column, value in part["cost_min"].items():
+        total["cost_min"][column] = _merge_min(total["cost_min"].get(column), value)
+    for column, value in part["cost_max"].items():
+        total["cost_max"][column] = _merge_max(total["cost_max"].get(column), value)
+    return total
+
+def update_sample(sample, chunk, sample_size, rng):
+    """
+    Keep a uniform random sample of ``sample_size`` rows across all chunks.
+
+    Every row gets a random key and only the rows with the smallest keys seen
+    so far are retained, so the sample never grows beyond ``sample_size``.
+    """
+    chunk = chunk.assign(_sample_key=rng.random(len(chunk)))
+    if sample is not None:
+        chunk = pd.concat([sample, chunk])
+    return chunk.nsmallest(sample_size, "_sample_key")
+
+def split_byte_ranges(file_path, num_ranges):
+    """
+    Return the header columns and ``num_ranges`` newline-aligned (start, stop) byte ranges.
+
+    Each boundary is moved forward to just after the next newline, found with mmap,
+    so every range holds whole records. A compressed file is one range running to
+    the end of the stream (stop is None).
+    """
+    if compression_of(file_path):
+        with open_input(file_path) as f:
+            header = f.readline()
+        return next(csv.reader([header.decode("utf-8")])), [(len(header), None)]
+
+    with open(file_path, "rb") as f:
+        header = f.readline()
+        columns = next(csv.reader([header.decode("utf-8")]))
+        size = os.fstat(f.fileno()).st_size
+        if size <= len(header):
+            return columns, []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            bounds = [len(header)]
+            step = (size - len(header)) // num_ranges
+            for i in range(1, num_ranges):
+                newline = mm.find(b"\n", max(len(header) + i * step, bounds[-1]))
+                bounds.append(size if newline < 0 else newline + 1)
+            bounds.append(size)
+    return columns, [(start, stop) for start, stop in zip(bounds, bounds[1:]) if stop > start]
+
+class _RangeReader(io.RawIOBase):
+    """
+    Read-only view of the next ``length`` bytes of an open binary stream (all of it if None).
+
+    While the data passes through, the reader records where each row starts (``start``
+    being the offset of row 0), so the parser's row numbers can be turned into byte
+    offsets without reading the range a second time.
+    """
+
+    def __init__(self, f, start=0, length=None):
+        self._f = f
+        self._remaining = float("inf") if length is None else length
+        self._position = start
+        self._rows = 1
+        # (first row number, start offsets) per block read, until released
+        self._row_starts = [(0, np.array([start]))]
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining)
+        data = self._f.read(size)
+        buffer[:len(data)] = data
+        starts = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10) + (self._position + 1)
+        if len(starts):
+            self._row_starts.append((self._rows, starts))
+            self._rows += len(starts)
+        self._position += len(data)
+        self._remaining -= len(data)
+        return len(data)
+
+    def row_offset(self, row):
+        """
+        Return the byte offset at which the range-local ``row`` starts.
+        """
+        for first, starts in self._row_starts:
+            if first <= row < first + len(starts):
+                return int(starts[row - first])
+        raise ValueError(f"Row {row} is not held by the reader")
+
+    def release(self, rows):
+        """
+        Forget the start offsets of rows before ``rows`` once they have been parsed.
+        """
+        while len(self._row_starts) > 1 and self._row_starts[1][0] <= rows:
+            self._row_starts.pop(0)
+
+def validate_range(file_path, start, stop, columns, cost_ranges, sample_size, chunksize, seed_seq, max_offending):
+    """
+    Validate the records in bytes [start, stop) of ``file_path`` (to the end if ``stop`` is None).
+
+    Returns the range statistics, with offending rows as (row, byte offset)
+    pairs, and the range's reservoir sample.
+    """
+    rng = np.random.default_rng(seed_seq)
+    stats = new_stats()
+    sample = None
+    with open_input(file_path, start) as f:
+        raw = _RangeReader(f, start, None if stop is None else stop - start)
+        source = io.BufferedReader(raw, buffer_size=1024 * 1024)
+        with pd.read_csv(source, header=None, names=columns, dtype=str, chunksize=chunksize) as reader:
+            for chunk in reader:
+                found = len(stats["offending"])
+                update_stats(stats, chunk, cost_ranges, max_offending)
+                stats["offending"][found:] = [(row, raw.row_offset(row)) for row in stats["offending"][found:]]
+                raw.release(stats["rows"])
+                sample = update_sample(sample, chunk, sample_size, rng)
+    return stats, sample
+
+def _validate_range_task(args):
+    return validate_range(*args)
+
+def report(stats, columns, cost_ranges):
+    """
+    Print the checks for the full-file ``stats`` and return whether they all pass.
+    """
+    print(f"Total rows in file: {stats['rows']}")
 
     # Check column names
-    expected_columns = [
-        "AvailabilityZone", "BilledCost", "BillingAccountId", "BillingAccountName", "BillingCurrency",
-        "BillingPeriodEnd", "BillingPeriodStart", "ChargeCategory", "ChargeClass", "ChargeDescription",
-        "ChargeFrequency", "ChargePeriodEnd", "ChargePeriodStart", "CommitmentDiscountCategory",
-        "CommitmentDiscountId", "CommitmentDiscountName", "CommitmentDiscountStatus",
-        "CommitmentDiscountType", "ConsumedQuantity", "ConsumedUnit", "ContractedCost",
-        "ContractedUnitPrice", "EffectiveCost", "InvoiceIssuerName", "ListCost", "ListUnitPrice",
-        "PricingCategory", "PricingQuantity", "PricingUnit", "ProviderName", "PublisherName", "RegionId",
-        "RegionName", "ResourceId", "ResourceName", "ResourceType", "ServiceCategory", "Id", "ServiceName",
-        "SkuId", "SkuPriceId", "SubAccountId", "SubAccountName", "Tags"
-    ]
     print("\nChecking columns...")
-    if not all(col in data.columns for col in expected_columns):
-        print(f"Missing columns in the file. Expected columns: {expected_columns}")
+    missing = [col for col in expected_columns if col not in columns]
+    if missing:
+        print(f"Missing columns in the file: {missing}")
         return False
     print("All columns are present.")
 
+    nulls = {col: count for col, count in stats["null_counts"].items() if count}
+    print(f"\nNull counts per column: {nulls or 'none'}")
+
     # Validate date ranges
     print("\nValidating date ranges for 6 months...")
-    try:
-        billing_start_dates = pd.to_datetime(data["BillingPeriodStart"], errors="coerce")
-        billing_end_dates = pd.to_datetime(data["BillingPeriodEnd"], errors="coerce")
-
-        # Ensure no missing or invalid dates
-        if billing_start_dates.isnull().any() or billing_end_dates.isnull().any():
-            print("Invalid or missing dates in BillingPeriodStart or BillingPeriodEnd.")
-            return False
-
-        # Check date range for 6 months
-        six_months_ago = datetime.now() - pd.DateOffset(months=6)
-        if not (billing_start_dates >= six_months_ago).all() or not (billing_end_dates <= datetime.now()).all():
-            print("Dates are not within the expected 6-month range.")
-            return False
-
-        print(f"Dates are within the expected range ({six_months_ago.date()} to {datetime.now().date()}).")
-    except Exception as e:
-        print(f"Error validating date ranges: {e}")
+    if stats["invalid_dates"]:
+        print(f"Invalid or missing dates in BillingPeriodStart or BillingPeriodEnd ({stats['invalid_dates']} values).")
+        return False
+    six_months_ago = datetime.now() - pd.DateOffset(months=6)
+    print(f"Dates in file range from {stats['min_start']} to {stats['max_end']}.")
+    if stats["min_start"] is None or stats["min_start"] < six_months_ago or stats["max_end"] > datetime.now():
+        print("Dates are not within the expected 6-month range.")
         return False
+    print(f"Dates are within the expected range ({six_months_ago.date()} to {datetime.now().date()}).")
 
     # Check for representation of providers
     print("\nValidating provider representation...")
-    unique_providers = data["ProviderName"].unique()
-    print(f"Unique providers in the sample: {unique_providers}")
-    expected_providers = ["AWS", "Google Cloud", "Oracle", "Microsoft"]
-    if not all(provider in unique_providers for provider in expected_providers):
+    print(f"Rows per provider: {dict(stats['providers'])}")
+    if not all(provider in stats["providers"] for provider in expected_providers):
         print(f"Some providers are missing. Expected providers: {expected_providers}")
         return False
     print("All providers are represented.")
 
+    if stats["unexpected_providers"]:
+        print(f"Found {stats['unexpected_providers']} rows with an unexpected provider.")
+        return False
+
+    # Check cost columns
+    print("\nValidating cost columns...")
+    for column in cost_columns:
+        if column in stats["cost_min"]:
+            print(f"{column}: min {stats['cost_min'][column]}, max {stats['cost_max'][column]}")
+    invalid = {col: count for col, count in stats["cost_invalid"].items() if count}
+    if invalid:
+        print(f"Non-numeric values in cost columns: {invalid}")
+        return False
+    out_of_range = {col: count for col, count in stats["cost_out_of_range"].items() if count}
+    if out_of_range:
+        print(f"Values outside the allowed ranges {cost_ranges}: {out_of_range}")
+        return False
+    print("All cost columns are numeric and within range.")
+    return True
+
+def validate_file(file_path, sample_size=1000, chunksize=100000, cost_ranges=None, seed=None, num_workers=1,
+                  max_offending=10):
+    print(f"Validating file: {file_path}\n")
+    cost_ranges = default_cost_ranges if cost_ranges is None else cost_ranges
+
+    # Single streaming pass over each byte range: exact statistics plus a reservoir sample
+    try:
+        columns, ranges = split_byte_ranges(file_path, num_workers)
+        seeds = np.random.SeedSequence(seed).spawn(len(ranges))
+        tasks = [
+            (file_path, start, stop, columns, cost_ranges, sample_size, chunksize, seeds[i], max_offending)
+            for i, (start, stop) in enumerate(ranges)
+        ]
+        if num_workers > 1 and compression_of(file_path):
+            print("Compressed input is validated as one stream.\n")
+        if num_workers > 1 and len(ranges) > 1:
+            print(f"Validating {len(ranges)} byte ranges with {num_workers} workers...")
+            with ProcessPoolExecutor(max_workers=num_workers) as pool:
+                results = list(pool.map(_validate_range_task, tasks))
+        else:
+            results = [_validate_range_task(task) for task in tasks]
+    except Exception as e:
+        print(f"Error reading file: {e}")
+        return False
+
+    stats = new_stats()
+    sample = None
+    for range_stats, range_sample in results:
+        merge_stats(stats, range_stats, max_offending)
+        if range_sample is not None:
+            sample = pd.concat([sample, range_sample]).nsmallest(sample_size, "_sample_key") \
+                if sample is not None else range_sample
+
+    if sample is None:
+        print("File contains no rows.")
+        return False
+    sample = sample.drop(columns="_sample_key")
+    print(f"Sample data kept ({len(sample)} rows):\n")
+    print(sample.head())  # Show first few rows of the sample
+
+    if stats["offending"]:
+        print(f"\n{stats['offending_count']} offending rows; first {len(stats['offending'])} (row, byte offset):")
+        for row, offset in stats["offending"]:
+            print(f"  row {row} at byte {offset}")
+
+    if not report(stats, columns, cost_ranges):
+        return False
+
     print("\nValidation completed successfully. The file passed all checks.")
     return True
 
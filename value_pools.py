@@ -0,0 +1,77 @@
+"""
+Pre-generated Faker value pools for filling text columns in bulk.
+
+Calling Faker once per row is the most expensive part of generating a mock row.
+This module draws a fixed number of distinct values per Faker provider once,
+caches them in NumPy arrays and fills whole columns by random index, so the
+per-row cost is a single array lookup.
+
+Pool sizes are configurable: larger pools give more distinct values in the output,
+smaller pools start up faster.
+
+UUID-style columns (ResourceId, SkuId, SkuPriceId) do not go through Faker at all.
+`uuid4_column` in id_columns.py formats one large buffer of random
+bytes into version 4 UUID strings, so every row still gets its own ID.
+"""
+
+import numpy as np
+
+# Faker calls used to fill each pool
+pool_factories = {
+    'sentence': lambda fake: fake.sentence(nb_words=6),
+    'company': lambda fake: fake.company(),
+    'word': lambda fake: fake.word(),
+}
+
+# Default number of distinct values drawn per pool
+default_pool_sizes = {
+    'sentence': 10000,
+    'company': 2000,
+    'word': 1000,
+}
+
+# Pools already drawn, keyed by (Faker instance, pool name, size)
+_pool_cache = {}
+
+def build_pool(fake, name, size):
+    """
+    Draw up to ``size`` distinct values from the Faker provider ``name``.
+
+    Providers with a small vocabulary (e.g. ``word``) may run out of distinct values,
+    in which case the pool holds every value seen within ``size * 10`` draws.
+    """
+    factory = pool_factories[name]
+    values = {}
+    attempts = 0
+    while len(values) < size and attempts < size * 10:
+        values[factory(fake)] = None
+        attempts += 1
+    return np.array(list(values), dtype=object)
+
+def get_pool(fake, name, size=None, seed=None):
+    """
+    Return the cached pool for ``name``, drawing it on first use.
+
+    With ``seed`` set, Faker is reseeded per pool before drawing, so the pool's
+    contents do not depend on which other pools were drawn first.
+    """
+    size = size or default_pool_sizes[name]
+    key = (id(fake), name, size, seed)
+    if key not in _pool_cache:
+        if seed is not None:
+            fake.seed_instance(f"{seed}-{name}")
+        _pool_cache[key] = build_pool(fake, name, size)
+    return _pool_cache[key]
+
+def get_pools(fake, names, pool_sizes=None, seed=None):
+    """
+    Return the pools listed in ``names`` as a dict, with ``pool_sizes`` overriding the defaults.
+    """
+    sizes = {**default_pool_sizes, **(pool_sizes or {})}
+    return {name: get_pool(fake, name, sizes[name], seed) for name in names}
+
+def pool_column(pool, n, rng):
+    """
+    Fill a column of ``n`` values by random index into ``pool``.
+    """
+    return pool[rng.integers(0, len(pool), size=n)]
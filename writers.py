@@ -0,0 +1,448 @@
+"""
+Incremental writers for generated mock data.
+
+Generators hand each batch (a DataFrame) to a writer as soon as it is built instead of
+collecting the whole output in memory first. Peak memory is therefore bounded by the
+batch size rather than the output size, and a crash keeps every batch already written.
+
+Parquet output (any path ending in `.parquet`) is written one row group per batch with a
+typed FOCUS schema: float64 cost and quantity columns, timestamp billing and charge periods,
+and dictionary-encoded low-cardinality columns such as ProviderName, RegionName and
+ChargeFrequency. Every other column is stored as a string.
+
+CSV output goes through a dedicated encoder instead of `DataFrame.to_csv`:
+- float columns are formatted in bulk with a fixed number of decimals (2 by default): the
+  scaled values are split into digits with NumPy and written straight into a byte matrix;
+- every other column is factorized, so quoting and UTF-8 encoding are done once per distinct
+  value rather than once per row, and mapped back through the codes;
+- rows are joined as bytes into one large buffer per batch and written in one block.
+The result matches `to_csv(index=False, float_format='%.2f')` byte for byte, several times faster.
+
+CSV paths ending in `.gz` or `.zst` are compressed on the fly in a background thread pool
+(see compression.py). Parquet output is always compressed internally (snappy).
+
+Each writer splits a write into `encode(batch)` (serialization) and `write_encoded(payload, rows)`
+(the actual write), so the two stages can be timed separately and run on different threads
+(see pipeline.py).
+
+`write_part` writes one batch to its own file atomically, and `concatenate_parts` joins such
+part files in order. The process pool and checkpointed runs both build on these.
+
+Usage:
+    with open_writer('mock.parquet') as writer:
+        for batch in batches:
+            writer.write(batch)
+"""
+
+import csv
+import os
+import shutil
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from compression import compression_of, open_input, open_output, strip_compression
+
+# Typed columns of the FOCUS schema; everything else is written as a string
+float_columns = [
+    'BilledCost', 'ConsumedQuantity', 'ContractedCost', 'ContractedUnitPrice', 'EffectiveCost',
+    'ListCost', 'ListUnitPrice', 'PricingQuantity',
+]
+timestamp_columns = ['BillingPeriodStart', 'BillingPeriodEnd', 'ChargePeriodStart', 'ChargePeriodEnd']
+dictionary_columns = [
+    'AvailabilityZone', 'BillingCurrency', 'ChargeCategory', 'ChargeClass', 'ChargeFrequency',
+    'ConsumedUnit', 'InvoiceIssuerName', 'PricingCategory', 'PricingUnit', 'ProviderName',
+    'PublisherName', 'RegionId', 'RegionName', 'ResourceType', 'ServiceCategory', 'ServiceName',
+]
+
+# Rows of the first batches that model the size of a Parquet footer
+footer_sample_rows = 100
+
+def output_format(output_file):
+    """
+    Return 'parquet' or 'csv' depending on the extension of ``output_file``,
+    ignoring a compression suffix such as `.gz` or `.zst`.
+    """
+    return 'parquet' if strip_compression(output_file).endswith(('.parquet', '.pq')) else 'csv'
+
+def focus_schema(columns):
+    """
+    Build the Arrow schema for ``columns`` in the given order.
+    """
+    fields = []
+    for column in columns:
+        if column in float_columns:
+            fields.append(pa.field(column, pa.float64()))
+        elif column in timestamp_columns:
+            fields.append(pa.field(column, pa.timestamp('us')))
+        elif column in dictionary_columns:
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+def to_arrow_table(batch, schema):
+    """
+    Coerce a DataFrame batch to ``schema``. Values that do not parse become nulls.
+    """
+    columns = {}
+    for field in schema:
+        values = batch[field.name]
+        if pa.types.is_floating(field.type):
+            values = pd.to_numeric(values, errors='coerce')
+        elif pa.types.is_timestamp(field.type):
+            if not pd.api.types.is_datetime64_any_dtype(values):
+                values = pd.to_datetime(values, errors='coerce')
+            if values.dt.tz is not None:
+                values = values.dt.tz_convert(None)
+        else:
+            values = values.astype('string')
+        columns[field.name] = values
+    return pa.Table.from_pandas(pd.DataFrame(columns), schema=schema, preserve_index=False)
+
+def format_float_column(values, decimals=2):
+    """
+    Format a float column with exactly ``decimals`` decimals as an array of UTF-8 fields.
+
+    Values are scaled and rounded to integers, and their digits are written straight
+    into a byte matrix, one column of digits at a time. Rounding matches ``np.round``
+    (the generators round with it too). NaN becomes an empty field; values too large
+    to scale exactly fall back to Python formatting.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    scale = 10 ** decimals
+    exact = np.isfinite(values) & (np.abs(values) < 2 ** 53 / scale)
+    whole, fraction = np.divmod(np.rint(np.abs(np.where(exact, values, 0.0)) * scale).astype(np.int64), scale)
+    negative = np.signbit(values)
+
+    # Right-aligned: [padding][sign][whole digits][.][fraction digits]
+    whole_digits = len(str(int(whole.max()))) if n else 1
+    width = 1 + whole_digits + (decimals + 1 if decimals else 0)
+    chars = np.full((n, width), ord(' '), dtype=np.uint8)
+    for position in range(width - 1, width - 1 - decimals, -1):
+        fraction, digit = np.divmod(fraction, 10)
+        chars[:, position] = ord('0') + digit
+    if decimals:
+        chars[:, whole_digits + 1] = ord('.')
+    significant = np.ones(n, dtype=bool)
+    leading = np.full(n, whole_digits)
+    for position in range(whole_digits, 0, -1):
+        whole, digit = np.divmod(whole, 10)
+        chars[:, position] = np.where(significant, ord('0') + digit, ord(' '))
+        leading[significant] = position
+        significant = whole > 0
+    # The sign goes just before the most significant digit
+    chars[negative, leading[negative] - 1] = ord('-')
+
+    fields = np.char.lstrip(chars.view(f'S{width}').ravel()).astype(object)
+    for index in np.flatnonzero(~exact):
+        fields[index] = b'' if np.isnan(values[index]) else f"{values[index]:.{decimals}f}".encode()
+    return fields
+
+def quote_field(value):
+    """
+    Quote a CSV field if it contains a separator, quote or line break (csv.QUOTE_MINIMAL).
+    """
+    if ',' in value or '"' in value or '\n' in value or '\r' in value:
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+def format_timestamp_column(values):
+    """
+    Format a timezone-naive datetime64 column as UTF-8 fields like ``str(pd.Timestamp)``, in bulk.
+
+    Returns None when some values have fractional seconds, which ``str`` would print, or
+    fall outside years 0-9999.
+    """
+    values = np.asarray(values)
+    seconds = values.astype('datetime64[s]')
+    missing = np.isnat(values)
+    if not (seconds == values)[~missing].all():
+        return None
+    # Missing values format as 'NaT'; filling them keeps every row 'YYYY-MM-DDTHH:MM:SS'
+    text = np.datetime_as_string(np.where(missing, np.datetime64('2000-01-01', 's'), seconds), unit='s').astype('S')
+    if text.dtype.itemsize != 19:
+        return None
+    chars = text.view(np.uint8).reshape(len(values), 19)
+    chars[:, 10] = ord(' ')
+    fields = chars.view(f'S{chars.shape[1]}').ravel().astype(object)
+    fields[missing] = b''
+    return fields
+
+def _encode_ascii(uniques):
+    """
+    Encode distinct string values as UTF-8 fields in bulk when they are all ASCII, or return None.
+    """
+    if pd.api.types.infer_dtype(uniques, skipna=False) != 'string':
+        return None
+    try:
+        raw = np.asarray(uniques, dtype=object).astype('S')
+    except UnicodeEncodeError:
+        return None
+    fields = raw.astype(object)
+    blob = raw.tobytes()
+    if any(special in blob for special in (b',', b'"', b'\n', b'\r')):
+        quote = np.zeros(len(raw), dtype=bool)
+        for special in (b',', b'"', b'\n', b'\r'):
+            quote |= np.char.find(raw, special) >= 0
+        fields[quote] = [quote_field(value.decode('ascii')).encode('ascii') for value in fields[quote]]
+    return fields
+
+def format_text_column(values):
+    """
+    Format any non-float column as an array of UTF-8 fields, quoting and encoding each distinct value once.
+
+    Timestamps and all-ASCII distinct values are formatted in bulk, which matters for high-cardinality
+    columns such as IDs, where nearly every value is distinct.
+    """
+    if isinstance(values.dtype, np.dtype) and values.dtype.kind == 'M':
+        fields = format_timestamp_column(values.to_numpy())
+        if fields is not None:
+            return fields
+    codes, uniques = pd.factorize(values)
+    fields = _encode_ascii(uniques)
+    if fields is None:
+        fields = [quote_field(str(value)).encode('utf-8') for value in uniques]
+    # Code -1 (missing) picks the trailing empty field
+    fields = np.append(np.asarray(fields, dtype=object), b'')
+    return fields[codes]
+
+def encode_csv(batch, header=True, float_decimals=2):
+    """
+    Encode a DataFrame batch as UTF-8 CSV bytes (see the module docstring).
+    """
+    columns = []
+    for name in batch.columns:
+        values = batch[name]
+        if pd.api.types.is_float_dtype(values.dtype):
+            columns.append(format_float_column(values.to_numpy(), float_decimals).tolist())
+        elif isinstance(values.dtype, np.dtype) and values.dtype.kind in 'iub':
+            # Plain NumPy integers and booleans have no missing values and never need quoting
+            columns.append(values.to_numpy().astype(str).astype('S').tolist())
+        else:
+            columns.append(format_text_column(values).tolist())
+    lines = list(map(b','.join, zip(*columns)))
+    if header:
+        lines.insert(0, ','.join(quote_field(str(name)) for name in batch.columns).encode('utf-8'))
+    if not lines:
+        return b''
+    lines.append(b'')
+    return os.linesep.encode().join(lines)
+
+class CsvBatchWriter:
+    """
+    Append DataFrame batches to a CSV file, writing the header with the first batch.
+
+    Floats are written with ``float_decimals`` decimals (see encode_csv). A `.gz` or
+    `.zst` path is compressed on the fly, and ``bytes_written`` is then the compressed size;
+    ``output_size`` is always the uncompressed size. With ``append`` the batches are added
+    to the end of an existing file, without a header.
+    """
+
+    # Bytes a batch adds besides its rows (see ParquetBatchWriter)
+    batch_overhead = 0
+
+    def __init__(self, output_file, float_decimals=2, append=False):
+        self.output_file = output_file
+        self.float_decimals = float_decimals
+        self.rows_written = 0
+        self.output_size = 0
+        self._header_written = append
+        self._file = open_output(output_file, append=append)
+
+    def encode(self, batch):
+        payload = encode_csv(batch, header=not self._header_written, float_decimals=self.float_decimals)
+        self._header_written = True
+        return payload
+
+    def write_encoded(self, payload, rows):
+        self._file.write(payload)
+        self.rows_written += rows
+        self.output_size += len(payload)
+
+    def write(self, batch):
+        self.write_encoded(self.encode(batch), len(batch))
+
+    @property
+    def bytes_written(self):
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class ParquetBatchWriter:
+    """
+    Write DataFrame batches to a Parquet file, one row group per batch.
+
+    The schema is fixed by the columns of the first batch (see focus_schema). ``bytes_written``
+    is the size of the row groups written so far. ``output_size`` adds an estimate of the footer,
+    which is only written on close and grows with every row group (about 100 bytes per column
+    each), so it predicts the size of the closed file; ``batch_overhead`` is that growth per row group.
+    """
+
+    def __init__(self, output_file, compression='snappy'):
+        self.output_file = output_file
+        self.compression = compression
+        self.rows_written = 0
+        self.row_groups = 0
+        self.schema = None
+        self._writer = None
+        self._closed_size = None
+        self._sample = None
+        self._footer_model = None
+
+    def encode(self, batch):
+        if self._writer is None:
+            self.schema = focus_schema(batch.columns)
+            self._writer = pq.ParquetWriter(self.output_file, self.schema, compression=self.compression)
+        return to_arrow_table(batch, self.schema)
+
+    def write_encoded(self, payload, rows):
+        self._writer.write_table(payload)
+        self.rows_written += rows
+        self.row_groups += 1
+        if self._sample is None or len(self._sample) < min(len(payload), footer_sample_rows):
+            # Statistics of a few rows size the footer better than those of one row
+            self._sample = payload.slice(0, footer_sample_rows)
+            self._footer_model = None
+
+    def write(self, batch):
+        self.write_encoded(self.encode(batch), len(batch))
+
+    @property
+    def bytes_written(self):
+        if self._closed_size is not None:
+            return self._closed_size
+        return self._writer.file_handle.tell() if self._writer else 0
+
+    def _footer(self):
+        """
+        Fixed and per row group bytes of the footer, from files of one and two row groups of a sample
+        of the rows written, in memory.
+        """
+        if self._footer_model is not None:
+            return self._footer_model
+        sizes = []
+        for row_groups in (1, 2):
+            sink = pa.BufferOutputStream()
+            with pq.ParquetWriter(sink, self.schema, compression=self.compression) as writer:
+                for _ in range(row_groups):
+                    writer.write_table(self._sample)
+            # The serialized metadata plus its 4-byte length and the closing magic bytes
+            sizes.append(pq.read_metadata(pa.BufferReader(sink.getvalue())).serialized_size + 8)
+        self._footer_model = (2 * sizes[0] - sizes[1], sizes[1] - sizes[0])
+        return self._footer_model
+
+    @property
+    def batch_overhead(self):
+        """
+        Footer bytes each row group adds, once a batch has been written.
+        """
+        return self._footer()[1] if self.row_groups else 0
+
+    @property
+    def output_size(self):
+        if self._closed_size is not None or not self.row_groups:
+            return self.bytes_written
+        fixed, per_row_group = self._footer()
+        return self.bytes_written + fixed + per_row_group * self.row_groups
+
+    def close(self):
+        if self._writer is not None and self._closed_size is None:
+            self._writer.close()
+            # Includes the footer, which is only written on close
+            self._closed_size = os.path.getsize(self.output_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def open_writer(output_file, float_decimals=2):
+    """
+    Open the batch writer matching the extension of ``output_file``.
+    """
+    if output_format(output_file) == 'parquet':
+        if compression_of(output_file):
+            raise ValueError(f"{output_file}: Parquet output is compressed internally, drop the compression suffix")
+        return ParquetBatchWriter(output_file)
+    return CsvBatchWriter(output_file, float_decimals)
+
+def csv_edge_rows(path, tail_bytes=1024 * 1024):
+    """
+    Return the first and the last data row of a CSV file as dicts keyed by the header.
+
+    Plain files are only read at both ends; compressed files have to be streamed to the end.
+    """
+    with open_input(path) as f:
+        header = next(csv.reader([f.readline().decode()]))
+        first = f.readline().decode()
+        if compression_of(path) is None:
+            f.seek(max(0, os.path.getsize(path) - tail_bytes))
+            tail = f.read().decode(errors='replace').splitlines()
+        else:
+            tail = deque((line.decode() for line in f), maxlen=2)
+    lines = [line for line in tail if line.strip()]
+    if not first.strip() or not lines:
+        raise ValueError(f"{path} has no data rows")
+    first_row, last_row = csv.reader([first, lines[-1]])
+    return dict(zip(header, first_row)), dict(zip(header, last_row))
+
+def concatenate_parquet(part_files, output_file):
+    """
+    Copy the row groups of ``part_files`` into one Parquet file, one row group at a time.
+    """
+    writer = None
+    for part_file in part_files:
+        part = pq.ParquetFile(part_file)
+        if writer is None:
+            writer = pq.ParquetWriter(output_file, part.schema_arrow)
+        for index in range(part.num_row_groups):
+            writer.write_table(part.read_row_group(index))
+    if writer is not None:
+        writer.close()
+
+def write_part(batch, part_file, header=True, float_decimals=2):
+    """
+    Write ``batch`` to ``part_file`` via a temporary file and a rename, so the part
+    file either holds the whole batch or does not exist. CSV parts only get a header
+    row with ``header=True``, so the parts can be joined byte for byte.
+    """
+    root, ext = os.path.splitext(part_file)
+    tmp_file = f"{root}.tmp{ext}"
+    if output_format(part_file) == 'parquet':
+        with open_writer(tmp_file) as writer:
+            writer.write(batch)
+    else:
+        with open_output(tmp_file) as f:
+            f.write(encode_csv(batch, header, float_decimals))
+    os.replace(tmp_file, part_file)
+
+def concatenate_parts(part_files, output_file, remove=True):
+    """
+    Join ``part_files`` into ``output_file`` in order, removing them afterwards unless ``remove`` is False.
+
+    Compressed CSV parts are copied as they are: concatenated gzip members or zstd frames
+    are a valid compressed file.
+    """
+    if output_format(output_file) == 'parquet':
+        concatenate_parquet(part_files, output_file)
+    else:
+        with open(output_file, 'wb') as output:
+            for part_file in part_files:
+                with open(part_file, 'rb') as part:
+                    shutil.copyfileobj(part, output, length=16 * 1024 * 1024)
+    if remove:
+        for part_file in part_files:
+            os.remove(part_file)